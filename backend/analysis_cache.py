@@ -0,0 +1,180 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from .document_parser import EXTRACTION_FORMAT
+
+logger = logging.getLogger(__name__)
+
+# Directory holding cached extraction text and analysis results
+ANALYSIS_CACHE_DIR = os.getenv("ANALYSIS_CACHE_DIR", "cache")
+
+# Total size of the cache before least recently used documents are evicted
+ANALYSIS_CACHE_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+# Text and results are kept per extraction format, so neither outlives a change to the extractors
+TEXT_FILENAME = f"text.v{EXTRACTION_FORMAT}.jsonl"
+
+
+class AnalysisCache:
+    """
+    Content-addressed cache of extracted text and analysis results.
+
+    Each document is keyed by the SHA-256 of its bytes and gets a directory
+    holding its extracted pages (one JSON string per line) and one result file
+    per rule-set version, both under the current extraction format. A repeat
+    upload under the same rules is served from the stored result; after a rule
+    change the stored pages are re-analyzed without parsing the file again.
+
+    Worker processes read and write entries directly. The LRU index, eviction
+    and hit/miss counters live in the API process that owns the instance, and
+    are locked as lookups run in its thread pool.
+    """
+
+    def __init__(self, cache_dir: str = ANALYSIS_CACHE_DIR, max_bytes: int = ANALYSIS_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.text_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # content hash -> size, oldest first
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """Build the LRU index from the cache directory"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entries = []
+        for content_hash in os.listdir(self.cache_dir):
+            path = self._entry_dir(content_hash)
+            if os.path.isdir(path):
+                entries.append((os.path.getmtime(path), content_hash, self._entry_size(path)))
+        with self._lock:
+            self._entries = OrderedDict((content_hash, size) for _, content_hash, size in sorted(entries))
+            self._evict()
+
+    def lookup(self, content_hash: str, rules_version: str) -> Optional[Dict[str, Any]]:
+        """Return the cached analysis result for a document, counting the hit or miss"""
+        result_path = self._result_path(content_hash, rules_version)
+        try:
+            with open(result_path, 'r', encoding='utf-8') as file:
+                result = json.load(file)
+        except (OSError, ValueError):
+            has_text = self.has_text(content_hash)
+            with self._lock:
+                if has_text:
+                    self.text_hits += 1
+                    self._touch(content_hash)
+                else:
+                    self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            self._touch(content_hash)
+        return result
+
+    def has_text(self, content_hash: str) -> bool:
+        return os.path.exists(self._text_path(content_hash))
+
+    def iter_text(self, content_hash: str) -> Iterator[str]:
+        """Yield the cached pages of a document"""
+        with open(self._text_path(content_hash), 'r', encoding='utf-8') as file:
+            for line in file:
+                yield json.loads(line)
+
+    def write_text(self, content_hash: str, pages: Iterable[str]) -> Iterator[str]:
+        """
+        Pass pages through while writing them to the cache
+
+        The text is only published once every page has been consumed, so an
+        extraction error or an abandoned analysis leaves no partial entry.
+        """
+        os.makedirs(self._entry_dir(content_hash), exist_ok=True)
+        text_path = self._text_path(content_hash)
+        tmp_path = f"{text_path}.{uuid.uuid4().hex}.tmp"
+        complete = False
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                for page in pages:
+                    file.write(json.dumps(page) + "\n")
+                    yield page
+            os.replace(tmp_path, text_path)
+            complete = True
+        finally:
+            if not complete and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def store_result(self, content_hash: str, rules_version: str, result: Dict[str, Any]) -> None:
+        """Write an analysis result for a document and rule-set version"""
+        # Stage timings and prefilter counts describe one run, not the document, so they are not replayed from the cache
+        result = {key: value for key, value in result.items() if key not in ('stage_timings', 'prefilter')}
+        os.makedirs(self._entry_dir(content_hash), exist_ok=True)
+        result_path = self._result_path(content_hash, rules_version)
+        tmp_path = f"{result_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(json.dumps(result))
+        os.replace(tmp_path, result_path)
+
+    def record(self, content_hash: str) -> None:
+        """Account for an entry written by a worker and evict if over budget"""
+        path = self._entry_dir(content_hash)
+        if not os.path.isdir(path):
+            return
+        size = self._entry_size(path)
+        with self._lock:
+            self._entries[content_hash] = size
+            self._entries.move_to_end(content_hash)
+            self._evict()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'size_bytes': sum(self._entries.values()),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'text_hits': self.text_hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+    def _touch(self, content_hash: str) -> None:
+        if content_hash in self._entries:
+            self._entries.move_to_end(content_hash)
+        try:
+            os.utime(self._entry_dir(content_hash), (time.time(), time.time()))
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        total = sum(self._entries.values())
+        while total > self.max_bytes and len(self._entries) > 1:
+            content_hash, size = self._entries.popitem(last=False)
+            shutil.rmtree(self._entry_dir(content_hash), ignore_errors=True)
+            total -= size
+            self.evictions += 1
+            logger.info(f"Evicted cached analysis {content_hash}")
+
+    @staticmethod
+    def _entry_size(path: str) -> int:
+        return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+    def _entry_dir(self, content_hash: str) -> str:
+        return os.path.join(self.cache_dir, content_hash)
+
+    def _text_path(self, content_hash: str) -> str:
+        return os.path.join(self._entry_dir(content_hash), TEXT_FILENAME)
+
+    def _result_path(self, content_hash: str, rules_version: str) -> str:
+        return os.path.join(self._entry_dir(content_hash), f"{rules_version}.v{EXTRACTION_FORMAT}.json")
+
+
+# Global instance
+analysis_cache = AnalysisCache()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+SEC Marketing Rule Checker - Batch Analysis
+
+Analyzes every supported document under a directory across all cores,
+streams one JSON result per document as it finishes, and records the
+documents and analyses in the database in batches.
+
+Usage:
+    python -m backend.batch_analyze path/to/marketing --output results.jsonl
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from typing import Any, Dict, Iterator, List
+
+from . import models, rollups
+from .database import SessionLocal, upgrade_schema
+from .document_parser import PDF_EXTRACTION_WORKERS, pdf_extraction_pool
+from .findings import rule_catalog
+from .jobs import analysis_record, run_analysis
+from .uploads import UPLOAD_CHUNK_SIZE, is_supported
+
+
+def find_documents(directory: str) -> Iterator[str]:
+    """Yield the paths of supported documents under a directory"""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for filename in sorted(files):
+            if is_supported(filename):
+                yield os.path.join(root, filename)
+
+
+def _init_worker(pdf_extraction_workers: int) -> None:
+    pdf_extraction_pool.workers = pdf_extraction_workers
+
+
+def analyze_file(file_path: str, document_type: str) -> Dict[str, Any]:
+    """Hash and analyze one document inside a worker process"""
+    content_hash = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        while chunk := file.read(UPLOAD_CHUNK_SIZE):
+            content_hash.update(chunk)
+
+    return {
+        'file': file_path,
+        'file_size': os.path.getsize(file_path),
+        'content_hash': content_hash.hexdigest(),
+        'analysis': run_analysis(file_path, document_type, content_hash.hexdigest())
+    }
+
+
+def save_batch(results: List[Dict[str, Any]], document_type: str) -> None:
+    """Insert documents and their analyses in one transaction"""
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        documents = [
+            models.Document(
+                filename=os.path.basename(result['file']),
+                original_filename=os.path.basename(result['file']),
+                file_path=os.path.abspath(result['file']),
+                document_type=document_type,
+                file_size=result['file_size'],
+                content_hash=result['content_hash'],
+                uploaded_at=now
+            )
+            for result in results
+        ]
+        db.add_all(documents)
+        db.flush()
+
+        rule_catalog.ensure(db, (finding for result in results for finding in result['analysis']['findings']))
+        rollups.record(db, ((document, result['analysis']) for document, result in zip(documents, results)))
+        db.add_all([
+            analysis_record(document.id, result['analysis'])
+            for document, result in zip(documents, results)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def run(directory: str, document_type: str, workers: int, batch_size: int, output, save: bool,
+        pdf_extraction_workers: int = PDF_EXTRACTION_WORKERS) -> int:
+    """Analyze a directory and return the number of documents processed"""
+    if save:
+        upgrade_schema()
+
+    paths = find_documents(directory)
+    pending = set()
+    unsaved = []
+    processed = 0
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(pdf_extraction_workers,)) as executor:
+        # Keep a bounded number of documents in flight so huge directories stream
+        while True:
+            for path in paths:
+                pending.add(executor.submit(analyze_file, path, document_type))
+                if len(pending) >= workers * 4:
+                    break
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                analysis = result['analysis']
+                output.write(json.dumps({
+                    'file': result['file'],
+                    'overall_score': analysis['overall_score'],
+                    'compliance_status': analysis['compliance_status'],
+                    'findings': analysis['findings'],
+                    'recommendations': analysis['recommendations'],
+                    'document_stats': analysis['document_stats']
+                }) + "\n")
+                output.flush()
+                processed += 1
+
+                if save:
+                    unsaved.append(result)
+                    if len(unsaved) >= batch_size:
+                        save_batch(unsaved, document_type)
+                        unsaved = []
+
+    if save and unsaved:
+        save_batch(unsaved, document_type)
+    return processed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('directory', help='Directory of PDF, Word and text documents')
+    parser.add_argument('--document-type', default='advertisement',
+                        help='Type of document (advertisement, rfp, rfi, etc.)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes (default: all cores)')
+    parser.add_argument('--pdf-extraction-workers', type=int, default=PDF_EXTRACTION_WORKERS,
+                        help='Processes extracting the pages of one large PDF per worker; 1 disables parallel '
+                             f'extraction (default: {PDF_EXTRACTION_WORKERS})')
+    parser.add_argument('--batch-size', type=int, default=500,
+                        help='Documents inserted per database transaction')
+    parser.add_argument('--output', default='-', help='JSON Lines output file (default: stdout)')
+    parser.add_argument('--no-save', action='store_true', help='Do not record results in the database')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        print(f"❌ Directory not found: {args.directory}", file=sys.stderr)
+        return 1
+
+    output = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        processed = run(args.directory, args.document_type, args.workers,
+                        args.batch_size, output, not args.no_save, args.pdf_extraction_workers)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(f"✅ Analyzed {processed} documents", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+# Benchmarks for the SEC Marketing Rule Checker analysis pipeline
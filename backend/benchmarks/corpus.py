@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Synthetic corpus generator
+
+Writes PDF, Word and text documents of configurable size filled with
+marketing-style filler sentences, with known rule violations planted on
+random pages. Decoys are planted too: two sentences whose words would match
+a proximity rule if the sentence break between them were ignored. A
+manifest.json beside the documents records each file's format, page count,
+planted violations and decoys, so benchmark runs can check that the
+violations are still found and the decoys are not. The text written to each page is kept in
+expected/<file>.jsonl, one JSON string per page, to measure extraction
+fidelity against.
+
+Usage:
+    python -m backend.benchmarks.corpus bench_corpus --pages 1 10 100 --count 3
+"""
+
+import argparse
+import json
+import os
+import random
+import textwrap
+from typing import Any, Dict, List, Tuple
+
+from docx import Document as DocxDocument
+
+FILLER = (
+    "the fund seeks long term growth for clients across market cycles while managing "
+    "volatility fees portfolio period capital allocation equity income quarterly annual "
+    "benchmark index our team research process disciplined approach diversified holdings "
+    "investment objective strategy manager advisor firm assets review"
+).split()
+
+# Phrases that trigger a known finding, with the rule type expected for each
+VIOLATIONS = [
+    ("we offer guaranteed returns to every investor", "substantiation"),
+    ("a risk free way to grow your savings", "substantiation"),
+    ("this strategy is always profitable", "substantiation"),
+    ("our cherry picked track record", "performance_advertising"),
+    ("returns over a selected time period", "performance_advertising"),
+    ("projected returns for the coming year", "hypothetical_performance"),
+    ("read a client testimonial from a long time investor", "testimonials_endorsements"),
+    ("a guaranteed profit strategy", "anti_fraud"),
+    ("a foolproof strategy for any market", "anti_fraud"),
+]
+
+# Adjacent sentences that only match a rule across the sentence break, with the rule type they would trigger
+DECOYS = [
+    ("Nothing is guaranteed. Returns depend on the markets.", "substantiation"),
+    ("Our process is never static. Lose sight of costs and fees add up.", "substantiation"),
+    ("The team is always available. Profitable years are never assured.", "substantiation"),
+    ("We aim to be the best. Performance reviews happen every quarter.", "performance_advertising"),
+    ("Some funds use no leverage. Risk remains in every portfolio.", "anti_fraud"),
+    ("No outcome is certain. Returns can be negative.", "anti_fraud"),
+]
+
+FORMATS = ('pdf', 'docx', 'txt')
+
+# Characters per line when laying out PDF pages
+PDF_LINE_CHARS = 90
+
+
+def make_pages(page_count: int, words_per_page: int, rng: random.Random) -> List[str]:
+    """Generate pages of filler sentences"""
+    pages = []
+    for _ in range(page_count):
+        sentences = []
+        remaining = words_per_page
+        while remaining > 0:
+            length = min(rng.randint(8, 20), remaining)
+            remaining -= length
+            sentences.append(' '.join(rng.choice(FILLER) for _ in range(length)).capitalize() + '.')
+        pages.append(' '.join(sentences))
+    return pages
+
+
+def plant_violations(pages: List[str], count: int, rng: random.Random,
+                     phrases: List[Tuple[str, str]] = VIOLATIONS) -> List[Dict[str, Any]]:
+    """Insert `count` phrases at random positions, returning what went where"""
+    planted = []
+    for _ in range(count):
+        phrase, rule_type = rng.choice(phrases)
+        page_index = rng.randrange(len(pages))
+        words = pages[page_index].split(' ')
+        position = rng.randint(0, len(words))
+        pages[page_index] = ' '.join(words[:position] + [phrase] + words[position:])
+        planted.append({'phrase': phrase, 'rule_type': rule_type, 'page': page_index + 1})
+    return planted
+
+
+def write_pdf(path: str, pages: List[str]) -> None:
+    """Write a minimal PDF with one text page per entry, using the built-in Helvetica font"""
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = add(b"")
+    page_ids = []
+    for text in pages:
+        lines = textwrap.wrap(text, PDF_LINE_CHARS)
+        escaped = [line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') for line in lines]
+        stream = "\n".join(["BT /F1 10 Tf 40 800 Td 12 TL"] + [f"({line}) '" for line in escaped] + ["ET"])
+        stream_bytes = stream.encode('latin-1', 'replace')
+        content_id = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream_bytes), stream_bytes))
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 842] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, content_id, font_id)
+        ))
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % page_id for page_id in page_ids), len(page_ids)
+    )
+    catalog_id = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        output += b"%010d 00000 n \n" % offset
+    output += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog_id, xref_offset
+    )
+    with open(path, 'wb') as file:
+        file.write(output)
+
+
+def write_docx(path: str, pages: List[str]) -> None:
+    document = DocxDocument()
+    for index, text in enumerate(pages):
+        if index:
+            document.add_page_break()
+        document.add_paragraph(text)
+    document.save(path)
+
+
+def write_txt(path: str, pages: List[str]) -> None:
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write("\n\n".join(pages))
+
+
+WRITERS = {'pdf': write_pdf, 'docx': write_docx, 'txt': write_txt}
+
+
+def generate(output_dir: str, formats: List[str], page_counts: List[int], count: int,
+             words_per_page: int = 400, violations_per_page: float = 0.5, decoys_per_page: float = 0.25,
+             seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Write a corpus and its manifest
+
+    Args:
+        output_dir: Directory to write documents and manifest.json into
+        formats: Any of 'pdf', 'docx' and 'txt'
+        page_counts: Document sizes to generate, in pages
+        count: Documents per format and size
+        words_per_page: Filler words per page
+        violations_per_page: Average planted violations per page (at least one per document)
+        decoys_per_page: Average planted decoys per page
+        seed: Random seed; the same arguments always produce the same corpus
+
+    Returns:
+        The manifest entries
+    """
+    os.makedirs(os.path.join(output_dir, 'expected'), exist_ok=True)
+    rng = random.Random(seed)
+    manifest = []
+    for file_format in formats:
+        for page_count in page_counts:
+            for index in range(count):
+                pages = make_pages(page_count, words_per_page, rng)
+                planted = plant_violations(pages, max(1, round(page_count * violations_per_page)), rng)
+                decoys = plant_violations(pages, round(page_count * decoys_per_page), rng, DECOYS)
+                filename = f"{file_format}-{page_count:05d}p-{index:03d}.{file_format}"
+                WRITERS[file_format](os.path.join(output_dir, filename), pages)
+                with open(os.path.join(output_dir, 'expected', f"{filename}.jsonl"), 'w', encoding='utf-8') as file:
+                    file.writelines(json.dumps(text) + "\n" for text in pages)
+                manifest.append({
+                    'file': filename,
+                    'format': file_format,
+                    'pages': page_count,
+                    'violations': planted,
+                    'decoys': decoys
+                })
+
+    with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as file:
+        json.dump({'seed': seed, 'words_per_page': words_per_page, 'documents': manifest}, file, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output_dir', help='Directory to write the corpus into')
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=list(FORMATS))
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 10, 100], help='Document sizes in pages')
+    parser.add_argument('--count', type=int, default=3, help='Documents per format and size')
+    parser.add_argument('--words-per-page', type=int, default=400)
+    parser.add_argument('--violations-per-page', type=float, default=0.5)
+    parser.add_argument('--decoys-per-page', type=float, default=0.25)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    manifest = generate(args.output_dir, args.formats, args.pages, args.count,
+                        args.words_per_page, args.violations_per_page, args.decoys_per_page, args.seed)
+    print(f"Wrote {len(manifest)} documents to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
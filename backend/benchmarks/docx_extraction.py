@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Word extraction benchmark
+
+Writes table-heavy RFP responses as .docx files and extracts each one with
+the streaming extractor and with the python-docx object model it replaced.
+Every question is a heading paragraph followed by a table whose header
+cells are merged across the table's width and whose first column is merged
+down each group of rows, and the section header and footer carry a
+disclosure. Reports for each extractor:
+
+- extraction time and tables per second (fastest of --repeat runs)
+- peak RSS growth while extracting, measured in a fresh process so that
+  lxml's C allocations behind python-docx count too
+- merged-cell duplicates: table cell texts reported more than once
+- whether the header and footer disclosures were extracted
+
+Usage:
+    python -m backend.benchmarks.docx_extraction bench_docx --questions 50 500
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from docx import Document as DocxDocument
+
+from ..docx_extractor import iter_docx_pages
+
+HEADER_DISCLOSURE = "Past performance is not a guarantee of future results."
+FOOTER_DISCLOSURE = "Returns are shown net of fees for the period based on the rating date."
+
+COLUMNS = 4
+ROWS_PER_GROUP = 3
+GROUPS_PER_TABLE = 3
+
+# Text of the merged title cell spanning a table's width and of the label cells merged down each group
+TITLE = "Response table {question} spanning every column"
+LABEL = "Composite {question}.{group} merged down the group's rows"
+
+
+def write_rfp(path: str, questions: int) -> None:
+    """Write an RFP response with one merged-cell table per question"""
+    document = DocxDocument()
+    section = document.sections[0]
+    section.header.paragraphs[0].text = HEADER_DISCLOSURE
+    section.footer.paragraphs[0].text = FOOTER_DISCLOSURE
+    for question in range(questions):
+        document.add_paragraph(f"Question {question + 1}. Describe the strategy's performance and fees.")
+        table = document.add_table(rows=1 + ROWS_PER_GROUP * GROUPS_PER_TABLE, cols=COLUMNS)
+        title = table.cell(0, 0).merge(table.cell(0, COLUMNS - 1))
+        title.text = TITLE.format(question=question + 1)
+        for group in range(GROUPS_PER_TABLE):
+            first = 1 + group * ROWS_PER_GROUP
+            label = table.cell(first, 0).merge(table.cell(first + ROWS_PER_GROUP - 1, 0))
+            label.text = LABEL.format(question=question + 1, group=group + 1)
+            for row in range(first, first + ROWS_PER_GROUP):
+                for column in range(1, COLUMNS):
+                    table.cell(row, column).text = f"q{question + 1} r{row} c{column} annualized return figure"
+    document.save(path)
+
+
+def python_docx_text(path: str) -> str:
+    """Text as the python-docx extractor produced it: paragraphs, then every table cell"""
+    doc = DocxDocument(path)
+    text = ""
+    for paragraph in doc.paragraphs:
+        text += paragraph.text + "\n"
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                text += cell.text + " "
+        text += "\n"
+    return text
+
+
+def streaming_text(path: str) -> str:
+    return "\n".join(iter_docx_pages(path))
+
+
+EXTRACTORS: Dict[str, Callable[[str], str]] = {'python-docx': python_docx_text, 'streaming': streaming_text}
+
+
+def merged_cells(questions: int) -> List[str]:
+    """Text of every merged cell written by write_rfp"""
+    cells = []
+    for question in range(questions):
+        cells.append(TITLE.format(question=question + 1))
+        cells.extend(LABEL.format(question=question + 1, group=group + 1) for group in range(GROUPS_PER_TABLE))
+    return cells
+
+
+def peak_rss_kb() -> int:
+    """Peak RSS of this process image (Linux); unlike ru_maxrss it does not carry over from the parent"""
+    with open('/proc/self/status', 'r') as file:
+        for line in file:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1])
+    return 0
+
+
+def rss_growth(name: str, path: str) -> float:
+    """Megabytes the peak RSS of the calling process grows by while extracting"""
+    before = peak_rss_kb()
+    if name == 'streaming':
+        # The analysis consumes the pages one at a time rather than joining them
+        for _ in iter_docx_pages(path):
+            pass
+    else:
+        EXTRACTORS[name](path)
+    return (peak_rss_kb() - before) / 1024
+
+
+def measure(name: str, path: str, questions: int, repeat: int) -> Dict[str, Any]:
+    seconds = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text = EXTRACTORS[name](path)
+        seconds = min(seconds, time.perf_counter() - start)
+
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        peak_mb = pool.submit(rss_growth, name, path).result()
+
+    return {
+        'seconds': seconds,
+        'peak_mb': peak_mb,
+        'duplicates': sum(text.count(cell) - 1 for cell in merged_cells(questions)),
+        'header': HEADER_DISCLOSURE in text,
+        'footer': FOOTER_DISCLOSURE in text
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output_dir', help='Directory to write the generated documents into')
+    parser.add_argument('--questions', type=int, nargs='+', default=[50, 500], help='Tables per document')
+    parser.add_argument('--repeat', type=int, default=3, help='Extractions per document; the fastest is kept')
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    print(f"{'document':<22} {'extractor':<12} {'seconds':>8} {'tables/s':>9} {'RSS MB':>7} "
+          f"{'duplicates':>11} {'header':>7} {'footer':>7}")
+    for questions in args.questions:
+        path = os.path.join(args.output_dir, f"rfp-{questions:05d}q.docx")
+        if not os.path.exists(path):
+            write_rfp(path, questions)
+        results: List[Dict[str, Any]] = []
+        for name in EXTRACTORS:
+            result = measure(name, path, questions, args.repeat)
+            results.append(result)
+            print(f"{os.path.basename(path):<22} {name:<12} {result['seconds']:>8.4f} "
+                  f"{questions / result['seconds']:>9.1f} {result['peak_mb']:>7.1f} {result['duplicates']:>11} "
+                  f"{'yes' if result['header'] else 'no':>7} {'yes' if result['footer'] else 'no':>7}")
+        print(f"{'':<22} speedup {results[0]['seconds'] / results[1]['seconds']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+API load test
+
+Seeds the API with documents through its upload endpoints, then keeps
+`--concurrency` clients sending requests for `--duration` seconds: document
+listings, single documents, job lookups and, for `--write-share` of the
+requests, uploads of already analyzed content. Uploads of known content are
+answered from the analysis cache, so the test loads the API and the database
+rather than the analysis workers. Reports throughput, latency percentiles
+per endpoint and errors.
+
+Without --url, a server is started on a fresh SQLite database in a
+temporary directory and stopped afterwards. With --url the test runs against
+a server that is already up, e.g. one on PostgreSQL, or an older build to
+compare against.
+
+Requires httpx (pip install httpx).
+
+Usage:
+    python -m backend.benchmarks.load_test --concurrency 32 --duration 20
+    python -m backend.benchmarks.load_test --url http://localhost:8000 --documents 0
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, List
+
+import httpx
+
+from .corpus import make_pages
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Documents per seeding request
+SEED_BATCH_SIZE = 50
+
+
+def seed_document() -> bytes:
+    # Fixed content, so every upload after the first is answered from the analysis cache
+    return '\n\n'.join(make_pages(3, 300, random.Random(0))).encode()
+
+
+async def wait_for_job(client: httpx.AsyncClient, job_id: int, timeout: float = 120) -> Dict[str, Any]:
+    deadline = time.monotonic() + timeout
+    while True:
+        job = (await client.get(f"/jobs/{job_id}")).json()
+        if job['status'] in ('done', 'failed', 'cancelled') or time.monotonic() > deadline:
+            return job
+        await asyncio.sleep(0.1)
+
+
+async def seed(client: httpx.AsyncClient, count: int) -> Dict[str, List[int]]:
+    """Upload `count` documents, returning the document and job ids to query"""
+    content = seed_document()
+    ids = {'documents': [], 'jobs': []}
+    if count <= 0:
+        return ids
+
+    response = await client.post('/upload-document/', files={'file': ('seed.txt', content, 'text/plain')})
+    response.raise_for_status()
+    job = await wait_for_job(client, response.json()['id'])
+    ids['documents'].append(job['document_id'])
+    ids['jobs'].append(job['id'])
+
+    remaining = count - 1
+    while remaining > 0:
+        batch = min(remaining, SEED_BATCH_SIZE)
+        files = [('files', (f'seed{index}.txt', content, 'text/plain')) for index in range(batch)]
+        response = await client.post('/upload-documents/', files=files)
+        response.raise_for_status()
+        for job in response.json():
+            ids['documents'].append(job['document_id'])
+            ids['jobs'].append(job['id'])
+        remaining -= batch
+    return ids
+
+
+async def run_load(client: httpx.AsyncClient, ids: Dict[str, List[int]], concurrency: int,
+                   duration: float, write_share: float) -> Dict[str, Any]:
+    content = seed_document()
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    deadline = time.monotonic() + duration
+
+    async def request(rng: random.Random) -> None:
+        roll = rng.random()
+        if roll < write_share:
+            name = 'POST /upload-document/'
+            call = client.post('/upload-document/', files={'file': ('load.txt', content, 'text/plain')})
+        elif not ids['documents'] or roll < write_share + (1 - write_share) / 3:
+            name = 'GET /documents/'
+            call = client.get('/documents/', params={'limit': 50})
+        elif roll < write_share + 2 * (1 - write_share) / 3:
+            name = 'GET /documents/{id}'
+            call = client.get(f"/documents/{rng.choice(ids['documents'])}")
+        else:
+            name = 'GET /jobs/{id}'
+            call = client.get(f"/jobs/{rng.choice(ids['jobs'])}")
+
+        start = time.perf_counter()
+        try:
+            response = await call
+            failed = response.status_code >= 400
+        except httpx.HTTPError:
+            failed = True
+        latencies[name].append(time.perf_counter() - start)
+        if failed:
+            errors[name] += 1
+
+    async def client_loop(seed_value: int) -> None:
+        rng = random.Random(seed_value)
+        while time.monotonic() < deadline:
+            await request(rng)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop(index) for index in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        'seconds': elapsed,
+        'requests': sum(len(values) for values in latencies.values()),
+        'endpoints': {name: _summarize(values, errors[name]) for name, values in sorted(latencies.items())}
+    }
+
+
+def _summarize(latencies: List[float], errors: int) -> Dict[str, float]:
+    ordered = sorted(latencies)
+
+    def percentile(share: float) -> float:
+        return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+    return {'count': len(ordered), 'errors': errors, 'mean': statistics.fmean(ordered),
+            'p50': percentile(0.5), 'p95': percentile(0.95), 'p99': percentile(0.99)}
+
+
+def report(results: Dict[str, Any]) -> None:
+    print(f"{results['requests']} requests in {results['seconds']:.1f}s: "
+          f"{results['requests'] / results['seconds']:.1f} requests/s")
+    print(f"{'endpoint':<26} {'count':>7} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, summary in results['endpoints'].items():
+        print(f"{name:<26} {summary['count']:>7} {summary['errors']:>7} {summary['p50'] * 1000:>8.1f} "
+              f"{summary['p95'] * 1000:>8.1f} {summary['p99'] * 1000:>8.1f}")
+
+
+def start_server(work_dir: str, port: int) -> subprocess.Popen:
+    """Run the API with uvicorn on a fresh SQLite database inside `work_dir`"""
+    env = {
+        **os.environ,
+        'PYTHONPATH': REPOSITORY_ROOT,
+        'DATABASE_URL': f"sqlite:///{os.path.join(work_dir, 'load_test.db')}",
+        'RESCORE_POLL_INTERVAL': '3600'
+    }
+    return subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'backend.main:app', '--port', str(port), '--log-level', 'warning'],
+        cwd=work_dir, env=env
+    )
+
+
+async def wait_until_up(client: httpx.AsyncClient, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if (await client.get('/health')).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError("API did not start")
+        await asyncio.sleep(0.2)
+
+
+async def main_async(args) -> None:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as client:
+        await wait_until_up(client)
+        print(f"Seeding {args.documents} documents")
+        ids = await seed(client, args.documents)
+        print(f"Running {args.concurrency} clients for {args.duration:.0f}s")
+        results = await run_load(client, ids, args.concurrency, args.duration, args.write_share)
+    report(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='API to test; a local server is started when omitted')
+    parser.add_argument('--port', type=int, default=8765, help='Port of the local server')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--documents', type=int, default=200, help='Documents uploaded before the test')
+    parser.add_argument('--write-share', type=float, default=0.1, help='Share of requests that are uploads')
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(main_async(args))
+        return
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        server = start_server(work_dir, args.port)
+        args.url = f"http://127.0.0.1:{args.port}"
+        try:
+            asyncio.run(main_async(args))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
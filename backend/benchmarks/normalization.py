@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Text normalization benchmark
+
+Normalizes pages of generated marketing copy, with its hyphenated words,
+apostrophes and planted claims such as "risk-free", with the
+stretch-at-a-time normalization and with the per-character offset list it
+replaced. Each page is also normalized as a typeset copy, with
+typographic quotes and dashes in place of straight quotes and hyphens.
+Reports for each normalizer:
+
+- seconds and megabytes of text per second (fastest of --repeat runs)
+- peak memory allocated while normalizing one page, and the size of its offset map
+- pages whose cleaned text is the same when typeset as when written
+
+Usage:
+    python -m backend.benchmarks.normalization --pages 500
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+import tracemalloc
+from array import array
+from typing import Any, Callable, Dict, List, Tuple
+
+from ..document_parser import DocumentParser
+from .text_extraction import PARAGRAPHS, PLANTED
+
+# Whitespace runs and runs of kept characters, as the replaced normalization matched them
+CLEAN_RUNS = re.compile(r'(\s+)|([\w\.\,\!\?\;\:\-\(\)\"\'%\$]+)')
+
+
+def per_character_offsets(text: str) -> Tuple[str, array]:
+    """The replaced normalization: lower-case, then one offset per cleaned character"""
+    lowered = text.lower()
+    origins = None
+    if len(lowered) != len(text):
+        origins = [index for index, char in enumerate(text) for _ in char.lower()]
+
+    parts = []
+    offsets = array('q')
+    for run in CLEAN_RUNS.finditer(lowered):
+        start, end = run.span()
+        if run.lastindex == 1:
+            parts.append(' ')
+            offsets.append(start)
+        else:
+            parts.append(run.group())
+            offsets.extend(range(start, end))
+    cleaned = ''.join(parts)
+
+    stripped = cleaned.strip()
+    if len(stripped) != len(cleaned):
+        leading = len(cleaned) - len(cleaned.lstrip())
+        offsets = offsets[leading:leading + len(stripped)]
+    if origins is not None:
+        offsets = array('q', (origins[offset] for offset in offsets))
+    return stripped, offsets
+
+
+NORMALIZERS: Dict[str, Callable[[str], Tuple[str, Any]]] = {
+    'per_character': per_character_offsets,
+    'stretches': DocumentParser.clean_text_with_offsets,
+}
+
+# Straight quotes and hyphens as a typesetter would print them
+TYPESET = ((re.compile(r'"(\w)'), '\u201c\\1'), (re.compile(r'"'), '\u201d'), (re.compile(r"'"), '\u2019'),
+           (re.compile(r'(\w)-(\w)'), '\\1\u2013\\2'), (re.compile(r' - '), ' \u2014 '))
+
+
+def typeset(text: str) -> str:
+    for pattern, replacement in TYPESET:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def copy_pages(count: int, paragraphs_per_page: int = 40, seed: int = 0) -> List[str]:
+    """Pages of paragraphs separated by blank lines, with a planted claim in about one paragraph in ten"""
+    rng = random.Random(seed)
+    return ["\n\n".join(rng.choice(PARAGRAPHS) + (f" {rng.choice(PLANTED)}." if rng.random() < 0.1 else "")
+                        for _ in range(paragraphs_per_page))
+            for _ in range(count)]
+
+
+def map_size(offsets: Any) -> int:
+    if isinstance(offsets, array):
+        return sys.getsizeof(offsets)
+    return sys.getsizeof(offsets) + sys.getsizeof(offsets.starts) + sys.getsizeof(offsets.origins)
+
+
+def run(pages: List[str], repeat: int) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    for name, normalize in NORMALIZERS.items():
+        seconds = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for text in pages:
+                normalize(text)
+            seconds = min(seconds, time.perf_counter() - start)
+
+        longest = max(pages, key=len)
+        tracemalloc.start()
+        _, offsets = normalize(longest)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        results[name] = {
+            'seconds': seconds,
+            'peak_kb': peak / 1024,
+            'map_kb': map_size(offsets) / 1024,
+            'page_chars': len(longest),
+            'unchanged': sum(normalize(text)[0] == normalize(typeset(text))[0] for text in pages),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=500, help='Pages of copy to normalize')
+    parser.add_argument('--repeat', type=int, default=3, help='Passes over the corpus; the fastest is kept')
+    args = parser.parse_args()
+
+    pages = copy_pages(args.pages)
+    megabytes = sum(map(len, pages)) / (1024 * 1024)
+    results = run(pages, args.repeat)
+    print(f"{len(pages)} pages, {megabytes:.1f}MB of text")
+    print(f"{'normalizer':<14} {'seconds':>8} {'MB/s':>7} {'peak KB':>8} {'map KB':>7} {'same when typeset':>18}")
+    for name, result in results.items():
+        print(f"{name:<14} {result['seconds']:>8.4f} {megabytes / result['seconds']:>7.1f} "
+              f"{result['peak_kb']:>8.1f} {result['map_kb']:>7.1f} {result['unchanged']:>11}/{len(pages)}")
+    print(f"(peak and map sizes for the longest page, {results['stretches']['page_chars']} characters)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+PDF extractor benchmark
+
+Extracts every PDF of a corpus written by backend.benchmarks.corpus with each
+extraction backend on its own and reports pages per second and text
+fidelity against the text the corpus generator wrote:
+
+- word accuracy: share of the expected words recovered in order
+  (difflib matching blocks over the word sequences of each page)
+- phrase recall: share of planted violation phrases found intact after
+  whitespace is collapsed, which is what the rule patterns depend on
+
+Backends that are not installed are reported and skipped.
+
+Usage:
+    python -m backend.benchmarks.corpus bench_corpus --formats pdf --pages 10 100
+    python -m backend.benchmarks.pdf_extractors bench_corpus --backends pypdfium2 pypdf2 pdfminer
+"""
+
+import argparse
+import difflib
+import json
+import os
+import time
+from typing import Any, Dict, List
+
+from ..pdf_extractors import EXTRACTORS
+
+
+def load_corpus(corpus_dir: str) -> List[Dict[str, Any]]:
+    """PDF manifest entries, each with its expected page text"""
+    with open(os.path.join(corpus_dir, 'manifest.json'), 'r', encoding='utf-8') as file:
+        manifest = json.load(file)
+    documents = []
+    for entry in manifest['documents']:
+        if entry['format'] != 'pdf':
+            continue
+        with open(os.path.join(corpus_dir, 'expected', f"{entry['file']}.jsonl"), 'r', encoding='utf-8') as file:
+            expected = [json.loads(line) for line in file]
+        documents.append({**entry, 'path': os.path.join(corpus_dir, entry['file']), 'expected': expected})
+    return documents
+
+
+def word_accuracy(expected: str, actual: str) -> float:
+    expected_words = expected.split()
+    if not expected_words:
+        return 1.0
+    matcher = difflib.SequenceMatcher(None, expected_words, actual.split(), autojunk=False)
+    return sum(block.size for block in matcher.get_matching_blocks()) / len(expected_words)
+
+
+def run_backend(name: str, documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+    pages = 0
+    seconds = 0.0
+    accuracy = 0.0
+    phrases = found = 0
+    for document in documents:
+        start = time.perf_counter()
+        extractor = EXTRACTORS[name](document['path'])
+        try:
+            texts = [extractor.extract_page(index) for index in range(extractor.page_count)]
+        finally:
+            extractor.close()
+        seconds += time.perf_counter() - start
+
+        pages += len(document['expected'])
+        for index, expected in enumerate(document['expected']):
+            accuracy += word_accuracy(expected, texts[index] if index < len(texts) else '')
+        for violation in document['violations']:
+            phrases += 1
+            page_text = texts[violation['page'] - 1] if violation['page'] <= len(texts) else ''
+            found += violation['phrase'] in ' '.join(page_text.split())
+
+    return {
+        'pages_per_second': pages / seconds,
+        'word_accuracy': accuracy / pages,
+        'phrase_recall': found / phrases if phrases else 1.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('corpus_dir', help='Directory written by backend.benchmarks.corpus')
+    parser.add_argument('--backends', nargs='+', choices=sorted(EXTRACTORS), default=sorted(EXTRACTORS))
+    args = parser.parse_args()
+
+    documents = load_corpus(args.corpus_dir)
+    if not documents:
+        parser.error(f"No PDFs in {args.corpus_dir}")
+    print(f"{sum(len(d['expected']) for d in documents)} pages in {len(documents)} PDFs")
+    print(f"{'backend':<12} {'pages/s':>10} {'word acc':>9} {'phrases':>8}")
+    for name in args.backends:
+        try:
+            results = run_backend(name, documents)
+        except ImportError as e:
+            print(f"{name:<12} not installed ({str(e)})")
+            continue
+        print(f"{name:<12} {results['pages_per_second']:>10.1f} {results['word_accuracy']:>9.2%} "
+              f"{results['phrase_recall']:>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
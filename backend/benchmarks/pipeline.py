@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Analysis pipeline benchmark
+
+Runs every document of a corpus written by backend.benchmarks.corpus through
+the analysis engine, timing each stage it records in its results (text
+extraction, cleaning, segmentation, the rule scan, each compliance check and
+scoring) and the database write. Reports totals per stage, pages per second
+by format and size, and peak RSS, how often the token index prefilter
+skipped a pattern, and checks that every planted violation was reported.
+
+With --save-baseline the results are written to a JSON file; with --baseline
+they are compared against one, and the run exits with status 1 if any stage
+got slower than the tolerance allows or the findings changed.
+
+Usage:
+    python -m backend.benchmarks.corpus bench_corpus --pages 1 10 100
+    python -m backend.benchmarks.pipeline bench_corpus --save-baseline baseline.json
+    python -m backend.benchmarks.pipeline bench_corpus --baseline baseline.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Any, Dict, List
+
+from sqlalchemy.orm import sessionmaker
+
+from .. import models, rollups
+from ..compliance_engine import compliance_engine
+from ..database import make_engine, upgrade_schema
+from ..findings import rule_catalog
+from ..jobs import analysis_record
+from ..rule_matcher import PREFILTER_OUTCOMES
+
+# Stages the engine reports in a result's stage_timings, then the database write
+STAGES = ('extraction', 'clean_text', 'segment', 'scan', *(check[1:] for check in compliance_engine.CHECKS),
+          'scoring', 'db_write')
+
+
+def _write(session_factory, path: str, document_type: str, analysis_result: Dict[str, Any]) -> None:
+    db = session_factory()
+    try:
+        document = models.Document(filename=os.path.basename(path), original_filename=os.path.basename(path),
+                                   file_path=path, document_type=document_type,
+                                   file_size=os.path.getsize(path), uploaded_at=datetime.utcnow())
+        db.add(document)
+        db.flush()
+        rule_catalog.ensure(db, analysis_result['findings'])
+        rollups.record(db, [(document, analysis_result)])
+        db.add(analysis_record(document.id, analysis_result))
+        db.commit()
+    finally:
+        db.close()
+
+
+def analyze_document(path: str, session_factory, timings: Dict[str, float],
+                     document_type: str = "advertisement") -> Dict[str, Any]:
+    """Analyze one document with the engine, adding its stage timings and the database write to `timings`"""
+    analysis_result = compliance_engine.analyze(path, document_type)
+    for stage, seconds in analysis_result.get('stage_timings', {}).items():
+        timings[stage] += seconds
+    start = time.perf_counter()
+    _write(session_factory, path, document_type, analysis_result)
+    timings['db_write'] += time.perf_counter() - start
+    return analysis_result
+
+
+def run(corpus_dir: str, repeat: int) -> Dict[str, Any]:
+    """
+    Benchmark every document in a corpus
+
+    Each document is analyzed `repeat` times and its fastest run is kept,
+    stage by stage.
+
+    Returns:
+        Results in the form stored as a baseline
+    """
+    with open(os.path.join(corpus_dir, 'manifest.json'), 'r', encoding='utf-8') as file:
+        manifest = json.load(file)
+
+    stage_totals = defaultdict(float)
+    groups = defaultdict(lambda: {'pages': 0, 'seconds': 0.0})
+    fingerprint = hashlib.sha256()
+    prefilter = Counter()
+    missed = []
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        db_engine = make_engine(f"sqlite:///{os.path.join(db_dir, 'benchmark.db')}")
+        upgrade_schema(db_engine)
+        session_factory = sessionmaker(bind=db_engine)
+
+        for entry in manifest['documents']:
+            path = os.path.join(corpus_dir, entry['file'])
+            best = None
+            for _ in range(repeat):
+                timings = defaultdict(float)
+                analysis_result = analyze_document(path, session_factory, timings)
+                if best is None or sum(timings.values()) < sum(best.values()):
+                    best = timings
+
+            for stage, seconds in best.items():
+                stage_totals[stage] += seconds
+            group = groups[f"{entry['format']}/{entry['pages']}p"]
+            group['pages'] += entry['pages']
+            group['seconds'] += sum(best.values())
+            prefilter.update(analysis_result['prefilter'])
+
+            found = {finding['rule_type'] for finding in analysis_result['findings']}
+            for violation in entry['violations']:
+                if violation['rule_type'] not in found:
+                    missed.append(f"{entry['file']}: {violation['rule_type']} ({violation['phrase']})")
+            fingerprint.update(json.dumps([entry['file'], analysis_result['overall_score'],
+                                           sorted(f['description'] for f in analysis_result['findings'])]).encode())
+        db_engine.dispose()
+
+    return {
+        'stages': {stage: stage_totals[stage] for stage in STAGES},
+        'groups': {name: {**group, 'pages_per_second': group['pages'] / group['seconds']}
+                   for name, group in sorted(groups.items())},
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'findings_fingerprint': fingerprint.hexdigest()[:16],
+        'prefilter': {outcome: prefilter[outcome] for outcome in PREFILTER_OUTCOMES},
+        'missed_violations': missed
+    }
+
+
+def report(results: Dict[str, Any]) -> None:
+    total = sum(results['stages'].values())
+    print(f"{'stage':<34} {'seconds':>9} {'share':>7}")
+    for stage, seconds in results['stages'].items():
+        print(f"{stage:<34} {seconds:>9.4f} {seconds / total:>6.1%}")
+    print(f"{'total':<34} {total:>9.4f}")
+    print()
+    print(f"{'format/size':<20} {'pages/s':>10}")
+    for name, group in results['groups'].items():
+        print(f"{name:<20} {group['pages_per_second']:>10.1f}")
+    print()
+    print(f"Peak RSS: {results['peak_rss_mb']:.1f} MB")
+    prefilter = results.get('prefilter')
+    if prefilter:
+        windows = sum(prefilter.values())
+        ran = prefilter['matched'] + prefilter['unmatched']
+        print(f"Prefilter: {prefilter['skipped'] / windows:.1%} of pattern windows skipped, "
+              f"{prefilter['matched'] / ran if ran else 0:.1%} of those run matched")
+    print(f"Findings fingerprint: {results['findings_fingerprint']}")
+    for missed in results['missed_violations']:
+        print(f"MISSED {missed}")
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, min_delta: float) -> List[str]:
+    """
+    List regressions against a baseline
+
+    A stage, or the documents of one format and size, regress when they are
+    more than `tolerance` (relative) and more than `min_delta` seconds
+    slower, so tiny stages do not fail on noise.
+    """
+    def slower(seconds: float, previous: float) -> bool:
+        return seconds > previous * (1 + tolerance) and seconds - previous > min_delta
+
+    regressions = []
+    for stage, seconds in results['stages'].items():
+        previous = baseline['stages'].get(stage)
+        if previous is not None and slower(seconds, previous):
+            regressions.append(f"{stage}: {previous:.4f}s -> {seconds:.4f}s (+{seconds / previous - 1:.0%})")
+    for name, group in results['groups'].items():
+        previous = baseline['groups'].get(name)
+        if previous is not None and slower(group['seconds'], previous['seconds']):
+            regressions.append(f"{name}: {previous['pages_per_second']:.1f} -> "
+                               f"{group['pages_per_second']:.1f} pages/s")
+    if results['findings_fingerprint'] != baseline['findings_fingerprint']:
+        regressions.append("findings differ from the baseline run")
+    if results['missed_violations']:
+        regressions.append(f"{len(results['missed_violations'])} planted violations not reported")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('corpus_dir', help='Directory written by backend.benchmarks.corpus')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--save-baseline', metavar='PATH', help='Write the results to a baseline file')
+    parser.add_argument('--baseline', metavar='PATH', help='Compare against a baseline file')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative slowdown per stage')
+    parser.add_argument('--min-delta', type=float, default=0.005, help='Ignore slowdowns smaller than this many seconds')
+    args = parser.parse_args()
+
+    results = run(args.corpus_dir, args.repeat)
+    report(results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.tolerance, args.min_delta)
+        print()
+        if regressions:
+            print("Regressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Rule matcher benchmark
+
+Compares the compiled rule set against the previous approach of calling
+re.search(pattern, text, re.IGNORECASE) per check (plus a second search for
+the context snippet), across document sizes and rule counts.
+
+Usage:
+    python -m backend.benchmarks.rule_matcher --sizes 100000 1000000 --rule-counts 50 200
+"""
+
+import argparse
+import copy
+import random
+import re
+import time
+from typing import Dict, List, Any
+
+from ..rule_matcher import CompiledRuleSet
+from ..rule_packs import rule_packs
+
+VOCABULARY = (
+    "the fund seeks long term growth for clients across market cycles while managing "
+    "volatility fees returns performance investor advisor strategy portfolio period "
+    "risk capital allocation equity income quarterly annual benchmark index"
+).split()
+
+# Terms that rarely occur in the filler text, used to build synthetic rules
+RULE_TERMS = (
+    "leverage derivative outperform superior unmatched exclusive premier proven "
+    "consistent elite unbeatable secure protected insured assured stable certified"
+).split()
+
+PLANTED_PHRASES = [
+    "past performance is not a guarantee of future results",
+    "net of fees",
+    "client testimonial",
+    "award winning",
+    "risk free",
+    "selected time period",
+]
+
+
+def make_text(size: int, seed: int = 0) -> str:
+    """Generate lower-cased filler text of roughly `size` characters"""
+    rng = random.Random(seed)
+    words = []
+    length = 0
+    while length < size:
+        if rng.random() < 0.002:
+            word = rng.choice(PLANTED_PHRASES)
+        else:
+            word = rng.choice(VOCABULARY)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+
+def make_rules(rule_count: int, seed: int = 0) -> Dict[str, Any]:
+    """Return the active rule pack's rules padded with synthetic proximity patterns up to `rule_count`"""
+    rules = copy.deepcopy(rule_packs.current().rules)
+    existing = len(CompiledRuleSet(rules).patterns)
+    rng = random.Random(seed)
+    synthetic = set()
+    while len(synthetic) < max(0, rule_count - existing):
+        first, second = rng.choice(RULE_TERMS), rng.choice(VOCABULARY)
+        synthetic.add(rf'{first}.{{0,{rng.randint(10, 50)}}}{second}')
+    rules['synthetic'] = {'patterns': sorted(synthetic)}
+    return rules
+
+
+def legacy_scan(patterns: List[str], text: str) -> Dict[str, Any]:
+    """The pre-compiled-rule-set behaviour: one IGNORECASE search per pattern, another for context"""
+    results = {}
+    for pattern in patterns:
+        if re.search(pattern, text, re.IGNORECASE):
+            results[pattern] = re.search(pattern, text, re.IGNORECASE).span()
+    return results
+
+
+def _best_of(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes: List[int], rule_counts: List[int], repeat: int) -> None:
+    print(f"{'chars':>10} {'rules':>6} {'legacy s':>10} {'compiled s':>11} {'speedup':>8}")
+    for rule_count in rule_counts:
+        rule_set = CompiledRuleSet(make_rules(rule_count))
+        for size in sizes:
+            text = make_text(size)
+
+            # Both paths must agree on the first match of every pattern
+            expected = legacy_scan(rule_set.patterns, text)
+            scan = rule_set.scan(text)
+            actual = {p: scan.first(p) for p in rule_set.patterns if scan.found(p)}
+            assert actual == expected, "compiled rule set disagrees with re.search"
+
+            legacy = _best_of(lambda: legacy_scan(rule_set.patterns, text), repeat)
+            compiled = _best_of(lambda: rule_set.scan(text), repeat)
+            print(f"{size:>10} {len(rule_set.patterns):>6} {legacy:>10.4f} {compiled:>11.4f} {legacy / compiled:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--rule-counts', type=int, nargs='+', default=[50, 100, 200])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    run(args.sizes, args.rule_counts, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
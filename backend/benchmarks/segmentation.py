@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Segmented scan benchmark
+
+Scans the page text of a corpus written by backend.benchmarks.corpus two
+ways: over the whole flattened text, as before segmentation, and split into
+sentences and paragraphs with the token index skipping patterns a page
+cannot match. Reports for each:
+
+- scan time and pages per second (segmentation and indexing included)
+- planted violations matched by a pattern overlapping them
+- decoy matches: matches running across the sentence break inside a decoy
+- false findings: findings all of whose matches are decoy matches
+
+Usage:
+    python -m backend.benchmarks.corpus bench_corpus --formats txt --pages 10 100
+    python -m backend.benchmarks.segmentation bench_corpus
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, List, Tuple
+
+from ..compliance_engine import compliance_engine
+from ..document_parser import DocumentParser
+
+MODES = ('full_text', 'segmented')
+
+
+def load_corpus(corpus_dir: str) -> List[Dict[str, Any]]:
+    """Manifest entries with their expected page text"""
+    with open(os.path.join(corpus_dir, 'manifest.json'), 'r', encoding='utf-8') as file:
+        manifest = json.load(file)
+    documents = []
+    for entry in manifest['documents']:
+        with open(os.path.join(corpus_dir, 'expected', f"{entry['file']}.jsonl"), 'r', encoding='utf-8') as file:
+            documents.append({**entry, 'pages': [json.loads(line) for line in file]})
+    return documents
+
+
+def phrase_spans(pages: List[str], planted: List[Dict[str, Any]]) -> List[Tuple[int, int, int, Dict[str, Any]]]:
+    """(page, start, end, entry) of every occurrence of each planted phrase in the page text"""
+    spans = []
+    for entry in planted:
+        text = pages[entry['page'] - 1]
+        start = text.find(entry['phrase'])
+        while start != -1:
+            spans.append((entry['page'], start, start + len(entry['phrase']), entry))
+            start = text.find(entry['phrase'], start + 1)
+    return spans
+
+
+def scan_document(pages: List[str], segmented: bool):
+    rule_set = compliance_engine.rule_pack.rule_set
+    cleaned_pages = [(text, *DocumentParser.clean_text_with_offsets(text)) for text in pages]
+
+    start = time.perf_counter()
+    scan = rule_set.stream()
+    for page_number, (text, cleaned, offsets) in enumerate(cleaned_pages, 1):
+        tokens = None
+        if segmented:
+            cleaned = DocumentParser.segment(cleaned, text, offsets)
+            tokens = DocumentParser.index_tokens(cleaned)
+        scan.feed(page_number, cleaned, text, offsets, tokens)
+    matches = scan.finish()
+    return matches, time.perf_counter() - start
+
+
+def run(documents: List[Dict[str, Any]], repeat: int) -> Dict[str, Dict[str, Any]]:
+    rules = compliance_engine.rule_pack.rules
+    results = {mode: {'seconds': 0.0, 'pages': 0, 'violations': 0, 'violations_found': 0,
+                      'decoy_matches': 0, 'false_findings': 0} for mode in MODES}
+    for document in documents:
+        violations = phrase_spans(document['pages'], document['violations'])
+        # Only a match spanning the break between a decoy's two sentences is false
+        decoy_breaks = [(page, start + entry['phrase'].index('. ') + 1)
+                        for page, start, _, entry in phrase_spans(document['pages'], document.get('decoys', []))]
+
+        for mode in MODES:
+            seconds = float('inf')
+            for _ in range(repeat):
+                matches, elapsed = scan_document(document['pages'], mode == 'segmented')
+                seconds = min(seconds, elapsed)
+            result = results[mode]
+            result['seconds'] += seconds
+            result['pages'] += len(document['pages'])
+
+            locations = [location for pattern in matches.patterns() for location in matches.locations(pattern)]
+            result['violations'] += len(violations)
+            result['violations_found'] += sum(
+                any(match_page == page and match_start < end and match_end > start
+                    for match_page, match_start, _, match_end in locations)
+                for page, start, end, _ in violations
+            )
+
+            def crosses_decoy(location) -> bool:
+                start_page, start, end_page, end = location
+                return any(start_page == end_page == page and start < position < end
+                           for page, position in decoy_breaks)
+
+            result['decoy_matches'] += sum(crosses_decoy(location) for location in locations)
+            for finding in compliance_engine._run_checks(matches, rules):
+                found = finding.get('matches')
+                if found and all(crosses_decoy((match['page'], match['start'], match.get('end_page', match['page']),
+                                                match['end'])) for match in found):
+                    result['false_findings'] += 1
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('corpus_dir', help='Directory written by backend.benchmarks.corpus')
+    parser.add_argument('--repeat', type=int, default=3, help='Scans per document; the fastest is kept')
+    args = parser.parse_args()
+
+    documents = load_corpus(args.corpus_dir)
+    results = run(documents, args.repeat)
+    print(f"{sum(len(d['pages']) for d in documents)} pages in {len(documents)} documents")
+    print(f"{'mode':<10} {'scan s':>8} {'pages/s':>9} {'violations':>11} {'decoy matches':>14} {'false findings':>15}")
+    for mode, result in results.items():
+        print(f"{mode:<10} {result['seconds']:>8.4f} {result['pages'] / result['seconds']:>9.1f} "
+              f"{result['violations_found']:>5}/{result['violations']:<5} {result['decoy_matches']:>14} "
+              f"{result['false_findings']:>15}")
+
+
+if __name__ == "__main__":
+    main()
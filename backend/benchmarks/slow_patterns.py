@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Slow pattern finder
+
+Times every pattern of a rule pack on generated text built to make regexes
+backtrack, so a pack can be checked before it is deployed. The text is
+lower-case and has no punctuation, so it is one long sentence to the scan:
+
+- words: the pattern's own words in random order
+- repeated: the pattern's first word over and over
+- unfinished: its words up to the last one, in order, over and over, so
+  every chained `.{0,n}` starts everywhere and never completes
+- glued: its words in random order, about half run together without a space
+- characters: random characters of its words, with spaces
+
+Each kind of text is generated at every --chars length, --rounds times for
+the random kinds, and the slowest round is kept. A pattern is flagged when
+it times out, when it takes longer than --max-ms on the longest text, or
+when its time grows faster than the text does (time ratio over length ratio
+raised to --max-growth, between the shortest and longest text).
+
+Exits with status 1 when a pattern is flagged.
+
+Usage:
+    python -m backend.benchmarks.slow_patterns
+    python -m backend.benchmarks.slow_patterns my_pack.yaml --chars 5000 20000 --rounds 10
+"""
+
+import argparse
+import math
+import random
+import re
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import regex
+
+from ..rule_matcher import RULE_TIME_BUDGET_SECONDS, CompiledRuleSet
+from ..rule_packs import RULE_PACK_PATH, RulePackError, parse_rule_pack, validate_rule_pack
+
+# Escapes, repeat counts and group openers, which hold no words of the pattern
+NON_WORDS = re.compile(r'\\.|\{[\d,]*\}|\(\?[:=!<]*')
+
+# Times below this many seconds are too noisy to measure growth from
+MIN_GROWTH_SECONDS = 0.0005
+
+
+def pattern_words(pattern: str) -> List[str]:
+    """Words written in a pattern, in order, for building text it almost matches"""
+    words = [word for word in re.findall(r'[a-z0-9]+', NON_WORDS.sub(' ', pattern.lower()))]
+    return words or ['a']
+
+
+def _fill(chars: int, next_piece: Callable[[], str]) -> str:
+    pieces = []
+    length = 0
+    while length < chars:
+        piece = next_piece()
+        pieces.append(piece)
+        length += len(piece)
+    return ''.join(pieces)[:chars]
+
+
+def words_text(words: List[str], chars: int, rng: random.Random) -> str:
+    return _fill(chars, lambda: rng.choice(words) + ' ')
+
+
+def repeated_text(words: List[str], chars: int, rng: random.Random) -> str:
+    return _fill(chars, lambda: words[0] + ' ')
+
+
+def unfinished_text(words: List[str], chars: int, rng: random.Random) -> str:
+    prefix = ' '.join(words[:-1] or words) + ' '
+    return _fill(chars, lambda: prefix)
+
+
+def glued_text(words: List[str], chars: int, rng: random.Random) -> str:
+    return _fill(chars, lambda: rng.choice(words) + rng.choice(('', ' ')))
+
+
+def characters_text(words: List[str], chars: int, rng: random.Random) -> str:
+    alphabet = ''.join(sorted(set(''.join(words)))) + ' '
+    return ''.join(rng.choice(alphabet) for _ in range(chars))
+
+
+# Kinds of generated text, and whether they differ between rounds
+GENERATORS: Dict[str, Callable[[List[str], int, random.Random], str]] = {
+    'words': words_text,
+    'repeated': repeated_text,
+    'unfinished': unfinished_text,
+    'glued': glued_text,
+    'characters': characters_text,
+}
+RANDOM_GENERATORS = {'words', 'glued', 'characters'}
+
+
+def time_pattern(compiled: regex.Pattern, text: str, timeout: Optional[float]) -> Optional[float]:
+    """Seconds to find every match in the text; None when the search times out"""
+    start = time.perf_counter()
+    try:
+        for _ in compiled.finditer(text, timeout=timeout):
+            pass
+    except TimeoutError:
+        return None
+    return time.perf_counter() - start
+
+
+def profile(pattern: str, sizes: List[int], rounds: int, timeout: Optional[float]) -> Dict[str, Any]:
+    """Slowest time of a pattern at each size, the text kind it was slowest on, and its growth"""
+    compiled = CompiledRuleSet._compile(pattern)
+    words = pattern_words(pattern)
+    worst: Dict[str, List[Optional[float]]] = {}
+    for name, generate in GENERATORS.items():
+        times = []
+        for chars in sizes:
+            slowest = 0.0
+            for round_number in range(rounds if name in RANDOM_GENERATORS else 1):
+                seconds = time_pattern(compiled, generate(words, chars, random.Random(round_number)), timeout)
+                if seconds is None:
+                    slowest = None
+                    break
+                slowest = max(slowest, seconds)
+            times.append(slowest)
+            if slowest is None:
+                break
+        worst[name] = times + [None] * (len(sizes) - len(times))
+
+    def severity(times: List[Optional[float]]) -> float:
+        return math.inf if None in times else times[-1]
+
+    kind = max(worst, key=lambda name: severity(worst[name]))
+    times = worst[kind]
+    growth = None
+    if None not in times and len(sizes) > 1 and times[0] >= MIN_GROWTH_SECONDS:
+        growth = math.log(times[-1] / times[0]) / math.log(sizes[-1] / sizes[0])
+    return {'pattern': pattern, 'text': kind, 'seconds': times, 'growth': growth}
+
+
+def flag(result: Dict[str, Any], max_seconds: float, max_growth: float) -> Optional[str]:
+    """Why a pattern's profile makes it too slow to deploy, if it does"""
+    seconds = result['seconds']
+    if None in seconds:
+        return 'timed out'
+    if seconds[-1] > max_seconds:
+        return f'over {max_seconds * 1000:.0f} ms'
+    if result['growth'] is not None and result['growth'] > max_growth:
+        return f'grows as length^{result["growth"]:.1f}'
+    return None
+
+
+def load_patterns(path: str) -> List[str]:
+    with open(path, 'rb') as file:
+        content = file.read()
+    _, _, rules, anchors = validate_rule_pack(parse_rule_pack(content, path))
+    return CompiledRuleSet(rules, anchors).patterns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('rule_pack', nargs='?', default=RULE_PACK_PATH, help='Rule pack file to check')
+    parser.add_argument('--chars', type=int, nargs='+', default=[2000, 20000],
+                        help='Lengths of generated text; the default longest is one text file page')
+    parser.add_argument('--rounds', type=int, default=5, help='Seeds of each random kind of text')
+    parser.add_argument('--max-ms', type=float, default=50, help='Slowest allowed time on the longest text')
+    parser.add_argument('--max-growth', type=float, default=1.5,
+                        help='Largest allowed exponent of time growth with text length')
+    parser.add_argument('--timeout', type=float, default=RULE_TIME_BUDGET_SECONDS or None,
+                        help='Seconds after which one search is stopped (default: the per-rule time budget)')
+    args = parser.parse_args()
+
+    try:
+        patterns = load_patterns(args.rule_pack)
+    except (OSError, RulePackError) as e:
+        sys.exit(f"Could not load {args.rule_pack}: {str(e)}")
+
+    sizes = sorted(args.chars)
+    results = [profile(pattern, sizes, args.rounds, args.timeout) for pattern in patterns]
+    results.sort(key=lambda result: math.inf if None in result['seconds'] else result['seconds'][-1], reverse=True)
+
+    flagged = 0
+    size_columns = ' '.join(f"{f'ms@{chars}':>10}" for chars in sizes)
+    print(f"{'pattern':<52} {'slowest on':<11} {size_columns} {'growth':>7}  flag")
+    for result in results:
+        reason = flag(result, args.max_ms / 1000, args.max_growth)
+        flagged += reason is not None
+        times = ' '.join(f"{'timeout' if seconds is None else f'{seconds * 1000:.2f}':>10}"
+                         for seconds in result['seconds'])
+        growth = '' if result['growth'] is None else f"{result['growth']:.2f}"
+        print(f"{result['pattern'][:52]:<52} {result['text']:<11} {times} {growth:>7}  {reason or ''}")
+
+    print()
+    print(f"{flagged} of {len(results)} patterns flagged")
+    if flagged:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
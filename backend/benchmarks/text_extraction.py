@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Plain text extraction benchmark
+
+Writes large text files of marketing copy and prepares each one for the scan
+two ways: read whole into one string and cleaned and word-counted in one go,
+as text files were before, and memory-mapped and split into pages that are
+cleaned and word-counted one at a time. Reports for each:
+
+- seconds and megabytes per second (fastest of --repeat runs)
+- peak RSS growth, measured in a fresh process
+- word count, which must be the same both ways
+
+Usage:
+    python -m backend.benchmarks.text_extraction bench_txt --megabytes 10 50
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict
+
+from ..document_parser import DocumentParser
+from .docx_extraction import peak_rss_kb
+
+PARAGRAPHS = (
+    "Our flagship strategy seeks long-term capital appreciation through a diversified portfolio of equities.",
+    "Past performance is not a guarantee of future results. Returns are shown net of fees.",
+    "The composite was ranked in the top decile by an independent rating service for the period.",
+    "Investors should consider the fund's objectives, risks, charges and expenses carefully before investing.",
+    "Clients describe the team as responsive and disciplined, and the process as repeatable.",
+)
+
+# Phrases written into the text at random, so the pages carry something to find
+PLANTED = ("guaranteed returns", "never lose money", "risk-free investment")
+
+
+def write_text(path: str, megabytes: int, seed: int = 0) -> None:
+    """Write about `megabytes` of paragraphs separated by blank lines"""
+    rng = random.Random(seed)
+    target = megabytes * 1024 * 1024
+    written = 0
+    with open(path, 'w', encoding='utf-8') as file:
+        while written < target:
+            block = "\n\n".join(
+                rng.choice(PARAGRAPHS) + (f" {rng.choice(PLANTED)}." if rng.random() < 0.01 else "")
+                for _ in range(200)
+            ) + "\n\n"
+            file.write(block)
+            written += len(block)
+
+
+def whole_file(path: str) -> int:
+    """Prepare the text as one string, as text files were read before; returns the word count"""
+    with open(path, 'r', encoding='utf-8') as file:
+        text = file.read().strip()
+    DocumentParser.clean_text_with_offsets(text)
+    return len(text.split())
+
+
+def paged(path: str) -> int:
+    """Prepare the text page by page from the memory-mapped file; returns the word count"""
+    words = 0
+    for text in DocumentParser.iter_pages(path):
+        DocumentParser.clean_text_with_offsets(text)
+        words += len(text.split())
+    return words
+
+
+MODES: Dict[str, Callable[[str], int]] = {'whole_file': whole_file, 'paged': paged}
+
+
+def run_measured(name: str, path: str) -> Dict[str, Any]:
+    """Run one mode in this process, returning its seconds, word count and peak RSS growth"""
+    before = peak_rss_kb()
+    start = time.perf_counter()
+    words = MODES[name](path)
+    return {'seconds': time.perf_counter() - start, 'words': words, 'peak_mb': (peak_rss_kb() - before) / 1024}
+
+
+def measure(name: str, path: str, repeat: int) -> Dict[str, Any]:
+    seconds = float('inf')
+    peak_mb = 0.0
+    for _ in range(repeat):
+        # A fresh process per run, so one run's peak does not hide the next one's
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+            result = pool.submit(run_measured, name, path).result()
+        seconds = min(seconds, result['seconds'])
+        peak_mb = max(peak_mb, result['peak_mb'])
+    return {'seconds': seconds, 'peak_mb': peak_mb, 'words': result['words']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output_dir', help='Directory to write the generated text files into')
+    parser.add_argument('--megabytes', type=int, nargs='+', default=[10, 50], help='Size of each file')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per file and mode; the fastest is kept')
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    print(f"{'document':<16} {'mode':<11} {'seconds':>8} {'MB/s':>7} {'RSS MB':>8} {'words':>11}")
+    for megabytes in args.megabytes:
+        path = os.path.join(args.output_dir, f"copy-{megabytes:04d}mb.txt")
+        if not os.path.exists(path):
+            write_text(path, megabytes)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        for name in MODES:
+            result = measure(name, path, args.repeat)
+            print(f"{os.path.basename(path):<16} {name:<11} {result['seconds']:>8.2f} "
+                  f"{size_mb / result['seconds']:>7.1f} {result['peak_mb']:>8.1f} {result['words']:>11}")
+
+
+if __name__ == "__main__":
+    main()
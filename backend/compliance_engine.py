@@ -1,10 +1,12 @@
-import re
-import json
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Tuple, Iterator, Iterable, Optional
 from datetime import datetime
 import logging
 
 from .document_parser import DocumentParser
+from .document_store import DocumentWriter, StoredScan
+from .metrics import StageTimer
+from .rule_matcher import CompiledRuleSet, ScanResult
+from .rule_packs import RulePack, RulePackLoader, rule_packs as default_rule_packs
 
 logger = logging.getLogger(__name__)
 
@@ -13,91 +15,46 @@ class SECComplianceEngine:
     Analyzes documents for compliance with SEC Marketing Rule 206(4)-1
     """
     
-    def __init__(self):
+    # Checks whose findings only depend on patterns being present, so they
+    # can be reported as soon as the page containing them has been scanned
+    STREAMING_CHECKS = ('_check_substantiation', '_check_anti_fraud')
+    
+    # Every compliance check, in the order findings are reported
+    CHECKS = (
+        '_check_performance_advertising',
+        '_check_hypothetical_performance',
+        '_check_testimonials_endorsements',
+        '_check_substantiation',
+        '_check_anti_fraud',
+        '_check_third_party_ratings',
+        '_check_rule_timeouts'
+    )
+    
+    # Rule type of findings for patterns stopped by a time budget; they say a
+    # rule could not be fully checked rather than that it was broken
+    RULE_TIMEOUT = 'rule_timeout'
+    
+    def __init__(self, rule_packs: Optional[RulePackLoader] = None):
         self.parser = DocumentParser()
-        self.compliance_rules = self._load_compliance_rules()
+        self.rule_packs = rule_packs or default_rule_packs
+        self.rule_packs.current()
     
-    def _load_compliance_rules(self) -> Dict[str, Any]:
-        """Load SEC marketing rule compliance patterns and requirements"""
-        return {
-            'performance_advertising': {
-                'required_periods': ['1-year', '5-year', '10-year', 'inception'],
-                'prohibited_patterns': [
-                    r'cherry.?pick',
-                    r'select(?:ed|ive).{0,50}period',
-                    r'best.{0,30}performance',
-                    r'handpicked.{0,30}returns?'
-                ],
-                'required_disclosures': [
-                    r'net.{0,20}fees?',
-                    r'past.{0,30}performance.{0,30}not.{0,30}guarantee',
-                    r'hypothetical.{0,30}performance',
-                    r'risk.{0,30}disclaimer'
-                ]
-            },
-            'hypothetical_performance': {
-                'required_warnings': [
-                    r'hypothetical',
-                    r'not.{0,30}actual.{0,30}results?',
-                    r'risk.{0,30}loss',
-                    r'limitations?'
-                ],
-                'prohibited_without_disclosure': [
-                    r'projected.{0,30}returns?',
-                    r'expected.{0,30}performance',
-                    r'estimated.{0,30}gains?'
-                ]
-            },
-            'testimonials_endorsements': {
-                'required_disclosures': [
-                    r'compensation.{0,30}provided',
-                    r'conflicts?.{0,30}of.{0,30}interest',
-                    r'client.{0,30}(?:or|\/|and).{0,30}investor',
-                    r'material.{0,30}conflicts?'
-                ],
-                'client_indicators': [
-                    r'client.{0,30}testimonial',
-                    r'customer.{0,30}review',
-                    r'investor.{0,30}feedback'
-                ]
-            },
-            'substantiation': {
-                'unsubstantiated_claims': [
-                    r'guaranteed.{0,30}returns?',
-                    r'risk.?free',
-                    r'always.{0,30}profitable',
-                    r'never.{0,30}lose',
-                    r'best.{0,30}in.{0,30}(?:industry|market|class)'
-                ],
-                'requires_evidence': [
-                    r'#1.{0,30}(?:ranked|rated|performing)',
-                    r'top.{0,30}\d+.{0,30}(?:advisor|firm|manager)',
-                    r'award.?winning',
-                    r'highest.{0,30}(?:rated|ranked)'
-                ]
-            },
-            'anti_fraud': {
-                'misleading_patterns': [
-                    r'guaranteed.{0,30}profit',
-                    r'no.{0,30}risk',
-                    r'certain.{0,30}returns?',
-                    r'foolproof.{0,30}strategy'
-                ],
-                'omission_indicators': [
-                    r'results.{0,30}may.{0,30}vary',
-                    r'individual.{0,30}results.{0,30}differ',
-                    r'consult.{0,30}financial.{0,30}advisor'
-                ]
-            },
-            'third_party_ratings': {
-                'required_disclosures': [
-                    r'rating.{0,30}date',
-                    r'period.{0,30}based.{0,30}on',
-                    r'third.?party.{0,30}(?:identity|source)',
-                    r'compensation.{0,30}provided'
-                ]
-            }
-        }
+    @property
+    def rule_pack(self) -> RulePack:
+        """The active rule pack, reloaded when its file changes"""
+        return self.rule_packs.current()
+    
+    @property
+    def compliance_rules(self) -> Dict[str, Any]:
+        return self.rule_pack.rules
+    
+    @property
+    def rule_set(self) -> CompiledRuleSet:
+        return self.rule_pack.rule_set
+    
+    @property
+    def rules_version(self) -> str:
+        return self.rule_pack.digest
     
     async def analyze_document(self, file_path: str, document_type: str = "advertisement") -> Dict[str, Any]:
         """
@@ -110,80 +67,293 @@ class SECComplianceEngine:
         Returns:
             Dictionary with compliance analysis results
         """
-        try:
-            # Extract text from document
-            extraction_result = self.parser.extract_text(file_path)
+        return self.analyze(file_path, document_type)
+    
+    def analyze(self, file_path: str, document_type: str = "advertisement",
+                pages: Optional[Iterable[str]] = None,
+                writer: Optional[DocumentWriter] = None) -> Dict[str, Any]:
+        """Synchronous analysis, for callers running outside the event loop such as worker processes"""
+        for event in self.iter_analysis(file_path, document_type, pages, writer):
+            if event['event'] == 'result':
+                return event['result']
+    
+    def iter_analysis(self, file_path: str, document_type: str = "advertisement",
+                      pages: Optional[Iterable[str]] = None,
+                      writer: Optional[DocumentWriter] = None,
+                      stream_findings: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Analyze a document page by page, yielding events as they happen
+        
+        Only the current page and a short overlap window from the previous
+        one are held in memory, so matches spanning a page break are kept
+        while memory stays flat regardless of page count. Each page is split
+        into sentences and paragraphs, and proximity patterns only match
+        within one of them.
+        
+        Args:
+            file_path: Path to the document to analyze
+            document_type: Type of document (advertisement, rfp, rfi, etc.)
+            pages: Already extracted page text to analyze instead of parsing the file
+            writer: Document store entry receiving the extracted pages and final scan
+            stream_findings: Run the checks that can report findings after each
+                page, for a caller following the analysis as it happens
             
-            if 'error' in extraction_result:
-                return {
-                    'overall_score': 0,
-                    'compliance_status': 'error',
-                    'findings': [{'rule_type': 'extraction_error', 'severity': 'high', 
-                                'description': extraction_result['error'], 'suggestion': 'Please upload a valid document file'}],
-                    'recommendations': ['Upload a valid PDF, Word, or text document'],
-                    'document_stats': extraction_result
-                }
+        Yields:
+            {'event': 'page', 'page': n} once page n is scanned, {'event':
+            'finding', 'finding': ...} for each finding as soon as it is
+            known (after the last page unless stream_findings is set), then
+            {'event': 'result', 'result': ...} with the same dictionary
+            analyze_document returns, including the seconds spent in each
+            stage under 'stage_timings'
+        """
+        # One pack for the whole analysis, even if a newer one is loaded meanwhile
+        rule_pack = self.rule_pack
+        timer = StageTimer()
+        try:
+            document_stats = {'page_count': 0, 'word_count': 0}
+            scan = rule_pack.rule_set.stream()
+            pages = iter(pages) if pages is not None else self.parser.iter_pages(file_path)
+            reported = set()
+            streamed_patterns = set()
             
-            text = extraction_result['text']
-            cleaned_text = self.parser.clean_text(text.lower())
+            while True:
+                # Extract the next page of text
+                try:
+                    with timer.stage('extraction'):
+                        text = next(pages, None)
+                except Exception as e:
+                    logger.error(f"Error extracting text from {file_path}: {str(e)}")
+                    yield {'event': 'result', 'result': self._extraction_error_result(str(e), document_stats, rule_pack)}
+                    return
+                if text is None:
+                    break
+                
+                document_stats['page_count'] += 1
+                document_stats['word_count'] += len(text.split())
+                with timer.stage('clean_text'):
+                    cleaned, offsets = self.parser.clean_text_with_offsets(text)
+                with timer.stage('segment'):
+                    cleaned = self.parser.segment(cleaned, text, offsets)
+                    tokens = self.parser.index_tokens(cleaned)
+                with timer.stage('scan'):
+                    scan.feed(document_stats['page_count'], cleaned, text, offsets, tokens)
+                if writer is not None:
+                    with timer.stage('document_store'):
+                        writer.add_page(text)
+                
+                # Report findings that later pages cannot retract, for the
+                # patterns first found on this page; match lists come with
+                # the result, once the whole document is scanned
+                if stream_findings:
+                    partial = scan.result()
+                    new_patterns = [pattern for pattern in partial.patterns() if pattern not in streamed_patterns]
+                    streamed_patterns.update(new_patterns)
+                    partial = partial.restrict(new_patterns)
+                    for check in self.STREAMING_CHECKS:
+                        with timer.stage(check[1:]):
+                            streamed = getattr(self, check)(partial, rule_pack.rules)
+                        for finding in streamed:
+                            del finding['pattern']
+                            key = self._finding_key(finding)
+                            if key not in reported:
+                                reported.add(key)
+                                yield {'event': 'finding', 'finding': finding}
+                yield {'event': 'page', 'page': document_stats['page_count']}
             
-            # Perform compliance checks
-            findings = []
-            findings.extend(self._check_performance_advertising(cleaned_text))
-            findings.extend(self._check_hypothetical_performance(cleaned_text))
-            findings.extend(self._check_testimonials_endorsements(cleaned_text))
-            findings.extend(self._check_substantiation(cleaned_text))
-            findings.extend(self._check_anti_fraud(cleaned_text))
-            findings.extend(self._check_third_party_ratings(cleaned_text))
+            document_stats['format'] = self.parser.document_format(file_path)
             
-            # Calculate overall score and status
-            overall_score, compliance_status = self._calculate_compliance_score(findings)
+            # Perform compliance checks on the completed scan
+            with timer.stage('scan'):
+                matches = scan.finish()
+            if matches.timeouts:
+                logger.warning(f"Rules timed out analyzing {file_path}: {', '.join(matches.timeouts)}")
+            findings = self._run_checks(matches, rule_pack.rules, timer)
+            for finding in findings:
+                if self._finding_key(finding) not in reported:
+                    yield {'event': 'finding', 'finding': finding}
             
-            # Generate recommendations
-            recommendations = self._generate_recommendations(findings)
+            if writer is not None:
+                with timer.stage('document_store'):
+                    writer.finish(*self._completed_scan(rule_pack.rule_set.patterns, matches), document_stats)
             
-            return {
-                'overall_score': overall_score,
-                'compliance_status': compliance_status,
-                'findings': findings,
-                'recommendations': recommendations,
-                'document_stats': extraction_result
-            }
+            yield {'event': 'result', 'result': self._build_result(findings, document_stats, rule_pack, timer,
+                                                                   scan.prefilter)}
             
         except Exception as e:
             logger.error(f"Analysis failed for {file_path}: {str(e)}")
-            return {
+            yield {'event': 'result', 'result': {
                 'overall_score': 0,
                 'compliance_status': 'error',
                 'findings': [{'rule_type': 'analysis_error', 'severity': 'high', 
-                            'description': f'Analysis failed: {str(e)}', 'suggestion': 'Please try again or contact support'}],
+                            'description': 'Analysis failed', 'location': str(e),
+                            'suggestion': 'Please try again or contact support'}],
                 'recommendations': ['Please try uploading the document again'],
-                'document_stats': {'text': '', 'word_count': 0, 'page_count': 0}
-            }
+                'document_stats': {'word_count': 0, 'page_count': 0},
+                **self._rule_pack_fields(rule_pack)
+            }}
+    
+    def rescore(self, stored: StoredScan, pages: Iterable[str]) -> Tuple[Dict[str, Any], StoredScan]:
+        """
+        Re-analyze a document under the active rule pack from its stored scan
+        
+        Only patterns the stored scan did not cover, including any that timed
+        out, are run over the stored page text; their matches are merged with
+        the stored ones and every check is re-evaluated, giving the same
+        result as a full analysis.
+        New patterns the stored token index rules out are not run at all, and
+        the pages are not read when that leaves none.
+        
+        Args:
+            stored: The document's last scan
+            pages: The document's stored page text, only read if a pattern is new
+            
+        Returns:
+            Tuple of (analysis result, scan to store in place of the old one)
+        """
+        rule_pack = self.rule_pack
+        timer = StageTimer()
+        scanned = set(stored.patterns)
+        new_patterns = [pattern for pattern in rule_pack.rule_set.patterns if pattern not in scanned]
+        
+        matches = stored.matches.restrict(rule_pack.rule_set.patterns)
+        prefilter = None
+        if new_patterns:
+            present = {}
+            runnable = [pattern for pattern in new_patterns
+                        if rule_pack.rule_set.may_match(pattern, [matches.tokens], present)]
+            prefilter = {'skipped': len(new_patterns) - len(runnable), 'matched': 0, 'unmatched': 0}
+            new_patterns = runnable
+        if new_patterns:
+            scan = rule_pack.rule_set.subset(new_patterns).stream()
+            pages = iter(pages)
+            page_number = 0
+            while True:
+                with timer.stage('document_store'):
+                    text = next(pages, None)
+                if text is None:
+                    break
+                page_number += 1
+                with timer.stage('clean_text'):
+                    cleaned, offsets = self.parser.clean_text_with_offsets(text)
+                with timer.stage('segment'):
+                    cleaned = self.parser.segment(cleaned, text, offsets)
+                    tokens = self.parser.index_tokens(cleaned)
+                with timer.stage('scan'):
+                    scan.feed(page_number, cleaned, text, offsets, tokens)
+            with timer.stage('scan'):
+                matches = matches.merge(scan.finish())
+            prefilter = {outcome: prefilter[outcome] + count for outcome, count in scan.prefilter.items()}
+        
+        findings = self._run_checks(matches, rule_pack.rules, timer)
+        return (self._build_result(findings, stored.document_stats, rule_pack, timer, prefilter),
+                StoredScan(*self._completed_scan(rule_pack.rule_set.patterns, matches), stored.document_stats))
     
-    def _check_performance_advertising(self, text: str) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _completed_scan(patterns: List[str], matches: ScanResult) -> Tuple[List[str], ScanResult]:
+        """
+        Patterns and matches of a scan to store, leaving out timed-out patterns
+        
+        Time budgets are wall-clock time, so a pattern that ran out on one run
+        may complete on the next; leaving it out of the stored scan makes the
+        next re-score run it again.
+        """
+        completed = [pattern for pattern in patterns if pattern not in matches.timeouts]
+        return completed, matches.restrict(completed)
+    
+    def is_cacheable(self, result: Dict[str, Any]) -> bool:
+        """Whether a result can be reused for the same text and rules: it is not an error and no rule timed out"""
+        return (result['compliance_status'] != 'error'
+                and not any(finding['rule_type'] == self.RULE_TIMEOUT for finding in result['findings']))
+    
+    def _build_result(self, findings: List[Dict[str, Any]], document_stats: Dict[str, Any],
+                      rule_pack: RulePack, timer: Optional[StageTimer] = None,
+                      prefilter: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        timer = timer or StageTimer()
+        with timer.stage('scoring'):
+            # Calculate overall score and status
+            overall_score, compliance_status = self._calculate_compliance_score(findings)
+            
+            # Generate recommendations
+            recommendations = self._generate_recommendations(findings)
+        
+        return {
+            'overall_score': overall_score,
+            'compliance_status': compliance_status,
+            'findings': findings,
+            'recommendations': recommendations,
+            'document_stats': document_stats,
+            'stage_timings': timer.result(),
+            'prefilter': prefilter or {},
+            **self._rule_pack_fields(rule_pack)
+        }
+    
+    @staticmethod
+    def _rule_pack_fields(rule_pack: RulePack) -> Dict[str, str]:
+        """Identify the rule pack a result was produced with"""
+        return {'rule_pack_version': rule_pack.version, 'rules_version': rule_pack.digest}
+    
+    def _extraction_error_result(self, error: str, document_stats: Dict[str, Any],
+                                 rule_pack: RulePack) -> Dict[str, Any]:
+        # Error findings keep a fixed description, as rules are interned by
+        # it; the error text, which may name the file, goes in the location
+        return {
+            'overall_score': 0,
+            'compliance_status': 'error',
+            'findings': [{'rule_type': 'extraction_error', 'severity': 'high', 
+                        'description': 'Text could not be extracted from the document', 'location': error,
+                        'suggestion': 'Please upload a valid document file'}],
+            'recommendations': ['Upload a valid PDF, Word, or text document'],
+            'document_stats': {**document_stats, 'error': error},
+            **self._rule_pack_fields(rule_pack)
+        }
+    
+    def _run_checks(self, matches: ScanResult, rules: Dict[str, Any],
+                    timer: Optional[StageTimer] = None) -> List[Dict[str, Any]]:
+        """
+        Run every compliance check against a completed scan, timing each as its own stage
+        
+        Checks name the pattern a finding is about under 'pattern'; it is
+        replaced here by the list of that pattern's matches.
+        """
+        timer = timer or StageTimer()
+        findings = []
+        for check in self.CHECKS:
+            with timer.stage(check[1:]):
+                for finding in getattr(self, check)(matches, rules):
+                    pattern = finding.pop('pattern', None)
+                    if pattern is not None:
+                        finding['matches'] = self._match_locations(matches, pattern)
+                    findings.append(finding)
+        return findings
+    
+    @staticmethod
+    def _finding_key(finding: Dict[str, Any]) -> Tuple:
+        return (finding['rule_type'], finding['description'], finding.get('location'))
+    
+    def _check_performance_advertising(self, matches: ScanResult, rules: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Check compliance with performance advertising rules"""
         findings = []
         
         # Check for cherry-picking indicators
-        for pattern in self.compliance_rules['performance_advertising']['prohibited_patterns']:
-            if re.search(pattern, text, re.IGNORECASE):
+        for pattern in rules['performance_advertising']['prohibited_patterns']:
+            if matches.found(pattern):
                 findings.append({
                     'rule_type': 'performance_advertising',
                     'severity': 'high',
                     'description': f'Potential cherry-picking detected: {pattern}',
-                    'location': self._find_pattern_context(text, pattern),
+                    'location': self._find_pattern_context(matches, pattern),
+                    'page': matches.page(pattern),
+                    'pattern': pattern,
                     'suggestion': 'Remove selective time period language and present standardized time periods (1, 5, 10 years, inception)'
                 })
         
         # Check for required performance disclosures
-        performance_keywords = ['return', 'performance', 'gain', 'profit', 'yield']
-        has_performance_content = any(keyword in text for keyword in performance_keywords)
+        has_performance_content = matches.has_any_word(rules['performance_advertising']['content_indicators'])
         
         if has_performance_content:
             missing_disclosures = []
-            for disclosure in self.compliance_rules['performance_advertising']['required_disclosures']:
-                if not re.search(disclosure, text, re.IGNORECASE):
+            for disclosure in rules['performance_advertising']['required_disclosures']:
+                if not matches.found(disclosure):
                     missing_disclosures.append(disclosure)
             
             if missing_disclosures:
@@ -197,107 +367,116 @@ class SECComplianceEngine:
         
         return findings
     
-    def _check_hypothetical_performance(self, text: str) -> List[Dict[str, Any]]:
+    def _check_hypothetical_performance(self, matches: ScanResult, rules: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Check compliance with hypothetical performance rules"""
         findings = []
         
         # Check for hypothetical performance without proper warnings
-        for pattern in self.compliance_rules['hypothetical_performance']['prohibited_without_disclosure']:
-            if re.search(pattern, text, re.IGNORECASE):
+        for pattern in rules['hypothetical_performance']['prohibited_without_disclosure']:
+            if matches.found(pattern):
                 # Check if proper hypothetical warnings are present
-                has_warnings = any(re.search(warning, text, re.IGNORECASE) 
-                                 for warning in self.compliance_rules['hypothetical_performance']['required_warnings'])
+                has_warnings = any(matches.found(warning) 
+                                 for warning in rules['hypothetical_performance']['required_warnings'])
                 
                 if not has_warnings:
                     findings.append({
                         'rule_type': 'hypothetical_performance',
                         'severity': 'high',
                         'description': f'Hypothetical performance without required warnings: {pattern}',
-                        'location': self._find_pattern_context(text, pattern),
+                        'location': self._find_pattern_context(matches, pattern),
+                        'page': matches.page(pattern),
+                        'pattern': pattern,
                         'suggestion': 'Add clear disclosure that this is hypothetical performance, includes risks and limitations'
                     })
         
         return findings
     
-    def _check_testimonials_endorsements(self, text: str) -> List[Dict[str, Any]]:
+    def _check_testimonials_endorsements(self, matches: ScanResult, rules: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Check compliance with testimonial and endorsement rules"""
         findings = []
         
+        # Check for required disclosures
+        missing_disclosures = []
+        for disclosure in rules['testimonials_endorsements']['required_disclosures']:
+            if not matches.found(disclosure):
+                missing_disclosures.append(disclosure)
+        
         # Check for client testimonials
-        for indicator in self.compliance_rules['testimonials_endorsements']['client_indicators']:
-            if re.search(indicator, text, re.IGNORECASE):
-                # Check for required disclosures
-                missing_disclosures = []
-                for disclosure in self.compliance_rules['testimonials_endorsements']['required_disclosures']:
-                    if not re.search(disclosure, text, re.IGNORECASE):
-                        missing_disclosures.append(disclosure)
-                
+        for indicator in rules['testimonials_endorsements']['client_indicators']:
+            if matches.found(indicator):
                 if missing_disclosures:
                     findings.append({
                         'rule_type': 'testimonials_endorsements',
                         'severity': 'high',
                         'description': 'Testimonial/endorsement missing required disclosures',
-                        'location': self._find_pattern_context(text, indicator),
+                        'location': self._find_pattern_context(matches, indicator),
+                        'page': matches.page(indicator),
+                        'pattern': indicator,
                         'suggestion': 'Add disclosures about compensation, conflicts of interest, and client/investor status'
                     })
         
         return findings
     
-    def _check_substantiation(self, text: str) -> List[Dict[str, Any]]:
+    def _check_substantiation(self, matches: ScanResult, rules: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Check for unsubstantiated claims"""
         findings = []
         
         # Check for unsubstantiated claims
-        for pattern in self.compliance_rules['substantiation']['unsubstantiated_claims']:
-            if re.search(pattern, text, re.IGNORECASE):
+        for pattern in rules['substantiation']['unsubstantiated_claims']:
+            if matches.found(pattern):
                 findings.append({
                     'rule_type': 'substantiation',
                     'severity': 'high',
                     'description': f'Unsubstantiated claim detected: {pattern}',
-                    'location': self._find_pattern_context(text, pattern),
+                    'location': self._find_pattern_context(matches, pattern),
+                    'page': matches.page(pattern),
+                    'pattern': pattern,
                     'suggestion': 'Remove unsubstantiated claims or provide proper evidence and disclaimers'
                 })
         
         # Check for claims requiring evidence
-        for pattern in self.compliance_rules['substantiation']['requires_evidence']:
-            if re.search(pattern, text, re.IGNORECASE):
+        for pattern in rules['substantiation']['requires_evidence']:
+            if matches.found(pattern):
                 findings.append({
                     'rule_type': 'substantiation',
                     'severity': 'medium',
                     'description': f'Claim requiring substantiation: {pattern}',
-                    'location': self._find_pattern_context(text, pattern),
+                    'location': self._find_pattern_context(matches, pattern),
+                    'page': matches.page(pattern),
+                    'pattern': pattern,
                     'suggestion': 'Provide evidence source, date, and methodology for this ranking/award claim'
                 })
         
         return findings
     
-    def _check_anti_fraud(self, text: str) -> List[Dict[str, Any]]:
+    def _check_anti_fraud(self, matches: ScanResult, rules: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Check for potentially fraudulent or misleading statements"""
         findings = []
         
-        for pattern in self.compliance_rules['anti_fraud']['misleading_patterns']:
-            if re.search(pattern, text, re.IGNORECASE):
+        for pattern in rules['anti_fraud']['misleading_patterns']:
+            if matches.found(pattern):
                 findings.append({
                     'rule_type': 'anti_fraud',
                     'severity': 'high',
                     'description': f'Potentially misleading statement: {pattern}',
-                    'location': self._find_pattern_context(text, pattern),
+                    'location': self._find_pattern_context(matches, pattern),
+                    'page': matches.page(pattern),
+                    'pattern': pattern,
                     'suggestion': 'Remove misleading language and add appropriate risk disclosures'
                 })
         
         return findings
     
-    def _check_third_party_ratings(self, text: str) -> List[Dict[str, Any]]:
+    def _check_third_party_ratings(self, matches: ScanResult, rules: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Check compliance with third-party rating disclosure requirements"""
         findings = []
         
-        rating_indicators = ['rated', 'ranking', 'award', 'recognition', 'honor']
-        has_ratings = any(indicator in text for indicator in rating_indicators)
+        has_ratings = matches.has_any_word(rules['third_party_ratings']['rating_indicators'])
         
         if has_ratings:
             missing_disclosures = []
-            for disclosure in self.compliance_rules['third_party_ratings']['required_disclosures']:
-                if not re.search(disclosure, text, re.IGNORECASE):
+            for disclosure in rules['third_party_ratings']['required_disclosures']:
+                if not matches.found(disclosure):
                     missing_disclosures.append(disclosure)
             
             if missing_disclosures:
@@ -311,13 +490,42 @@ class SECComplianceEngine:
         
         return findings
     
-    def _find_pattern_context(self, text: str, pattern: str, context_chars: int = 100) -> str:
-        """Find context around a pattern match"""
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            start = max(0, match.start() - context_chars)
-            end = min(len(text), match.end() + context_chars)
-            return f"...{text[start:end]}..."
+    def _check_rule_timeouts(self, matches: ScanResult, rules: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Report patterns the scan stopped for running out of time budget"""
+        findings = []
+        
+        for pattern, (page, budget) in matches.timeouts.items():
+            if budget == 'rule':
+                description = f'Rule exceeded its time budget and was not fully checked: {pattern}'
+            else:
+                description = f'Document scan time budget ran out before this rule was fully checked: {pattern}'
+            findings.append({
+                'rule_type': self.RULE_TIMEOUT,
+                'severity': 'low',
+                'description': description,
+                'location': f'Page {page} onwards',
+                'page': page,
+                'suggestion': 'Review these pages for this rule manually; matches after the cutoff may be missing'
+            })
+        
+        return findings
+    
+    @staticmethod
+    def _match_locations(matches: ScanResult, pattern: str) -> List[Dict[str, int]]:
+        """Every match of a pattern as page and offsets into the extracted page text"""
+        locations = []
+        for start_page, start, end_page, end in matches.locations(pattern):
+            location = {'page': start_page, 'start': start, 'end': end}
+            if end_page != start_page:
+                location['end_page'] = end_page
+            locations.append(location)
+        return locations
+    
+    def _find_pattern_context(self, matches: ScanResult, pattern: str, context_chars: int = 100) -> str:
+        """Find context around the first match of a pattern"""
+        context = matches.context(pattern, context_chars)
+        if context is not None:
+            return f"...{context}..."
         return "Pattern found in document"
     
     def _calculate_compliance_score(self, findings: List[Dict[str, Any]]) -> Tuple[float, str]:
@@ -325,9 +533,10 @@ class SECComplianceEngine:
         if not findings:
             return 100.0, "compliant"
         
-        # Weight findings by severity
+        # Weight findings by severity; rules that timed out are not violations
         severity_weights = {'high': 25, 'medium': 10, 'low': 5}
-        total_deduction = sum(severity_weights.get(finding['severity'], 5) for finding in findings)
+        total_deduction = sum(severity_weights.get(finding['severity'], 5) for finding in findings
+                              if finding['rule_type'] != self.RULE_TIMEOUT)
         
         # Cap at 0
         score = max(0, 100 - total_deduction)
@@ -340,6 +549,10 @@ class SECComplianceEngine:
         else:
             status = "non_compliant"
         
+        # A document with rules left unchecked cannot be called compliant
+        if status == "compliant" and any(finding['rule_type'] == self.RULE_TIMEOUT for finding in findings):
+            status = "needs_review"
+        
         return score, status
     
     def _generate_recommendations(self, findings: List[Dict[str, Any]]) -> List[str]:
@@ -373,6 +586,9 @@ class SECComplianceEngine:
         if 'third_party_ratings' in finding_types:
             recommendations.append("Add third-party rating disclosures: date, period, source, compensation")
         
+        if self.RULE_TIMEOUT in finding_types:
+            recommendations.append("Manually review the pages where rules ran out of time, as they were not fully checked")
+        
         # Add general recommendations
         if findings:
             recommendations.append("Consult with compliance counsel to review all marketing materials")
@@ -1,12 +1,193 @@
+import multiprocessing
+import multiprocessing.util
 import os
 import re
-from typing import Dict, Any
-from docx import Document as DocxDocument
-from PyPDF2 import PdfReader
+import threading
+from array import array
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 import logging
 
+from .docx_extractor import iter_docx_pages
+from .pdf_extractors import PdfTextExtractor
+from .rule_matcher import SEGMENT_BREAK, TokenIndex
+from .text_extractor import iter_text_pages
+
 logger = logging.getLogger(__name__)
 
+# Typographic quotes and dashes, as a regex character class, and their ASCII forms
+TYPOGRAPHIC = r'\u2010-\u2015\u2018-\u201f\u2032\u2033\u2212'
+FOLD_TYPOGRAPHIC = str.maketrans({
+    **dict.fromkeys('\u2010\u2011\u2012\u2013\u2014\u2015\u2212', '-'),
+    **dict.fromkeys('\u2018\u2019\u201a\u201b\u2032', "'"),
+    **dict.fromkeys('\u201c\u201d\u201e\u201f\u2033', '"'),
+})
+TYPOGRAPHIC_CHARS = re.compile('[' + TYPOGRAPHIC + ']')
+
+# What clean_text_with_offsets does not copy over character for character:
+# whitespace other than a single space, which becomes one space (group 1),
+# and runs of characters it drops
+IRREGULAR_RUNS = re.compile(r'(\s{2,}|[^\S ])|[^\w\s.,!?;:\-()"\'%$' + TYPOGRAPHIC + r']+')
+
+# Terminal punctuation and closing quotes followed by a space: a possible sentence end in cleaned text
+SENTENCE_BREAKS = re.compile(r'[.!?]+["\')]* ')
+
+# Blank lines between paragraphs of extracted text
+PARAGRAPH_BREAKS = re.compile(r'\n[^\S\n]*\n')
+
+# Abbreviations whose period does not end a sentence even before a capital
+ABBREVIATIONS = frozenset(('mr', 'mrs', 'ms', 'dr', 'st', 'jr', 'sr', 'no', 'vs', 'inc', 'co', 'corp', 'ltd',
+                           'u.s', 'e.g', 'i.e'))
+
+# Bumped whenever extraction can give different page text for the same file,
+# so text cached by content hash is extracted again. 2: pypdfium2 PDF pages
+# and the streaming Word extractor.
+EXTRACTION_FORMAT = 2
+
+# PDFs with at least this many pages have their pages extracted by several processes
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "200"))
+
+# Processes extracting the pages of one large PDF; 1 disables parallel extraction.
+# Every analysis worker may start its own, so the default is a small pool: it
+# only runs while a large PDF is extracted, so several at once rarely overlap.
+PDF_EXTRACTION_WORKERS = int(os.getenv("PDF_EXTRACTION_WORKERS", min(4, os.cpu_count() or 1)))
+
+# Consecutive pages extracted by one process per task
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "25"))
+
+# Seconds the extraction processes are kept after the last large PDF
+PDF_EXTRACTION_IDLE_SECONDS = float(os.getenv("PDF_EXTRACTION_IDLE_SECONDS", "60"))
+
+# The PDF an extraction process has open: ((path, mtime, size), extractor)
+_open_pdf: Optional[Tuple[Tuple[str, int, int], PdfTextExtractor]] = None
+
+
+class OffsetMap:
+    """
+    Offset in the original text of each character of cleaned text
+
+    Cleaned text is copied from the original a stretch at a time, so the map
+    keeps one entry per stretch rather than one per character: where the
+    stretch starts in the cleaned text and in the original, in two arrays.
+    Indexing finds a character's stretch by bisection.
+    """
+
+    __slots__ = ('starts', 'origins', 'length')
+
+    def __init__(self, starts: 'array[int]', origins: 'array[int]', length: int):
+        self.starts = starts
+        self.origins = origins
+        self.length = length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, index: int) -> int:
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("offset map index out of range")
+        run = bisect_right(self.starts, index) - 1
+        return self.origins[run] + index - self.starts[run]
+
+    def position(self, offset: int) -> int:
+        """Index of the last cleaned character from at or before `offset` in the original; -1 if none"""
+        run = bisect_right(self.origins, offset) - 1
+        if run < 0:
+            return -1
+        end = self.starts[run + 1] if run + 1 < len(self.starts) else self.length
+        return min(self.starts[run] + offset - self.origins[run], end - 1)
+
+
+def extract_pdf_page_range(file_path: str, start: int, stop: int) -> List[str]:
+    """
+    Extract the text of pages [start, stop) of a PDF
+    
+    Runs in an extraction process, which opens the file itself so only the
+    path crosses the process boundary, never the document bytes. The document
+    is kept open for the next range of the same file, since opening one and
+    resolving its page tree costs about as much as extracting a few dozen pages.
+    """
+    global _open_pdf
+    stat = os.stat(file_path)
+    key = (file_path, stat.st_mtime_ns, stat.st_size)
+    if _open_pdf is None or _open_pdf[0] != key:
+        if _open_pdf is not None:
+            _open_pdf[1].close()
+            _open_pdf = None
+        _open_pdf = (key, PdfTextExtractor(file_path))
+    extractor = _open_pdf[1]
+    return [extractor.extract_page(index) for index in range(start, stop)]
+
+
+class PdfExtractionPool:
+    """
+    Process pool extracting page ranges of large PDFs.
+    
+    The pool starts with the first large PDF and shuts down once no document
+    has used it for idle_seconds, so analysis workers, which each get their
+    own, do not keep extra processes around between large documents.
+    """
+    
+    def __init__(self, workers: int = PDF_EXTRACTION_WORKERS, idle_seconds: float = PDF_EXTRACTION_IDLE_SECONDS):
+        self.workers = workers
+        self.idle_seconds = idle_seconds
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._users = 0
+        self._idle_timer: Optional[threading.Timer] = None
+        self._finalizer_registered = False
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> ProcessPoolExecutor:
+        """Return the running pool, starting it if needed; pair with release()"""
+        with self._lock:
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                if not self._finalizer_registered:
+                    # Analysis workers are pool processes themselves, which wait for
+                    # their children on exit without running atexit hooks. Shut down
+                    # before that, and before the finalizers closing the pool's queues.
+                    multiprocessing.util.Finalize(self, self.shutdown, kwargs={'wait': True}, exitpriority=100)
+                    self._finalizer_registered = True
+            self._users += 1
+            return self._executor
+    
+    def release(self) -> None:
+        with self._lock:
+            self._users -= 1
+            if self._users == 0 and self._executor is not None:
+                self._idle_timer = threading.Timer(self.idle_seconds, self._shutdown_if_idle)
+                self._idle_timer.daemon = True
+                self._idle_timer.start()
+    
+    def shutdown(self, wait: bool = False) -> None:
+        """Stop the pool; the next acquire() starts a new one"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+    
+    def _shutdown_if_idle(self) -> None:
+        with self._lock:
+            if self._users:
+                return
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+# Global instance
+pdf_extraction_pool = PdfExtractionPool()
+
 class DocumentParser:
     """Parse different document types and extract text content"""
     
@@ -22,16 +203,14 @@ class DocumentParser:
             Dictionary containing extracted text and metadata
         """
         try:
-            file_extension = os.path.splitext(file_path)[1].lower()
+            file_format = DocumentParser.document_format(file_path)
             
-            if file_extension == '.pdf':
+            if file_format == 'pdf':
                 return DocumentParser._extract_from_pdf(file_path)
-            elif file_extension in ['.docx', '.doc']:
+            elif file_format == 'docx':
                 return DocumentParser._extract_from_docx(file_path)
-            elif file_extension == '.txt':
-                return DocumentParser._extract_from_txt(file_path)
             else:
-                raise ValueError(f"Unsupported file format: {file_extension}")
+                return DocumentParser._extract_from_txt(file_path)
                 
         except Exception as e:
             logger.error(f"Error extracting text from {file_path}: {str(e)}")
@@ -43,67 +222,178 @@ class DocumentParser:
             }
     
     @staticmethod
-    def _extract_from_pdf(file_path: str) -> Dict[str, Any]:
-        """Extract text from PDF file"""
+    def iter_pages(file_path: str) -> Iterator[str]:
+        """
+        Yield the text of a document one page at a time
+        
+        Pages are extracted lazily, so only the current page is held in
+        memory. Text documents are memory-mapped and split into pages of
+        about TXT_MAX_PAGE_CHARS characters at line breaks.
+        Extraction errors are raised rather than returned.
+        
+        Args:
+            file_path: Path to the document file
+        """
+        file_format = DocumentParser.document_format(file_path)
+        
+        if file_format == 'pdf':
+            yield from DocumentParser._iter_pdf_pages(file_path)
+        elif file_format == 'docx':
+            yield from DocumentParser._iter_docx_pages(file_path)
+        else:
+            yield from DocumentParser._iter_txt_pages(file_path)
+    
+    @staticmethod
+    def count_pages(file_path: str) -> Optional[int]:
+        """
+        Number of pages iter_pages will yield, when known before extracting them
+
+        Word and text documents are only split into pages while their text
+        is read, so their count is None, as is that of a file that cannot be
+        opened.
+        """
         try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PdfReader(file)
-                text = ""
-                
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-                
-                return {
-                    'text': text.strip(),
-                    'page_count': len(pdf_reader.pages),
-                    'word_count': len(text.split()),
-                    'format': 'pdf'
-                }
+            if DocumentParser.document_format(file_path) == 'pdf':
+                with PdfTextExtractor(file_path) as extractor:
+                    return extractor.page_count
+        except Exception:
+            pass
+        return None
+
+    @staticmethod
+    def document_format(file_path: str) -> str:
+        """Return the format name for a supported document path"""
+        file_extension = os.path.splitext(file_path)[1].lower()
+        
+        if file_extension == '.pdf':
+            return 'pdf'
+        elif file_extension in ['.docx', '.doc']:
+            return 'docx'
+        elif file_extension == '.txt':
+            return 'txt'
+        else:
+            raise ValueError(f"Unsupported file format: {file_extension}")
+    
+    @staticmethod
+    def _iter_pdf_pages(file_path: str) -> Iterator[str]:
+        """
+        Yield the text of each PDF page
+        
+        Pages are extracted by the PDF_EXTRACTORS backends, falling back to
+        the next backend for any page one fails on. PDFs of
+        PDF_PARALLEL_MIN_PAGES pages or more are extracted in page ranges by
+        a pool of PDF_EXTRACTION_WORKERS processes, yielding the same text in
+        the same order as extracting them one by one.
+        """
+        try:
+            with PdfTextExtractor(file_path) as extractor:
+                if pdf_extraction_pool.workers > 1 and extractor.page_count >= PDF_PARALLEL_MIN_PAGES:
+                    yield from DocumentParser._iter_pdf_pages_parallel(file_path, extractor.page_count)
+                else:
+                    for index in range(extractor.page_count):
+                        yield extractor.extract_page(index)
         except Exception as e:
             raise Exception(f"Failed to extract PDF text: {str(e)}")
     
     @staticmethod
-    def _extract_from_docx(file_path: str) -> Dict[str, Any]:
-        """Extract text from Word document"""
+    def _iter_pdf_pages_parallel(file_path: str, page_count: int) -> Iterator[str]:
+        """Yield PDF page text extracted range by range in the extraction pool"""
+        pool = pdf_extraction_pool.acquire()
+        ranges = iter([(start, min(start + PDF_PAGES_PER_TASK, page_count))
+                       for start in range(0, page_count, PDF_PAGES_PER_TASK)])
+        
+        # Only a couple of ranges per worker are in flight, so finished pages
+        # waiting to be consumed stay bounded however long the document is
+        pending = deque()
         try:
-            doc = DocxDocument(file_path)
-            text = ""
-            
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            
-            # Also extract text from tables
-            for table in doc.tables:
-                for row in table.rows:
-                    for cell in row.cells:
-                        text += cell.text + " "
-                text += "\n"
+            for _ in range(pdf_extraction_pool.workers * 2):
+                page_range = next(ranges, None)
+                if page_range is None:
+                    break
+                pending.append(pool.submit(extract_pdf_page_range, file_path, *page_range))
             
-            return {
-                'text': text.strip(),
-                'page_count': 1,  # Word docs don't have clear page breaks in python-docx
-                'word_count': len(text.split()),
-                'format': 'docx'
-            }
+            while pending:
+                pages = pending.popleft().result()
+                page_range = next(ranges, None)
+                if page_range is not None:
+                    pending.append(pool.submit(extract_pdf_page_range, file_path, *page_range))
+                yield from pages
+        except BrokenProcessPool:
+            # A crashed worker breaks the whole pool; start a new one for the next document
+            pdf_extraction_pool.shutdown()
+            raise
+        finally:
+            for future in pending:
+                future.cancel()
+            pdf_extraction_pool.release()
+    
+    @staticmethod
+    def _extract_from_pdf(file_path: str) -> Dict[str, Any]:
+        """Extract text from PDF file"""
+        pages = list(DocumentParser._iter_pdf_pages(file_path))
+        text = "\n".join(pages)
+        
+        return {
+            'text': text.strip(),
+            'page_count': len(pages),
+            'word_count': len(text.split()),
+            'format': 'pdf'
+        }
+    
+    @staticmethod
+    def _iter_docx_pages(file_path: str) -> Iterator[str]:
+        """
+        Yield the text of each Word document page
+        
+        The document's XML is streamed out of the file rather than loaded
+        into python-docx, in reading order with tables in place; headers,
+        footers, footnotes and endnotes follow the body as one more page.
+        """
+        try:
+            yield from iter_docx_pages(file_path)
         except Exception as e:
             raise Exception(f"Failed to extract Word document text: {str(e)}")
     
     @staticmethod
-    def _extract_from_txt(file_path: str) -> Dict[str, Any]:
-        """Extract text from plain text file"""
+    def _extract_from_docx(file_path: str) -> Dict[str, Any]:
+        """Extract text from Word document"""
+        pages = list(DocumentParser._iter_docx_pages(file_path))
+        text = "\n".join(pages)
+        
+        return {
+            'text': text.strip(),
+            'page_count': len(pages),
+            'word_count': len(text.split()),
+            'format': 'docx'
+        }
+    
+    @staticmethod
+    def _iter_txt_pages(file_path: str) -> Iterator[str]:
+        """
+        Yield the text of a plain text file page by page
+        
+        The file is memory-mapped and decoded a chunk at a time, with its
+        encoding taken from a byte order mark or else UTF-8 falling back to
+        Windows-1252, so memory stays flat however large the file is.
+        """
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                text = file.read()
-            
-            return {
-                'text': text.strip(),
-                'page_count': 1,
-                'word_count': len(text.split()),
-                'format': 'txt'
-            }
+            yield from iter_text_pages(file_path)
         except Exception as e:
             raise Exception(f"Failed to extract text file: {str(e)}")
     
+    @staticmethod
+    def _extract_from_txt(file_path: str) -> Dict[str, Any]:
+        """Extract text from plain text file"""
+        pages = list(DocumentParser._iter_txt_pages(file_path))
+        text = "".join(pages)
+        
+        return {
+            'text': text.strip(),
+            'page_count': len(pages),
+            'word_count': sum(len(page.split()) for page in pages),
+            'format': 'txt'
+        }
+    
     @staticmethod
     def clean_text(text: str) -> str:
         """Clean and normalize text for analysis"""
@@ -115,6 +405,122 @@ class DocumentParser:
         
         return text.strip()
     
+    @staticmethod
+    def clean_text_with_offsets(text: str) -> Tuple[str, OffsetMap]:
+        """
+        Normalize text for the scan, mapping each character of the result to
+        its offset in the original text
+        
+        Like clean_text(text.lower()), except that typographic quotes and
+        dashes are kept as their ASCII forms, so patterns such as risk.?free
+        also match text typeset with an en dash. Only the stretches that are
+        not copied over as they are, whitespace other than single spaces and
+        dropped characters, are visited one by one; the rest is copied a
+        stretch at a time.
+        
+        Returns:
+            Tuple of (cleaned text, original offset of each cleaned character)
+        """
+        if '\u0130' in text:
+            # The one character lower() lengthens; the combining dot it adds is dropped anyway
+            text = text.replace('\u0130', 'I')
+        lowered = text.lower()
+        
+        parts = []
+        starts = array('q')
+        origins = array('q')
+        length = 0
+        copied = 0  # end of the original text handled so far
+        for run in IRREGULAR_RUNS.finditer(lowered):
+            start, end = run.span()
+            if start > copied:
+                # A new stretch unless it continues the previous one in the original
+                if not origins or origins[-1] + length - starts[-1] != copied:
+                    starts.append(length)
+                    origins.append(copied)
+                parts.append(lowered[copied:start])
+                length += start - copied
+            if run.lastindex and length:
+                # Whitespace collapses to one space, and none leads the text
+                if not origins or origins[-1] + length - starts[-1] != start:
+                    starts.append(length)
+                    origins.append(start)
+                parts.append(' ')
+                length += 1
+            copied = end
+        if copied < len(lowered):
+            if not origins or origins[-1] + length - starts[-1] != copied:
+                starts.append(length)
+                origins.append(copied)
+            parts.append(lowered[copied:])
+        cleaned = ''.join(parts)
+        
+        if cleaned[:1] == ' ':
+            leading = len(cleaned) - len(cleaned.lstrip(' '))
+            cleaned = cleaned[leading:]
+            run = bisect_right(starts, leading) - 1
+            origins = origins[run:]
+            origins[0] += leading - starts[run]
+            starts = array('q', (max(start - leading, 0) for start in starts[run:]))
+        if cleaned[-1:] == ' ':
+            cleaned = cleaned.rstrip(' ')
+            while starts and starts[-1] >= len(cleaned):
+                starts.pop()
+                origins.pop()
+        if TYPOGRAPHIC_CHARS.search(cleaned):
+            cleaned = cleaned.translate(FOLD_TYPOGRAPHIC)
+        return cleaned, OffsetMap(starts, origins, len(cleaned))
+    
+    @staticmethod
+    def segment(cleaned: str, original: str, offsets: OffsetMap) -> str:
+        """
+        Mark the sentence and paragraph ends of cleaned text
+        
+        A sentence ends at terminal punctuation followed by a word that does
+        not start in lower case in the original text, unless the word before
+        it is a common abbreviation. A paragraph ends at a blank line of the
+        original text. The space after each end is replaced with
+        SEGMENT_BREAK, so offsets into the text stay the same.
+        
+        Args:
+            cleaned: Text returned by clean_text_with_offsets
+            original: The text it was cleaned from
+            offsets: Offsets returned by clean_text_with_offsets
+            
+        Returns:
+            The cleaned text with its segment breaks marked
+        """
+        breaks = []
+        for match in SENTENCE_BREAKS.finditer(cleaned):
+            space = match.end() - 1
+            if original[offsets[space + 1]].islower():
+                continue
+            word_start = cleaned.rfind(' ', 0, match.start()) + 1
+            if cleaned[word_start:match.start()] in ABBREVIATIONS:
+                continue
+            breaks.append(space)
+        
+        for match in PARAGRAPH_BREAKS.finditer(original):
+            # The cleaned space standing for the whitespace run holding the blank line
+            index = offsets.position(match.start())
+            if 0 <= index < len(cleaned) and cleaned[index] == ' ':
+                breaks.append(index)
+        
+        if not breaks:
+            return cleaned
+        parts = []
+        start = 0
+        for index in sorted(set(breaks)):
+            parts.append(cleaned[start:index])
+            start = index + 1
+        parts.append(cleaned[start:])
+        return SEGMENT_BREAK.join(parts)
+    
+    @staticmethod
+    def index_tokens(text: str) -> TokenIndex:
+        """Index the tokens of segmented page text, letting the scan skip patterns they cannot match"""
+        return TokenIndex(text)
+    
     @staticmethod
     def get_text_statistics(text: str) -> Dict[str, Any]:
         """Get basic statistics about the text"""
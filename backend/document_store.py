@@ -0,0 +1,133 @@
+import itertools
+import json
+import logging
+import os
+import uuid
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+from .rule_matcher import SCAN_FORMAT, ScanResult
+
+logger = logging.getLogger(__name__)
+
+# Directory holding the extracted text and last scan of every analyzed document
+DOCUMENT_STORE_DIR = os.getenv("DOCUMENT_STORE_DIR", "document_store")
+
+PAGES_FILENAME = "pages.jsonl"
+SCAN_FILENAME = "scan.json"
+
+
+class StoredScan(NamedTuple):
+    """The patterns a document was last scanned with and what they matched"""
+    patterns: List[str]
+    matches: ScanResult
+    document_stats: Dict[str, Any]
+
+
+class DocumentWriter:
+    """
+    Collects the extracted pages and final scan of one analysis
+
+    Nothing is visible to readers until finish() publishes both files, so an
+    analysis that fails part way leaves the previous entry, if any, intact.
+    """
+
+    def __init__(self, entry_dir: str):
+        self.entry_dir = entry_dir
+        os.makedirs(entry_dir, exist_ok=True)
+        self._suffix = f".{uuid.uuid4().hex}.tmp"
+        self._pages_tmp = os.path.join(entry_dir, PAGES_FILENAME + self._suffix)
+        self._pages = open(self._pages_tmp, 'w', encoding='utf-8')
+
+    def add_page(self, text: str) -> None:
+        """Append the extracted text of the next page, including empty pages"""
+        self._pages.write(json.dumps(text) + "\n")
+
+    def finish(self, patterns: List[str], matches: ScanResult, document_stats: Dict[str, Any]) -> None:
+        """Publish the pages and scan"""
+        self._pages.close()
+        _write_scan(os.path.join(self.entry_dir, SCAN_FILENAME), StoredScan(patterns, matches, document_stats))
+        os.replace(self._pages_tmp, os.path.join(self.entry_dir, PAGES_FILENAME))
+
+    def discard(self) -> None:
+        """Drop an unfinished entry; does nothing after finish()"""
+        if not self._pages.closed:
+            self._pages.close()
+        if os.path.exists(self._pages_tmp):
+            os.remove(self._pages_tmp)
+
+
+class DocumentStore:
+    """
+    Durable per-document record of extracted page text and the last rule scan.
+
+    Entries are keyed by content hash like the analysis cache, but are never
+    evicted: they are what lets a rule change be rolled out by scanning only
+    the changed patterns over stored text instead of re-parsing every file.
+    """
+
+    def __init__(self, store_dir: str = DOCUMENT_STORE_DIR):
+        self.store_dir = store_dir
+
+    def writer(self, content_hash: str) -> DocumentWriter:
+        return DocumentWriter(self._entry_dir(content_hash))
+
+    def iter_pages(self, content_hash: str) -> Iterator[str]:
+        """Yield the stored pages of a document in page order"""
+        with open(os.path.join(self._entry_dir(content_hash), PAGES_FILENAME), 'r', encoding='utf-8') as file:
+            for line in file:
+                yield json.loads(line)
+
+    def page(self, content_hash: str, page_number: int) -> Optional[str]:
+        """Text of one stored page, None when the document has fewer; earlier pages are skipped undecoded"""
+        if page_number < 1:
+            return None
+        with open(os.path.join(self._entry_dir(content_hash), PAGES_FILENAME), 'rb') as file:
+            line = next(itertools.islice(file, page_number - 1, None), None)
+        return None if line is None else json.loads(line)
+
+    def has_pages(self, content_hash: str) -> bool:
+        return os.path.exists(os.path.join(self._entry_dir(content_hash), PAGES_FILENAME))
+
+    def load_scan(self, content_hash: str) -> Optional[StoredScan]:
+        """
+        Return the last scan of a document, or None if it has no complete entry
+
+        A scan made by an older scan format comes back without patterns, so
+        re-scoring scans every pattern again over the stored pages.
+        """
+        if not self.has_pages(content_hash):
+            return None
+        try:
+            with open(os.path.join(self._entry_dir(content_hash), SCAN_FILENAME), 'r', encoding='utf-8') as file:
+                scan = json.load(file)
+            if scan.get('scan_format', 1) != SCAN_FORMAT:
+                return StoredScan([], ScanResult({}), scan['document_stats'])
+            return StoredScan(scan['patterns'], ScanResult.from_dict(scan['matches']), scan['document_stats'])
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable stored scan for {content_hash}: {str(e)}")
+            return None
+
+    def save_scan(self, content_hash: str, scan: StoredScan) -> None:
+        """Replace the stored scan of a document after re-scoring"""
+        _write_scan(os.path.join(self._entry_dir(content_hash), SCAN_FILENAME), scan)
+
+    def _entry_dir(self, content_hash: str) -> str:
+        # Two-character fan-out keeps directories small across large corpora
+        return os.path.join(self.store_dir, content_hash[:2], content_hash)
+
+
+def _write_scan(path: str, scan: StoredScan) -> None:
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    # json.dumps uses the C encoder; json.dump streams through the pure Python one
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        file.write(json.dumps({
+            'scan_format': SCAN_FORMAT,
+            'patterns': scan.patterns,
+            'matches': scan.matches.to_dict(),
+            'document_stats': scan.document_stats
+        }))
+    os.replace(tmp_path, path)
+
+
+# Global instance
+document_store = DocumentStore()
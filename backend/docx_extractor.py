@@ -0,0 +1,198 @@
+"""
+Streaming text extraction from Word documents
+
+Reads the WordprocessingML parts straight out of the .docx zip with a
+streaming XML parser instead of building python-docx's object model, so
+memory is bounded by one page of text however large the document is.
+Body text is split into pages at the page breaks Word recorded, and
+documents without any are split at paragraph boundaries every
+DOCX_MAX_PAGE_CHARS characters. Text from headers, footers, footnotes and
+endnotes, where disclosures often live, follows the body as one more page.
+
+Each table cell is read once from the XML, so merged cells, which
+python-docx repeats for every grid column they span, are not duplicated,
+and the continuation cells of a vertical merge hold no text of their own.
+"""
+
+import os
+import re
+import zipfile
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from xml.parsers.expat import ParserCreate
+
+# Characters of text after which a page without a recorded page break is split at the next paragraph
+DOCX_MAX_PAGE_CHARS = int(os.getenv("DOCX_MAX_PAGE_CHARS", "20000"))
+
+# Bytes of a part handed to the XML parser at a time
+PARSE_CHUNK_BYTES = 64 * 1024
+
+# Element names as the parser reports them: namespace URI, '}', local name
+W = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+W_P, W_T, W_BR, W_TYPE = W + 'p', W + 't', W + 'br', W + 'type'
+W_TC, W_VMERGE, W_VAL = W + 'tc', W + 'vMerge', W + 'val'
+W_RENDERED_PAGE_BREAK = W + 'lastRenderedPageBreak'
+
+# Alternative content for older readers, duplicating the text of the preferred choice
+MC_FALLBACK = 'http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
+
+BODY_PART = 'word/document.xml'
+
+# Parts holding text outside the body; the group names order them as they are reported
+NOTE_PARTS = re.compile(r'word/(?:(?P<header>header)|(?P<footer>footer)|(?P<footnotes>footnotes)'
+                        r'|(?P<endnotes>endnotes))(?P<number>\d*)\.xml')
+NOTE_ORDER = ('header', 'footer', 'footnotes', 'endnotes')
+
+# Run content written as a fixed character
+RUN_CHARACTERS = {W + 'tab': '\t', W + 'cr': '\n', W + 'noBreakHyphen': '-'}
+
+# Marks a page break in the fragments yielded by _iter_fragments
+PAGE_BREAK = None
+
+
+def iter_docx_pages(file_path: str, max_page_chars: int = DOCX_MAX_PAGE_CHARS) -> Iterator[str]:
+    """
+    Yield the text of a Word document one page at a time
+
+    Paragraphs end with a newline; the cells of a table are read as
+    paragraphs in row order. Header and footer paragraphs repeated across
+    sections are reported once.
+
+    Raises:
+        zipfile.BadZipFile, KeyError: When the file is not a Word document
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        with archive.open(BODY_PART) as part:
+            yield from _pages(_iter_fragments(part), max_page_chars)
+
+        yield from _pages(_iter_note_fragments(archive), max_page_chars)
+
+
+def _iter_note_fragments(archive: zipfile.ZipFile) -> Iterator[str]:
+    """Paragraphs of the header, footer, footnote and endnote parts, without page breaks"""
+    seen: Set[str] = set()
+    for name in _note_parts(archive.namelist()):
+        with archive.open(name) as part:
+            repeated = seen if name.startswith(('word/header', 'word/footer')) else None
+            fragments = (fragment for fragment in _iter_fragments(part) if fragment is not PAGE_BREAK)
+            yield from _unique(fragments, repeated)
+
+
+def _note_parts(names: Iterable[str]) -> List[str]:
+    """Header, footer, footnote and endnote parts of a package in reporting order"""
+    parts: List[Tuple[int, int, str]] = []
+    for name in names:
+        match = NOTE_PARTS.fullmatch(name)
+        if match:
+            kind = next(group for group in NOTE_ORDER if match.group(group))
+            parts.append((NOTE_ORDER.index(kind), int(match.group('number') or 0), name))
+    return [name for _, _, name in sorted(parts)]
+
+
+def _unique(paragraphs: Iterable[str], seen: Optional[Set[str]]) -> Iterator[str]:
+    """Drop paragraphs whose text was already reported, when `seen` is given"""
+    for paragraph in paragraphs:
+        if seen is not None and paragraph.strip():
+            if paragraph in seen:
+                continue
+            seen.add(paragraph)
+        yield paragraph
+
+
+def _pages(fragments: Iterable[Optional[str]], max_page_chars: int) -> Iterator[str]:
+    """Join fragments into pages, splitting at page breaks and after max_page_chars at a paragraph end"""
+    page: List[str] = []
+    size = 0
+    for fragment in fragments:
+        if fragment is PAGE_BREAK or (size >= max_page_chars and page[-1].endswith('\n')):
+            # Breaks with nothing but whitespace since the last one, such as a page
+            # break followed by the break Word rendered there, make no page
+            text = ''.join(page)
+            if text and not text.isspace():
+                yield text
+            page = []
+            size = 0
+            if fragment is PAGE_BREAK:
+                continue
+        page.append(fragment)
+        size += len(fragment)
+    text = ''.join(page)
+    if text and not text.isspace():
+        yield text
+
+
+def _iter_fragments(part: IO[bytes]) -> Iterator[Optional[str]]:
+    """
+    Yield the text of a WordprocessingML part paragraph by paragraph
+
+    A paragraph holding a page break is yielded as the text before it,
+    PAGE_BREAK and the text after it. The part is fed to the parser in
+    PARSE_CHUNK_BYTES chunks and no tree is built, so memory stays bounded
+    by one chunk and its paragraphs.
+    """
+    collector = _FragmentCollector()
+    parser = ParserCreate(namespace_separator='}')
+    parser.buffer_text = True
+    parser.StartElementHandler = collector.start
+    parser.EndElementHandler = collector.end
+    parser.CharacterDataHandler = collector.characters
+    while True:
+        chunk = part.read(PARSE_CHUNK_BYTES)
+        parser.Parse(chunk, not chunk)
+        yield from collector.fragments
+        collector.fragments.clear()
+        if not chunk:
+            break
+
+
+class _FragmentCollector:
+    """Expat handlers collecting the paragraphs and page breaks of a part"""
+
+    __slots__ = ('fragments', '_text', '_in_text', '_skipping', '_cells')
+
+    def __init__(self):
+        self.fragments: List[Optional[str]] = []
+        self._text: List[str] = []
+        self._in_text = False
+        self._skipping = 0  # depth inside fallback content
+        self._cells: List[bool] = []  # for each open table cell, whether it continues a vertical merge
+
+    def start(self, name: str, attributes: Dict[str, str]) -> None:
+        if name == MC_FALLBACK:
+            self._skipping += 1
+        elif self._skipping:
+            return
+        elif name == W_T:
+            self._in_text = True
+        elif name == W_P and self._text:
+            # A text box's paragraph inside another starts a line of its own
+            self._text.append('\n')
+        elif name == W_TC:
+            self._cells.append(False)
+        elif name == W_VMERGE and attributes.get(W_VAL, 'continue') == 'continue' and self._cells:
+            self._cells[-1] = True
+        elif name in RUN_CHARACTERS:
+            self._text.append(RUN_CHARACTERS[name])
+        elif name == W_BR and attributes.get(W_TYPE) != 'page':
+            self._text.append('\n')
+        elif name == W_BR or name == W_RENDERED_PAGE_BREAK:
+            self.fragments.append(''.join(self._text))
+            self.fragments.append(PAGE_BREAK)
+            self._text = []
+
+    def end(self, name: str) -> None:
+        if name == W_T:
+            self._in_text = False
+        elif name == W_P and not self._skipping:
+            # The empty paragraph Word keeps in a cell continuing a vertical merge is not a line
+            if self._text or not (self._cells and self._cells[-1]):
+                self._text.append('\n')
+                self.fragments.append(''.join(self._text))
+                self._text = []
+        elif name == W_TC and not self._skipping:
+            self._cells.pop()
+        elif name == MC_FALLBACK:
+            self._skipping -= 1
+
+    def characters(self, data: str) -> None:
+        if self._in_text:
+            self._text.append(data)
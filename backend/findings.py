@@ -0,0 +1,91 @@
+"""
+Normalized storage of findings
+
+Each finding is stored as a row of the findings table holding only what is
+specific to it (page, context snippet and match offsets). Its rule type,
+severity, description and suggestion are interned in finding_rules and
+referenced by an id derived from their hash, so the long suggestion texts
+are stored once and aggregates by rule type or severity run in SQL.
+"""
+
+import hashlib
+import threading
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import dialect_insert
+
+
+def rule_id(finding: Dict[str, Any]) -> int:
+    """Signed 64-bit id of a finding's rule fields"""
+    key = '\0'.join((finding['rule_type'], finding['severity'], finding['description'], finding['suggestion']))
+    return int.from_bytes(hashlib.sha256(key.encode('utf-8')).digest()[:8], 'big', signed=True)
+
+
+def finding_rows(analysis_id: int, findings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Column values of the findings table for the findings of one analysis"""
+    return [
+        {
+            'analysis_id': analysis_id,
+            'position': position,
+            'rule_id': rule_id(finding),
+            'page': finding.get('page'),
+            'location': finding.get('location'),
+            'matches': finding.get('matches')
+        }
+        for position, finding in enumerate(findings)
+    ]
+
+
+def finding_records(findings: List[Dict[str, Any]]) -> List[models.Finding]:
+    """Finding rows to attach to a new ComplianceAnalysis"""
+    return [models.Finding(**{column: value for column, value in row.items() if column != 'analysis_id'})
+            for row in finding_rows(None, findings)]
+
+
+class RuleCatalog:
+    """
+    Makes sure the finding_rules rows referenced by new findings exist.
+
+    Rules already written by this process are remembered per database once
+    their transaction commits, so in the steady state writing findings costs
+    no extra statement.
+    """
+
+    def __init__(self):
+        self._known: Set[Tuple[str, int]] = set()
+        self._lock = threading.Lock()
+
+    def ensure(self, session: Session, findings: Iterable[Dict[str, Any]]) -> None:
+        """Insert the rules of `findings` that may be missing; call before flushing them"""
+        database = str(session.get_bind().url)
+        rows = {}
+        for finding in findings:
+            key = (database, rule_id(finding))
+            if key not in self._known and key[1] not in rows:
+                rows[key[1]] = {'id': key[1], 'rule_type': finding['rule_type'], 'severity': finding['severity'],
+                                'description': finding['description'], 'suggestion': finding['suggestion']}
+        if not rows:
+            return
+
+        session.execute(dialect_insert(session, models.FindingRule).on_conflict_do_nothing(), list(rows.values()))
+        session.info.setdefault('finding_rules', set()).update((database, key) for key in rows)
+
+    def _committed(self, session: Session) -> None:
+        pending = session.info.pop('finding_rules', None)
+        if pending:
+            with self._lock:
+                self._known.update(pending)
+
+    def _rolled_back(self, session: Session) -> None:
+        session.info.pop('finding_rules', None)
+
+
+# Global instance
+rule_catalog = RuleCatalog()
+
+event.listen(Session, "after_commit", rule_catalog._committed)
+event.listen(Session, "after_soft_rollback", lambda session, previous_transaction: rule_catalog._rolled_back(session))
@@ -0,0 +1,438 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+from fastapi.concurrency import run_in_threadpool
+
+from . import models, repository, rollups
+from .analysis_cache import analysis_cache
+from .compliance_engine import compliance_engine
+from .database import AsyncSessionLocal
+from .document_parser import DocumentParser
+from .document_store import document_store
+from .findings import finding_records, rule_catalog
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Worker processes analyzing documents at the same time
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", os.cpu_count() or 1))
+
+# Jobs waiting or running before new uploads are turned away
+ANALYSIS_MAX_PENDING = int(os.getenv("ANALYSIS_MAX_PENDING", "100"))
+
+# Cancelled job ids the workers can see; the oldest is overwritten once this many more are cancelled
+CANCELLED_JOB_SLOTS = 256
+
+# Statuses a job never leaves
+FINISHED_JOB_STATUSES = ("done", "failed", "cancelled")
+
+# Set in each worker process by _init_worker: the queue taking (job id, event)
+# pairs to the API process and the shared array of cancelled job ids
+_worker_events = None
+_worker_cancelled = None
+
+
+class QueueFullError(Exception):
+    """Raised when the analysis queue has no room for another job"""
+
+
+class AnalysisCancelled(Exception):
+    """Raised by a worker that stopped analyzing because its job was cancelled"""
+
+
+def _init_worker(events, cancelled) -> None:
+    global _worker_events, _worker_cancelled
+    _worker_events = events
+    _worker_cancelled = cancelled
+
+
+def _is_cancelled(job_id: int) -> bool:
+    with _worker_cancelled.get_lock():
+        return job_id in _worker_cancelled[:]
+
+
+def _follow(job_id: Optional[int], file_path: str, events: Iterator[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Run an analysis to its result, publishing its progress and findings for `job_id`
+
+    The job's cancellation is checked after every page. A cancelled analysis
+    is closed, abandoning its extraction and any partly written cache entry.
+
+    Raises:
+        AnalysisCancelled: When the job was cancelled before the last page
+    """
+    if job_id is None or _worker_events is None:
+        for event in events:
+            if event['event'] == 'result':
+                return event['result']
+
+    page_count = DocumentParser.count_pages(file_path)
+    _worker_events.put((job_id, {'event': 'progress', 'pages_done': 0, 'page_count': page_count}))
+    try:
+        for event in events:
+            if event['event'] == 'result':
+                return event['result']
+            if event['event'] == 'page':
+                if _is_cancelled(job_id):
+                    raise AnalysisCancelled(f"Analysis job {job_id} was cancelled")
+                event = {'event': 'progress', 'pages_done': event['page'], 'page_count': page_count}
+            _worker_events.put((job_id, event))
+    finally:
+        events.close()
+
+
+def run_analysis(file_path: str, document_type: str, content_hash: Optional[str],
+                 job_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Analyze a document inside a worker process, reusing cached text when available
+    
+    The extracted text and scan are kept in the document store so later rule
+    changes can be applied without parsing the file again. With a job id,
+    progress and findings are sent to the API process as they happen and the
+    analysis stops if the job is cancelled.
+    """
+    followed = job_id is not None and _worker_events is not None
+    if content_hash is None:
+        return _follow(job_id, file_path, compliance_engine.iter_analysis(file_path, document_type,
+                                                                          stream_findings=followed))
+    
+    if analysis_cache.has_text(content_hash):
+        pages = analysis_cache.iter_text(content_hash)
+    else:
+        pages = analysis_cache.write_text(content_hash, DocumentParser.iter_pages(file_path))
+    
+    writer = document_store.writer(content_hash)
+    try:
+        analysis_result = _follow(job_id, file_path,
+                                  compliance_engine.iter_analysis(file_path, document_type, pages, writer,
+                                                                  stream_findings=followed))
+    finally:
+        writer.discard()
+    if compliance_engine.is_cacheable(analysis_result):
+        analysis_cache.store_result(content_hash, analysis_result['rules_version'], analysis_result)
+    return analysis_result
+
+
+def cached_analyses(content_hashes: List[Optional[str]]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Cached results of documents under the active rules, None where there is none
+
+    Blocking: resolving the rules may reload the rule pack, and each lookup
+    reads the cache from disk.
+    """
+    rules_version = compliance_engine.rules_version
+    return [analysis_cache.lookup(content_hash, rules_version) if content_hash else None
+            for content_hash in content_hashes]
+
+
+def analysis_record(document_id: int, analysis_result: Dict[str, Any]) -> models.ComplianceAnalysis:
+    """Build the ComplianceAnalysis row for an analysis result"""
+    severities = [finding['severity'] for finding in analysis_result['findings']]
+    return models.ComplianceAnalysis(
+        document_id=document_id,
+        overall_score=analysis_result['overall_score'],
+        compliance_status=analysis_result['compliance_status'],
+        finding_rows=finding_records(analysis_result['findings']),
+        recommendations=analysis_result['recommendations'],
+        finding_count=len(severities),
+        high_count=severities.count('high'),
+        medium_count=severities.count('medium'),
+        low_count=severities.count('low'),
+        rule_pack_version=analysis_result.get('rule_pack_version'),
+        rules_version=analysis_result.get('rules_version'),
+        stage_timings=analysis_result.get('stage_timings'),
+        analyzed_at=datetime.utcnow()
+    )
+
+
+class AnalysisQueue:
+    """
+    Runs compliance analyses in a bounded process pool so CPU-bound parsing and
+    regex scans never block the API's event loop.
+
+    Job state lives in the analysis_jobs table, so jobs that were queued or
+    running when the server stopped are picked up again on startup. Documents
+    whose content was already analyzed under the current rules are answered
+    from the analysis cache without using a worker.
+
+    Workers report each job's progress and findings over a multiprocessing
+    queue, read by a thread of the API process and handed to the job's
+    subscribers. Cancelled job ids are shared with the workers in a small
+    array that they check after every page.
+    """
+
+    def __init__(self, workers: int = ANALYSIS_WORKERS, max_pending: int = ANALYSIS_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._running: Set[int] = set()  # jobs handed to a worker
+        self._cancelling: Set[int] = set()  # running jobs whose worker was asked to stop
+        self._events = None
+        self._cancelled = None
+        self._cancel_slot = 0
+        # Progress and findings so far of each running job, replayed to late subscribers
+        self._progress: Dict[int, Dict[str, Any]] = {}
+        self._listeners: Dict[int, Set[asyncio.Queue]] = defaultdict(set)
+
+    async def start(self) -> None:
+        """Start the worker pool and resume unfinished jobs"""
+        context = multiprocessing.get_context("spawn")
+        self._events = context.Queue()
+        self._cancelled = context.Array('q', CANCELLED_JOB_SLOTS)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self._events, self._cancelled)
+        )
+        self._slots = asyncio.Semaphore(self.workers)
+        threading.Thread(target=self._read_events, args=(asyncio.get_running_loop(),),
+                         name="analysis-events", daemon=True).start()
+        analysis_cache.load()
+
+        async with AsyncSessionLocal() as db:
+            unfinished = await repository.unfinished_jobs(db)
+            for job in unfinished:
+                job.status = "queued"
+                job.started_at = None
+                self._schedule(job.id, job.document)
+            await db.commit()
+
+        if unfinished:
+            logger.info(f"Resumed {len(unfinished)} unfinished analysis jobs")
+
+    async def shutdown(self) -> None:
+        """Stop accepting work and shut down the worker pool"""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._events is not None:
+            self._events.put(None)
+            self._events = None
+
+    async def run_in_worker(self, fn: Callable[..., Any], *args) -> Any:
+        """Run a function in the worker pool once a worker slot is free"""
+        async with self._slots:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def is_full(self, count: int = 1) -> bool:
+        """Whether the queue cannot take `count` more jobs"""
+        return len(self._tasks) + count > self.max_pending
+
+    async def submit(self, db, document: models.Document) -> models.AnalysisJob:
+        """
+        Queue a document for analysis
+
+        Args:
+            db: Async database session used to record the job
+            document: Stored document to analyze
+
+        Returns:
+            The queued AnalysisJob, with its document and analysis loaded
+        """
+        return (await self.submit_many(db, [document]))[0]
+
+    async def submit_many(self, db, documents: List[models.Document]) -> List[models.AnalysisJob]:
+        """
+        Queue several documents for analysis, recording every job in one transaction
+
+        Documents whose content was already analyzed under the current rules
+        get a finished job and their cached analysis straight away. The jobs
+        are returned with their documents and analyses loaded.
+        """
+        cached_results = await run_in_threadpool(cached_analyses, [document.content_hash for document in documents])
+        now = datetime.utcnow()
+        jobs = []
+        queued = []
+        for document, cached_result in zip(documents, cached_results):
+            if cached_result is not None:
+                job = models.AnalysisJob(document_id=document.id, status="done",
+                                         created_at=now, started_at=now, finished_at=now)
+                await db.run_sync(rule_catalog.ensure, cached_result['findings'])
+                await db.run_sync(rollups.record, [(document, cached_result)])
+                db.add(analysis_record(document.id, cached_result))
+            else:
+                job = models.AnalysisJob(document_id=document.id, status="queued", created_at=now)
+                queued.append((job, document))
+            jobs.append(job)
+
+        if self.is_full(len(queued)):
+            raise QueueFullError("Analysis queue is full")
+
+        db.add_all(jobs)
+        with metrics.db_write_seconds.time(operation="submit_jobs"):
+            await db.commit()
+
+        for job, document in queued:
+            self._schedule(job.id, document)
+        return await repository.load_jobs(db, [job.id for job in jobs])
+
+    async def cancel(self, job_id: int) -> bool:
+        """
+        Cancel a job queued or running in this queue
+
+        A job waiting for a worker is dropped and marked "cancelled" straight
+        away. A running job is flagged for its worker, which stops after the
+        page it is scanning; the job is marked "cancelled" once it has, unless
+        its analysis finished first.
+
+        Returns:
+            False when the job is not queued or running here
+        """
+        task = self._tasks.get(job_id)
+        if task is None:
+            return False
+        if job_id in self._running:
+            self._cancelling.add(job_id)
+            with self._cancelled.get_lock():
+                self._cancelled[self._cancel_slot] = job_id
+            self._cancel_slot = (self._cancel_slot + 1) % CANCELLED_JOB_SLOTS
+        else:
+            task.cancel()
+            await self._update_job(job_id, status="cancelled", finished_at=datetime.utcnow())
+            self._announce(job_id, "cancelled")
+            logger.info(f"Analysis job {job_id} cancelled before it started")
+        return True
+
+    @contextmanager
+    def subscribe(self, job_id: int) -> Iterator[asyncio.Queue]:
+        """
+        Receive a job's events while the context is open
+
+        Events are dictionaries named by their 'event' key: 'status' when the
+        job starts or finishes, 'progress' with pages_done and page_count
+        (None when not known in advance) after each page, and 'finding' with
+        each finding as soon as it is produced. For a running job, the
+        progress and findings so far are queued first.
+        """
+        listener: asyncio.Queue = asyncio.Queue()
+        state = self._progress.get(job_id)
+        if state is not None:
+            listener.put_nowait({'event': 'status', 'status': 'running'})
+            if state['progress'] is not None:
+                listener.put_nowait(state['progress'])
+            for event in state['findings']:
+                listener.put_nowait(event)
+        self._listeners[job_id].add(listener)
+        try:
+            yield listener
+        finally:
+            listeners = self._listeners[job_id]
+            listeners.discard(listener)
+            if not listeners:
+                del self._listeners[job_id]
+
+    def _read_events(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Hand the workers' events to the event loop until shutdown"""
+        events = self._events
+        for job_id, event in iter(events.get, None):
+            try:
+                loop.call_soon_threadsafe(self._publish, job_id, event)
+            except RuntimeError:
+                # The event loop is closed
+                return
+
+    def _publish(self, job_id: int, event: Dict[str, Any]) -> None:
+        state = self._progress.get(job_id)
+        if state is None:
+            # Late events of a finished job; its final status carries the complete analysis
+            return
+        if event['event'] == 'finding':
+            state['findings'].append(event)
+        else:
+            state['progress'] = event
+        for listener in self._listeners.get(job_id, ()):
+            listener.put_nowait(event)
+
+    def _announce(self, job_id: int, status: str) -> None:
+        """Tell a job's subscribers its status changed, sent after the change is committed"""
+        if status == "running":
+            self._progress[job_id] = {'progress': None, 'findings': []}
+        else:
+            self._progress.pop(job_id, None)
+        for listener in self._listeners.get(job_id, ()):
+            listener.put_nowait({'event': 'status', 'status': status})
+
+    def _schedule(self, job_id: int, document: models.Document) -> None:
+        task = asyncio.get_running_loop().create_task(self._process(
+            job_id, document.file_path, document.document_type, document.content_hash
+        ))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def _process(self, job_id: int, file_path: str, document_type: str, content_hash: Optional[str]) -> None:
+        try:
+            async with self._slots:
+                # Running from here on, so cancel() flags the job rather than
+                # cancelling its task while it is marked running
+                self._running.add(job_id)
+                await self._update_job(job_id, status="running", started_at=datetime.utcnow())
+                self._announce(job_id, "running")
+                if job_id in self._cancelling:
+                    raise AnalysisCancelled(f"Analysis job {job_id} was cancelled")
+
+                try:
+                    loop = asyncio.get_running_loop()
+                    analysis_result = await loop.run_in_executor(
+                        self._executor, run_analysis, file_path, document_type, content_hash, job_id
+                    )
+                except (asyncio.CancelledError, AnalysisCancelled):
+                    raise
+                except Exception as e:
+                    logger.error(f"Analysis job {job_id} failed: {str(e)}")
+                    await self._update_job(job_id, status="failed", error=str(e), finished_at=datetime.utcnow())
+                    self._announce(job_id, "failed")
+                    return
+
+                if job_id in self._cancelling:
+                    # Cancelled while its last page was scanned
+                    raise AnalysisCancelled(f"Analysis job {job_id} was cancelled")
+
+                await self._save_analysis(job_id, analysis_result)
+                self._announce(job_id, "done")
+                metrics.observe_analysis(analysis_result.get('stage_timings'),
+                                         prefilter=analysis_result.get('prefilter'))
+                if content_hash:
+                    analysis_cache.record(content_hash)
+        except AnalysisCancelled:
+            await self._update_job(job_id, status="cancelled", finished_at=datetime.utcnow())
+            self._announce(job_id, "cancelled")
+            logger.info(f"Analysis job {job_id} cancelled")
+        finally:
+            self._running.discard(job_id)
+            self._cancelling.discard(job_id)
+
+    async def _update_job(self, job_id: int, **values) -> None:
+        async with AsyncSessionLocal() as db:
+            with metrics.db_write_seconds.time(operation="update_job"):
+                await repository.update_job(db, job_id, **values)
+                await db.commit()
+
+    async def _save_analysis(self, job_id: int, analysis_result: Dict[str, Any]) -> None:
+        """Store the analysis results and mark the job done in one transaction"""
+        async with AsyncSessionLocal() as db:
+            with metrics.db_write_seconds.time(operation="save_analysis"):
+                job = await db.get(models.AnalysisJob, job_id)
+                document = await db.get(models.Document, job.document_id)
+                await db.run_sync(rule_catalog.ensure, analysis_result['findings'])
+                await db.run_sync(rollups.record, [(document, analysis_result)])
+                db.add(analysis_record(job.document_id, analysis_result))
+                job.status = "done"
+                job.finished_at = datetime.utcnow()
+                await db.commit()
+
+
+# Global instance
+analysis_queue = AnalysisQueue()
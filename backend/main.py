@@ -1,16 +1,32 @@
-from fastapi import FastAPI, File, UploadFile, Depends, HTTPException
+from fastapi import FastAPI, File, UploadFile, Depends, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import base64
+import json
+import logging
 import os
-import uuid
-from datetime import datetime
-from typing import List, Optional
+import time
+from datetime import date, datetime
+from typing import AsyncIterator, List, Optional, Tuple, Union
 
-from . import models, schemas, database, compliance_engine
-from .database import SessionLocal, engine
+from . import models, schemas, database, repository
+from .database import AsyncSessionLocal
+from .analysis_cache import analysis_cache
+from .document_store import document_store
+from .jobs import analysis_queue, FINISHED_JOB_STATUSES, QueueFullError
+from .metrics import metrics, profiler, PROFILE_SLOW_REQUEST_SECONDS
+from .rescoring import rescorer
+from .rule_packs import rule_packs
+from .uploads import (
+    MAX_FILE_SIZE, UPLOAD_CHUNK_SIZE, UploadSizeLimit, discard_files, extract_zip, is_supported, is_zip_upload,
+    save_upload, zip_contents
+)
 
-models.Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="SEC Marketing Rule Checker",
@@ -18,6 +34,24 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Documents accepted by one batch upload, after zip archives are expanded
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "1000"))
+
+# Bytes of documents one batch upload may store, after zip archives are expanded
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+# Seconds a job event stream may stay quiet before a keep-alive is sent and the job's status is checked
+JOB_EVENTS_KEEPALIVE_SECONDS = float(os.getenv("JOB_EVENTS_KEEPALIVE_SECONDS", "15"))
+
+# Request body limits of the upload routes, allowing for multipart boundaries,
+# form fields and zip headers around the documents. Added before CORS so CORS
+# wraps it and its 413 responses carry CORS headers.
+app.add_middleware(UploadSizeLimit, limits={
+    "/upload-document/": (MAX_FILE_SIZE + UPLOAD_CHUNK_SIZE, "File size exceeds maximum limit of 600MB."),
+    "/upload-documents/": (BATCH_MAX_BYTES + UPLOAD_CHUNK_SIZE,
+                           f"Documents in one batch exceed the limit of {BATCH_MAX_BYTES} bytes."),
+})
+
 # CORS middleware with Railway support
 cors_origins = [
     "http://localhost:3000",  # Local development
@@ -39,115 +73,357 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Create upload directory
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+@app.middleware("http")
+async def observe_requests(request: Request, call_next):
+    """Time every request by route, profiling it when slow request profiling is enabled"""
+    session = profiler.begin() if PROFILE_SLOW_REQUEST_SECONDS > 0 else None
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        duration = time.perf_counter() - start
+        if session is not None:
+            profiler.end(session)
+    
+    # The route template rather than the raw path keeps document ids out of the labels
+    route = request.scope.get("route")
+    path = getattr(route, "path", "unmatched")
+    metrics.request_seconds.observe(duration, method=request.method, path=path, status=response.status_code)
+    
+    if session is not None and duration >= PROFILE_SLOW_REQUEST_SECONDS:
+        profile_path = profiler.dump(session, f"{request.method} {path}")
+        if profile_path:
+            logger.warning(f"{request.method} {request.url.path} took {duration:.2f}s, profile written to {profile_path}")
+    return response
+
+@app.on_event("startup")
+async def start_analysis_queue():
+    if database.DB_AUTO_MIGRATE:
+        await run_in_threadpool(database.upgrade_schema)
+    await analysis_queue.start()
+    rescorer.start()
+
+@app.on_event("shutdown")
+async def stop_analysis_queue():
+    await rescorer.shutdown()
+    await analysis_queue.shutdown()
 
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 @app.get("/")
 async def root():
     return {"message": "SEC Marketing Rule Checker API"}
 
-@app.post("/upload-document/", response_model=schemas.DocumentResponse)
+@app.post("/upload-document/", response_model=schemas.JobResponse, status_code=202)
 async def upload_document(
     file: UploadFile = File(...),
     document_type: str = "advertisement",
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Upload a document for SEC marketing rule compliance checking"""
+    """Upload a document and queue it for SEC marketing rule compliance checking"""
     
     # Validate file type
     allowed_types = ['application/pdf', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document', 'text/plain']
     if file.content_type not in allowed_types:
         raise HTTPException(status_code=400, detail="File type not supported. Please upload PDF, Word, or text files.")
     
-    # Check file size (600MB limit)
-    MAX_FILE_SIZE = 600 * 1024 * 1024  # 600MB in bytes
-    content = await file.read()
-    
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=413, 
-            detail=f"File size exceeds maximum limit of 600MB. File size: {len(content) / (1024*1024):.1f}MB"
-        )
-    
-    # Generate unique filename
-    file_extension = os.path.splitext(file.filename or "")[1]
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(UPLOAD_DIR, unique_filename)
+    if analysis_queue.is_full():
+        raise HTTPException(status_code=503, detail="Analysis queue is full. Please try again shortly.")
     
-    # Save file
-    with open(file_path, "wb") as buffer:
-        buffer.write(content)
+    # Save file, checking size (600MB limit) as it is written
+    created = []
+    file_path, file_size, content_hash = await save_upload(file, created)
     
-    # Create database record
+    # Create database record, committed together with its job
     db_document = models.Document(
         filename=file.filename,
         original_filename=file.filename,
         file_path=file_path,
         document_type=document_type,
-        file_size=len(content),
+        file_size=file_size,
+        content_hash=content_hash,
         uploaded_at=datetime.utcnow()
     )
     db.add(db_document)
-    db.commit()
-    db.refresh(db_document)
+    await db.flush()
     
-    # Analyze document for compliance
+    # Queue the document for compliance analysis
     try:
-        analysis_result = await compliance_engine.analyze_document(file_path, document_type)
-        
-        # Save analysis results
-        db_analysis = models.ComplianceAnalysis(
-            document_id=db_document.id,
-            overall_score=analysis_result['overall_score'],
-            compliance_status=analysis_result['compliance_status'],
-            findings=analysis_result['findings'],
-            recommendations=analysis_result['recommendations'],
-            analyzed_at=datetime.utcnow()
+        return await analysis_queue.submit(db, db_document)
+    except QueueFullError:
+        discard_files(created)
+        raise HTTPException(status_code=503, detail="Analysis queue is full. Please try again shortly.")
+
+@app.post("/upload-documents/", response_model=List[schemas.JobResponse], status_code=202)
+async def upload_documents(
+    files: List[UploadFile] = File(...),
+    document_type: str = "advertisement",
+    db: AsyncSession = Depends(get_db)
+):
+    """Upload several documents, or zip archives of them, and queue each for compliance checking"""
+    
+    # Validate every file before storing any of them
+    for file in files:
+        if not is_zip_upload(file) and not is_supported(file.filename or ""):
+            raise HTTPException(status_code=400, detail=f"File type not supported: {file.filename}. Please upload PDF, Word, text or zip files.")
+    
+    # Count and size the documents from the zip directories before storing any of them
+    document_count = 0
+    total_size = 0
+    for file in files:
+        if is_zip_upload(file):
+            count, size = await run_in_threadpool(zip_contents, file.file)
+        else:
+            count, size = 1, file.size or 0
+        document_count += count
+        total_size += size
+    
+    if not document_count:
+        raise HTTPException(status_code=400, detail="No supported documents found.")
+    
+    if document_count > BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many documents in one batch (limit {BATCH_MAX_FILES}).")
+    
+    if total_size > BATCH_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Documents in one batch exceed the limit of {BATCH_MAX_BYTES} bytes.")
+    
+    # Files this request adds to the store, removed again if it fails
+    created = []
+    stored_files = []
+    try:
+        for file in files:
+            if is_zip_upload(file):
+                stored_files.extend(await run_in_threadpool(extract_zip, file.file, created))
+            else:
+                file_path, file_size, content_hash = await save_upload(file, created)
+                stored_files.append((file.filename, file_path, file_size, content_hash))
+    except BaseException:
+        discard_files(created)
+        raise
+    
+    # Create database records in a single transaction
+    uploaded_at = datetime.utcnow()
+    db_documents = [
+        models.Document(
+            filename=filename,
+            original_filename=filename,
+            file_path=file_path,
+            document_type=document_type,
+            file_size=file_size,
+            content_hash=content_hash,
+            uploaded_at=uploaded_at
         )
-        db.add(db_analysis)
-        db.commit()
-        db.refresh(db_analysis)
+        for filename, file_path, file_size, content_hash in stored_files
+    ]
+    db.add_all(db_documents)
+    try:
+        await db.flush()
+        return await analysis_queue.submit_many(db, db_documents)
+    except QueueFullError:
+        discard_files(created)
+        raise HTTPException(status_code=503, detail="Analysis queue is full. Please try again shortly.")
+
+@app.get("/jobs/{job_id}", response_model=schemas.JobResponse)
+async def get_job(job_id: int, db: AsyncSession = Depends(get_db)):
+    """Get the status of an analysis job, with the analyzed document once it is done"""
+    job = await repository.get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+def server_sent_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def finished_job_event(job_id: int) -> Optional[str]:
+    """The final event of a job's stream, with the job as GET /jobs/{job_id} returns it; None while it runs"""
+    async with AsyncSessionLocal() as db:
+        job = await repository.get_job(db, job_id)
+    if job.status not in FINISHED_JOB_STATUSES:
+        return None
+    return server_sent_event(job.status, schemas.JobResponse.model_validate(job).model_dump(mode="json"))
+
+async def job_events(job_id: int, status: str) -> AsyncIterator[str]:
+    with analysis_queue.subscribe(job_id) as events:
+        # Subscribed before looking again, so a job finishing in between is not missed
+        final = await finished_job_event(job_id)
+        if final is not None:
+            yield final
+            return
+        if events.empty():
+            yield server_sent_event("status", {"status": status})
         
-        return schemas.DocumentResponse(
-            id=db_document.id,
-            filename=db_document.filename,
-            document_type=db_document.document_type,
-            uploaded_at=db_document.uploaded_at,
-            analysis=schemas.AnalysisResponse(
-                id=db_analysis.id,
-                overall_score=db_analysis.overall_score,
-                compliance_status=db_analysis.compliance_status,
-                findings=db_analysis.findings,
-                recommendations=db_analysis.recommendations,
-                analyzed_at=db_analysis.analyzed_at
-            )
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+        while True:
+            try:
+                event = await asyncio.wait_for(events.get(), JOB_EVENTS_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                final = await finished_job_event(job_id)
+                if final is not None:
+                    yield final
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            
+            if event["event"] == "status" and event["status"] in FINISHED_JOB_STATUSES:
+                yield await finished_job_event(job_id)
+                return
+            yield server_sent_event(event["event"], {key: value for key, value in event.items() if key != "event"})
 
-@app.get("/documents/", response_model=List[schemas.DocumentResponse])
-async def get_documents(db: Session = Depends(get_db)):
-    """Get all uploaded documents and their analysis results"""
-    documents = db.query(models.Document).all()
-    return documents
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Stream an analysis job as server-sent events
+    
+    `status` events report the job starting, `progress` events the pages
+    scanned so far after each page, and `finding` events each finding as
+    soon as it is produced. The stream ends with a `done`, `failed` or
+    `cancelled` event carrying the job as GET /jobs/{job_id} returns it,
+    with the final score once done; a finished job gets only that event.
+    """
+    job = await repository.get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(
+        job_events(job_id, job.status),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/jobs/{job_id}/cancel", response_model=schemas.JobResponse, status_code=202)
+async def cancel_job(job_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Cancel a queued or running analysis job
+    
+    A queued job is dropped at once; a running one stops after the page its
+    worker is scanning. Its status turns `cancelled` then, announced on the
+    job's event stream. Finished jobs cannot be cancelled.
+    """
+    job = await repository.get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status in FINISHED_JOB_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Job is already {job.status}")
+    if not await analysis_queue.cancel(job_id):
+        raise HTTPException(status_code=409, detail="Job is not being analyzed by this server")
+    # A queued job was marked cancelled by the queue's own session
+    return (await repository.load_jobs(db, [job_id]))[0]
+
+def encode_cursor(document: models.Document) -> str:
+    return base64.urlsafe_b64encode(f"{document.uploaded_at.isoformat()}|{document.id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        uploaded_at, document_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(uploaded_at), int(document_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@app.get("/documents/", response_model=Union[schemas.DetailedDocumentPage, schemas.DocumentPage])
+async def get_documents(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    compliance_status: Optional[str] = None,
+    document_type: Optional[str] = None,
+    min_score: Optional[float] = None,
+    max_score: Optional[float] = None,
+    uploaded_after: Optional[datetime] = None,
+    uploaded_before: Optional[datetime] = None,
+    include_findings: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get uploaded documents newest first, one page at a time
+    
+    Pass the returned next_cursor as `cursor` to fetch the following page.
+    Findings and recommendations are only included when include_findings is set.
+    """
+    # Fetch one extra row to know whether another page follows
+    documents = await repository.list_documents(
+        db,
+        limit + 1,
+        before=decode_cursor(cursor) if cursor else None,
+        compliance_status=compliance_status,
+        document_type=document_type,
+        min_score=min_score,
+        max_score=max_score,
+        uploaded_after=uploaded_after,
+        uploaded_before=uploaded_before,
+        include_findings=include_findings
+    )
+    next_cursor = encode_cursor(documents[limit - 1]) if len(documents) > limit else None
+    
+    page = schemas.DetailedDocumentPage if include_findings else schemas.DocumentPage
+    return page(items=documents[:limit], next_cursor=next_cursor)
 
 @app.get("/documents/{document_id}", response_model=schemas.DocumentResponse)
-async def get_document(document_id: int, db: Session = Depends(get_db)):
+async def get_document(document_id: int, db: AsyncSession = Depends(get_db)):
     """Get a specific document and its analysis"""
-    document = db.query(models.Document).filter(models.Document.id == document_id).first()
+    document = await repository.get_document(db, document_id)
     if document is None:
         raise HTTPException(status_code=404, detail="Document not found")
     return document
 
+@app.get("/documents/{document_id}/pages/{page_number}", response_model=schemas.PageText)
+async def get_document_page(document_id: int, page_number: int, db: AsyncSession = Depends(get_db)):
+    """Get the extracted text of a page, which finding match offsets refer to"""
+    document = await db.get(models.Document, document_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if not document.content_hash or not await run_in_threadpool(document_store.has_pages, document.content_hash):
+        # Pages are stored when an analysis finishes; they are never extracted per request
+        raise HTTPException(status_code=409, detail="Document pages are not stored until its analysis finishes")
+    try:
+        text = await run_in_threadpool(document_store.page, document.content_hash, page_number)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Could not read document: {str(e)}")
+    if text is None:
+        raise HTTPException(status_code=404, detail="Page not found")
+    return {"page": page_number, "text": text}
+
+@app.get("/findings/counts", response_model=List[schemas.FindingCount], response_model_exclude_none=True)
+async def get_finding_counts(
+    analyzed_after: Optional[datetime] = None,
+    analyzed_before: Optional[datetime] = None,
+    document_type: Optional[str] = None,
+    by_day: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    """Count findings by rule type and severity, optionally per day of analysis"""
+    return await repository.count_findings(db, analyzed_after, analyzed_before, document_type, by_day)
+
+@app.get("/analytics", response_model=schemas.AnalyticsResponse)
+async def get_analytics(
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    document_type: Optional[str] = None,
+    top: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get score distribution, most violated rules and weekly trends by upload week"""
+    return await repository.analytics(db, since, until, document_type, top)
+
+@app.get("/rule-pack")
+async def get_rule_pack():
+    """Get the name and version of the rule pack new analyses use"""
+    return rule_packs.current().info()
+
+@app.get("/rescoring")
+async def get_rescoring_status():
+    """Get progress of re-scoring stored analyses under the active rule pack"""
+    return await rescorer.status()
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Get analysis cache size and hit/miss counters"""
+    return analysis_cache.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Request, analysis stage and database write histograms in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
@@ -0,0 +1,272 @@
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the duration histogram buckets
+METRICS_BUCKETS = tuple(float(bound) for bound in os.getenv(
+    "METRICS_BUCKETS", "0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30,60"
+).split(","))
+
+# Requests taking longer than this many seconds get a profile written; 0 disables profiling
+PROFILE_SLOW_REQUEST_SECONDS = float(os.getenv("PROFILE_SLOW_REQUEST_SECONDS", "0"))
+
+# Seconds between stack samples while a request is being profiled
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+
+# Directory receiving profiles of slow requests
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+
+class StageTimer:
+    """
+    Accumulates the wall-clock time of each stage of one analysis.
+
+    Stages entered repeatedly, such as extraction once per page, add up.
+    """
+
+    __slots__ = ('durations',)
+
+    def __init__(self):
+        self.durations: Dict[str, float] = {}
+
+    def stage(self, name: str) -> '_StageContext':
+        """Context manager adding the time spent inside it to a stage"""
+        return _StageContext(self.durations, name)
+
+    def result(self) -> Dict[str, float]:
+        """Stage durations in seconds, rounded to microseconds"""
+        return {stage: round(seconds, 6) for stage, seconds in self.durations.items()}
+
+
+class _StageContext:
+    # A class rather than contextlib.contextmanager: this runs several times per page
+    __slots__ = ('_durations', '_name', '_start')
+
+    def __init__(self, durations: Dict[str, float], name: str):
+        self._durations = durations
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self._durations[self._name] = self._durations.get(self._name, 0.0) + time.perf_counter() - self._start
+
+
+class Histogram:
+    """A labelled histogram rendered in the Prometheus text format"""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = METRICS_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Label values -> [per-bucket counts (last is +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels) -> '_HistogramTimer':
+        """Context manager observing the time spent inside it"""
+        return _HistogramTimer(self, labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, list(counts), total, count) for key, (counts, total, count) in self._series.items())
+        for key, counts, total, count in series:
+            labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, key)]
+            cumulative = 0
+            for bound, bucket_count in zip((*map(_format_bound, self.buckets), '+Inf'), counts):
+                cumulative += bucket_count
+                bucket_labels = ','.join(labels + ['le="%s"' % bound])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            label_text = f"{{{','.join(labels)}}}" if labels else ''
+            lines.append(f"{self.name}_sum{label_text} {total!r}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class CounterMetric:
+    """A labelled counter rendered in the Prometheus text format"""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._series: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, value in series:
+            labels = ','.join(f'{name}="{_escape(label)}"' for name, label in zip(self.label_names, key))
+            lines.append(f"{self.name}{{{labels}}} {value}" if labels else f"{self.name} {value}")
+        return lines
+
+
+class _HistogramTimer:
+    __slots__ = ('_histogram', '_labels', '_start')
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self._histogram = histogram
+        self._labels = labels
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.perf_counter() - self._start, **self._labels)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_bound(bound: float) -> str:
+    return repr(float(bound))
+
+
+class Metrics:
+    """The application's metrics, exposed by GET /metrics"""
+
+    def __init__(self):
+        self.request_seconds = Histogram(
+            "sec_checker_http_request_duration_seconds", "Time to produce an HTTP response",
+            ("method", "path", "status"))
+        self.analysis_stage_seconds = Histogram(
+            "sec_checker_analysis_stage_duration_seconds",
+            "Time one document analysis spent in each stage", ("stage",))
+        self.analysis_seconds = Histogram(
+            "sec_checker_analysis_duration_seconds", "Total time of one document analysis", ("kind",))
+        self.db_write_seconds = Histogram(
+            "sec_checker_db_write_duration_seconds", "Time of database writes, including the commit",
+            ("operation",))
+        self.prefilter_patterns = CounterMetric(
+            "sec_checker_prefilter_patterns_total",
+            "Patterns the token index prefilter skipped, or let run with and without a match, per scanned window",
+            ("outcome",))
+
+    def observe_analysis(self, stage_timings: Optional[Dict[str, float]], kind: str = "analysis",
+                         prefilter: Optional[Dict[str, int]] = None) -> None:
+        """Record the stage durations and prefilter outcomes of a finished analysis"""
+        for outcome, count in (prefilter or {}).items():
+            self.prefilter_patterns.inc(count, outcome=outcome)
+        if not stage_timings:
+            return
+        for stage, seconds in stage_timings.items():
+            self.analysis_stage_seconds.observe(seconds, stage=stage)
+        self.analysis_seconds.observe(sum(stage_timings.values()), kind=kind)
+
+    def render(self) -> str:
+        series = (self.request_seconds, self.analysis_stage_seconds, self.analysis_seconds, self.db_write_seconds,
+                  self.prefilter_patterns)
+        return "\n".join(line for metric in series for line in metric.render()) + "\n"
+
+
+class ProfileSession:
+    """Stack samples collected while one request ran"""
+
+    def __init__(self):
+        self.samples: Counter = Counter()
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of every thread while any request is profiled.
+
+    A daemon thread wakes every `interval` seconds while at least one session
+    is open and adds the collapsed stack of each thread to every open
+    session, so requests running at the same time share samples. The thread
+    exits when the last session ends and costs nothing while idle.
+    Profiles are written in the collapsed-stack format read by flamegraph.pl
+    and speedscope.
+    """
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL, profile_dir: str = PROFILE_DIR):
+        self.interval = interval
+        self.profile_dir = profile_dir
+        self._sessions: set = set()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def begin(self) -> ProfileSession:
+        session = ProfileSession()
+        with self._lock:
+            self._sessions.add(session)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+        return session
+
+    def end(self, session: ProfileSession) -> None:
+        """Stop sampling into a session; its samples no longer change afterwards"""
+        with self._lock:
+            self._sessions.discard(session)
+
+    def dump(self, session: ProfileSession, label: str) -> Optional[str]:
+        """Write a session's samples to the profile directory, returning the file path"""
+        slug = re.sub(r'[^\w.-]+', '_', label).strip('_')[:80]
+        path = os.path.join(self.profile_dir, f"{datetime.utcnow():%Y%m%dT%H%M%S}-{slug}-{uuid.uuid4().hex[:8]}.collapsed")
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write("".join(f"{stack} {count}\n" for stack, count in session.samples.most_common()))
+        except OSError as e:
+            logger.warning(f"Could not write profile: {str(e)}")
+            return None
+        return path
+
+    def _run(self) -> None:
+        own_thread = threading.get_ident()
+        while True:
+            stacks = [_collapse(frame) for thread_id, frame in sys._current_frames().items() if thread_id != own_thread]
+            with self._lock:
+                if not self._sessions:
+                    self._thread = None
+                    return
+                for session in self._sessions:
+                    session.samples.update(stacks)
+            time.sleep(self.interval)
+
+
+def _collapse(frame) -> str:
+    """Root-first, semicolon-separated stack of a frame"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+# Global instances
+metrics = Metrics()
+profiler = SamplingProfiler()
@@ -0,0 +1,49 @@
+"""Initial schema, as the first release created it with Base.metadata.create_all
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'documents',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('filename', sa.String(), nullable=True),
+        sa.Column('original_filename', sa.String(), nullable=True),
+        sa.Column('file_path', sa.String(), nullable=True),
+        sa.Column('document_type', sa.String(), nullable=True),
+        sa.Column('file_size', sa.Integer(), nullable=True),
+        sa.Column('uploaded_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_documents_id', 'documents', ['id'])
+    op.create_index('ix_documents_filename', 'documents', ['filename'])
+
+    op.create_table(
+        'compliance_analyses',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('document_id', sa.Integer(), nullable=True),
+        sa.Column('overall_score', sa.Float(), nullable=True),
+        sa.Column('compliance_status', sa.String(), nullable=True),
+        sa.Column('findings', sa.JSON(), nullable=True),
+        sa.Column('recommendations', sa.JSON(), nullable=True),
+        sa.Column('analyzed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['document_id'], ['documents.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_compliance_analyses_id', 'compliance_analyses', ['id'])
+
+
+def downgrade() -> None:
+    op.drop_table('compliance_analyses')
+    op.drop_table('documents')
@@ -0,0 +1,121 @@
+"""Columns, indexes and tables added before migrations existed
+
+Content hashes, rule pack versions, stage timings, finding counts, the
+listing indexes and the analysis_jobs table were created by
+Base.metadata.create_all until migrations took over. Databases created
+in between have some of them already, so only what is missing is added.
+Finding counts of existing analyses are filled in from their findings.
+
+Revision ID: 0001a
+Revises: 0001
+Create Date: 2026-10-17
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001a'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+COLUMNS = {
+    'documents': [
+        sa.Column('content_hash', sa.String(), nullable=True),
+    ],
+    'compliance_analyses': [
+        sa.Column('rule_pack_version', sa.String(), nullable=True),
+        sa.Column('rules_version', sa.String(), nullable=True),
+        sa.Column('stage_timings', sa.JSON(), nullable=True),
+        sa.Column('finding_count', sa.Integer(), nullable=True),
+        sa.Column('high_count', sa.Integer(), nullable=True),
+        sa.Column('medium_count', sa.Integer(), nullable=True),
+        sa.Column('low_count', sa.Integer(), nullable=True),
+    ],
+}
+
+INDEXES = {
+    'documents': [
+        ('ix_documents_document_type', ['document_type']),
+        ('ix_documents_content_hash', ['content_hash']),
+        ('ix_documents_uploaded_at_id', ['uploaded_at', 'id']),
+    ],
+    'compliance_analyses': [
+        ('ix_compliance_analyses_document_id', ['document_id']),
+        ('ix_compliance_analyses_overall_score', ['overall_score']),
+        ('ix_compliance_analyses_compliance_status', ['compliance_status']),
+        ('ix_compliance_analyses_rules_version', ['rules_version']),
+    ],
+}
+
+
+def _json(value):
+    # Raw SQL returns JSON columns as text on SQLite and decoded on PostgreSQL
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    for table, columns in COLUMNS.items():
+        existing = {column['name'] for column in inspector.get_columns(table)}
+        for column in columns:
+            if column.name not in existing:
+                op.add_column(table, column)
+
+    for table, indexes in INDEXES.items():
+        existing = {index['name'] for index in inspector.get_indexes(table)}
+        for name, columns in indexes:
+            if name not in existing:
+                op.create_index(name, table, columns)
+
+    if 'analysis_jobs' not in inspector.get_table_names():
+        op.create_table(
+            'analysis_jobs',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('document_id', sa.Integer(), nullable=True),
+            sa.Column('status', sa.String(), nullable=True),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('started_at', sa.DateTime(), nullable=True),
+            sa.Column('finished_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['document_id'], ['documents.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_analysis_jobs_id', 'analysis_jobs', ['id'])
+        op.create_index('ix_analysis_jobs_status', 'analysis_jobs', ['status'])
+
+    analyses = sa.table('compliance_analyses', sa.column('id', sa.Integer()),
+                        sa.column('finding_count', sa.Integer()), sa.column('high_count', sa.Integer()),
+                        sa.column('medium_count', sa.Integer()), sa.column('low_count', sa.Integer()))
+    last_id = 0
+    while True:
+        batch = connection.execute(
+            sa.text("SELECT id, findings FROM compliance_analyses "
+                    "WHERE id > :last_id AND finding_count IS NULL ORDER BY id LIMIT :limit"),
+            {'last_id': last_id, 'limit': BATCH_SIZE}
+        ).fetchall()
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        for analysis_id, analysis_findings in batch:
+            severities = [finding.get('severity') for finding in _json(analysis_findings) or []]
+            connection.execute(analyses.update().where(analyses.c.id == analysis_id).values(
+                finding_count=len(severities), high_count=severities.count('high'),
+                medium_count=severities.count('medium'), low_count=severities.count('low')))
+
+
+def downgrade() -> None:
+    op.drop_table('analysis_jobs')
+    for table, indexes in INDEXES.items():
+        for name, _ in indexes:
+            op.drop_index(name, table_name=table)
+    for table, columns in COLUMNS.items():
+        with op.batch_alter_table(table) as batch:
+            for column in columns:
+                batch.drop_column(column.name)
@@ -0,0 +1,49 @@
+"""Match indexes to the queries the application runs
+
+Drops indexes no query uses: the duplicates of each primary key, and the
+filename and content hash indexes (content lookups go through the
+analysis cache, not the database). Adds the missing index on
+analysis_jobs.document_id, used when loading a document's jobs, and
+replaces the separate status and score indexes with one composite index
+serving the document listing's status and score filters together.
+
+Revision ID: 0002
+Revises: 0001a
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+
+revision = '0002'
+down_revision = '0001a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_index('ix_documents_id', table_name='documents')
+    op.drop_index('ix_documents_filename', table_name='documents')
+    op.drop_index('ix_documents_content_hash', table_name='documents')
+
+    op.drop_index('ix_compliance_analyses_id', table_name='compliance_analyses')
+    op.drop_index('ix_compliance_analyses_overall_score', table_name='compliance_analyses')
+    op.drop_index('ix_compliance_analyses_compliance_status', table_name='compliance_analyses')
+    op.create_index('ix_compliance_analyses_status_score', 'compliance_analyses',
+                    ['compliance_status', 'overall_score'])
+
+    op.drop_index('ix_analysis_jobs_id', table_name='analysis_jobs')
+    op.create_index('ix_analysis_jobs_document_id', 'analysis_jobs', ['document_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_analysis_jobs_document_id', table_name='analysis_jobs')
+    op.create_index('ix_analysis_jobs_id', 'analysis_jobs', ['id'])
+
+    op.drop_index('ix_compliance_analyses_status_score', table_name='compliance_analyses')
+    op.create_index('ix_compliance_analyses_compliance_status', 'compliance_analyses', ['compliance_status'])
+    op.create_index('ix_compliance_analyses_overall_score', 'compliance_analyses', ['overall_score'])
+    op.create_index('ix_compliance_analyses_id', 'compliance_analyses', ['id'])
+
+    op.create_index('ix_documents_content_hash', 'documents', ['content_hash'])
+    op.create_index('ix_documents_filename', 'documents', ['filename'])
+    op.create_index('ix_documents_id', 'documents', ['id'])
@@ -0,0 +1,144 @@
+"""Move findings out of the compliance_analyses JSON column into their own tables
+
+Each finding becomes a row of findings, and its rule type, severity,
+description and suggestion are interned in finding_rules under an id
+derived from their hash. Existing analyses are converted in batches.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+import hashlib
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def _rule_id(finding) -> int:
+    # Same as findings.rule_id, frozen here so later changes there do not alter this migration
+    key = '\0'.join((finding['rule_type'], finding['severity'], finding['description'], finding['suggestion']))
+    return int.from_bytes(hashlib.sha256(key.encode('utf-8')).digest()[:8], 'big', signed=True)
+
+
+def _json(value):
+    # Raw SQL returns JSON columns as text on SQLite and decoded on PostgreSQL
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def upgrade() -> None:
+    rules = op.create_table(
+        'finding_rules',
+        sa.Column('id', sa.BigInteger(), autoincrement=False, nullable=False),
+        sa.Column('rule_type', sa.String(), nullable=True),
+        sa.Column('severity', sa.String(), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('suggestion', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_finding_rules_rule_type', 'finding_rules', ['rule_type'])
+
+    findings = op.create_table(
+        'findings',
+        sa.Column('analysis_id', sa.Integer(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('rule_id', sa.BigInteger(), nullable=True),
+        sa.Column('page', sa.Integer(), nullable=True),
+        sa.Column('location', sa.Text(), nullable=True),
+        sa.Column('matches', sa.JSON(none_as_null=True), nullable=True),
+        sa.ForeignKeyConstraint(['analysis_id'], ['compliance_analyses.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['rule_id'], ['finding_rules.id']),
+        sa.PrimaryKeyConstraint('analysis_id', 'position')
+    )
+    op.create_index('ix_findings_rule_id', 'findings', ['rule_id'])
+    op.create_index('ix_compliance_analyses_analyzed_at', 'compliance_analyses', ['analyzed_at'])
+
+    connection = op.get_bind()
+    known_rules = set()
+    last_id = 0
+    while True:
+        batch = connection.execute(
+            sa.text("SELECT id, findings FROM compliance_analyses WHERE id > :last_id ORDER BY id LIMIT :limit"),
+            {'last_id': last_id, 'limit': BATCH_SIZE}
+        ).fetchall()
+        if not batch:
+            break
+        last_id = batch[-1][0]
+
+        new_rules = {}
+        rows = []
+        for analysis_id, analysis_findings in batch:
+            for position, finding in enumerate(_json(analysis_findings) or []):
+                rule_id = _rule_id(finding)
+                if rule_id not in known_rules:
+                    known_rules.add(rule_id)
+                    new_rules[rule_id] = {
+                        'id': rule_id, 'rule_type': finding['rule_type'], 'severity': finding['severity'],
+                        'description': finding['description'], 'suggestion': finding['suggestion']
+                    }
+                rows.append({'analysis_id': analysis_id, 'position': position, 'rule_id': rule_id,
+                             'page': finding.get('page'), 'location': finding.get('location'),
+                             'matches': finding.get('matches')})
+        if new_rules:
+            op.bulk_insert(rules, list(new_rules.values()))
+        if rows:
+            op.bulk_insert(findings, rows)
+
+    # A plain ALTER (SQLite 3.35+): batch mode would copy and drop the table, and the
+    # drop would cascade to the findings just written
+    op.drop_column('compliance_analyses', 'findings')
+
+
+def downgrade() -> None:
+    op.add_column('compliance_analyses', sa.Column('findings', sa.JSON(), nullable=True))
+
+    connection = op.get_bind()
+    analyses = sa.table('compliance_analyses', sa.column('id', sa.Integer()), sa.column('findings', sa.JSON()))
+    rules = {
+        rule_id: (rule_type, severity, description, suggestion)
+        for rule_id, rule_type, severity, description, suggestion in connection.execute(
+            sa.text("SELECT id, rule_type, severity, description, suggestion FROM finding_rules")
+        )
+    }
+    last_id = 0
+    while True:
+        ids = [row[0] for row in connection.execute(
+            sa.text("SELECT id FROM compliance_analyses WHERE id > :last_id ORDER BY id LIMIT :limit"),
+            {'last_id': last_id, 'limit': BATCH_SIZE}
+        )]
+        if not ids:
+            break
+        last_id = ids[-1]
+
+        by_analysis = {analysis_id: [] for analysis_id in ids}
+        for analysis_id, rule_id, page, location, matches in connection.execute(
+            sa.text("SELECT analysis_id, rule_id, page, location, matches FROM findings "
+                    "WHERE analysis_id >= :first AND analysis_id <= :last ORDER BY analysis_id, position"),
+            {'first': ids[0], 'last': ids[-1]}
+        ):
+            rule_type, severity, description, suggestion = rules[rule_id]
+            finding = {'rule_type': rule_type, 'severity': severity, 'description': description}
+            if location is not None:
+                finding['location'] = location
+            matches = _json(matches)
+            if matches is not None:
+                finding['page'] = page
+                finding['matches'] = matches
+            finding['suggestion'] = suggestion
+            by_analysis[analysis_id].append(finding)
+        for analysis_id, analysis_findings in by_analysis.items():
+            connection.execute(analyses.update().where(analyses.c.id == analysis_id).values(findings=analysis_findings))
+
+    op.drop_index('ix_compliance_analyses_analyzed_at', table_name='compliance_analyses')
+    op.drop_index('ix_findings_rule_id', table_name='findings')
+    op.drop_table('findings')
+    op.drop_index('ix_finding_rules_rule_type', table_name='finding_rules')
+    op.drop_table('finding_rules')
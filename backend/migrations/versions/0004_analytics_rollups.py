@@ -0,0 +1,105 @@
+"""Add the analytics rollup tables and fill them from the stored analyses
+
+analysis_rollups counts analyses and sums their scores per upload week,
+document type, status and score bucket; finding_rollups counts findings per
+upload week, document type, rule type and severity. Both are kept up to date
+by every later write of an analysis.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def _week(uploaded_at):
+    # Same as rollups.week_of, frozen here; raw SQL returns timestamps as text on SQLite
+    if isinstance(uploaded_at, str):
+        uploaded_at = datetime.fromisoformat(uploaded_at)
+    day = (uploaded_at or datetime.utcnow()).date()
+    return day - timedelta(days=day.weekday())
+
+
+def upgrade() -> None:
+    analysis_rollups = op.create_table(
+        'analysis_rollups',
+        sa.Column('week', sa.Date(), nullable=False),
+        sa.Column('document_type', sa.String(), nullable=False),
+        sa.Column('compliance_status', sa.String(), nullable=False),
+        sa.Column('score_bucket', sa.Integer(), nullable=False),
+        sa.Column('analysis_count', sa.Integer(), nullable=False),
+        sa.Column('score_sum', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('week', 'document_type', 'compliance_status', 'score_bucket')
+    )
+    finding_rollups = op.create_table(
+        'finding_rollups',
+        sa.Column('week', sa.Date(), nullable=False),
+        sa.Column('document_type', sa.String(), nullable=False),
+        sa.Column('rule_type', sa.String(), nullable=False),
+        sa.Column('severity', sa.String(), nullable=False),
+        sa.Column('finding_count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('week', 'document_type', 'rule_type', 'severity')
+    )
+
+    # Accumulate in memory: the rollups have one row per week and category, not per analysis
+    connection = op.get_bind()
+    analyses = defaultdict(lambda: [0, 0.0])
+    findings = Counter()
+    last_id = 0
+    while True:
+        batch = connection.execute(
+            sa.text("SELECT a.id, a.compliance_status, a.overall_score, d.uploaded_at, d.document_type "
+                    "FROM compliance_analyses a JOIN documents d ON d.id = a.document_id "
+                    "WHERE a.id > :last_id AND a.compliance_status IS NOT NULL AND a.overall_score IS NOT NULL "
+                    "ORDER BY a.id LIMIT :limit"),
+            {'last_id': last_id, 'limit': BATCH_SIZE}
+        ).fetchall()
+        if not batch:
+            break
+        last_id = batch[-1][0]
+
+        keys = {}
+        for analysis_id, status, score, uploaded_at, document_type in batch:
+            keys[analysis_id] = (_week(uploaded_at), document_type or '')
+            totals = analyses[keys[analysis_id] + (status, min(int(score // 10) * 10, 100))]
+            totals[0] += 1
+            totals[1] += score
+        for analysis_id, rule_type, severity, count in connection.execute(
+            sa.text("SELECT f.analysis_id, r.rule_type, r.severity, COUNT(*) FROM findings f "
+                    "JOIN finding_rules r ON r.id = f.rule_id "
+                    "WHERE f.analysis_id >= :first AND f.analysis_id <= :last "
+                    "GROUP BY f.analysis_id, r.rule_type, r.severity"),
+            {'first': batch[0][0], 'last': last_id}
+        ):
+            if analysis_id in keys:
+                findings[keys[analysis_id] + (rule_type, severity)] += count
+
+    if analyses:
+        op.bulk_insert(analysis_rollups, [
+            {'week': week, 'document_type': document_type, 'compliance_status': status, 'score_bucket': bucket,
+             'analysis_count': count, 'score_sum': score_sum}
+            for (week, document_type, status, bucket), (count, score_sum) in analyses.items()
+        ])
+    if findings:
+        op.bulk_insert(finding_rollups, [
+            {'week': week, 'document_type': document_type, 'rule_type': rule_type, 'severity': severity,
+             'finding_count': count}
+            for (week, document_type, rule_type, severity), count in findings.items()
+        ])
+
+
+def downgrade() -> None:
+    op.drop_table('finding_rollups')
+    op.drop_table('analysis_rollups')
@@ -1,31 +1,140 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Float, ForeignKey, JSON
+from sqlalchemy import BigInteger, Column, Integer, String, Date, DateTime, Text, Float, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
+from typing import Any, Dict, List
+
 from .database import Base
 
 class Document(Base):
     __tablename__ = "documents"
 
-    id = Column(Integer, primary_key=True, index=True)
-    filename = Column(String, index=True)
+    id = Column(Integer, primary_key=True)
+    filename = Column(String)
     original_filename = Column(String)
     file_path = Column(String)
-    document_type = Column(String)  # "advertisement", "rfp", "rfi", etc.
+    document_type = Column(String, index=True)  # "advertisement", "rfp", "rfi", etc.
     file_size = Column(Integer)
+    content_hash = Column(String)  # SHA-256 of the uploaded bytes
     uploaded_at = Column(DateTime)
     
     # Relationship to compliance analysis
     analysis = relationship("ComplianceAnalysis", back_populates="document", uselist=False)
+    
+    # Relationship to analysis jobs
+    jobs = relationship("AnalysisJob", back_populates="document")
+    
+    # Newest-first keyset pagination and upload date filters
+    __table_args__ = (Index("ix_documents_uploaded_at_id", "uploaded_at", "id"),)
 
 class ComplianceAnalysis(Base):
     __tablename__ = "compliance_analyses"
 
-    id = Column(Integer, primary_key=True, index=True)
-    document_id = Column(Integer, ForeignKey("documents.id"))
+    id = Column(Integer, primary_key=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), index=True)
     overall_score = Column(Float)  # 0-100 compliance score
     compliance_status = Column(String)  # "compliant", "non_compliant", "needs_review"
-    findings = Column(JSON)  # List of compliance findings
     recommendations = Column(JSON)  # List of recommendations
-    analyzed_at = Column(DateTime)
+    analyzed_at = Column(DateTime, index=True)
+    rule_pack_version = Column(String)  # Declared version of the rule pack used
+    rules_version = Column(String, index=True)  # Hash of the rules used, to find results needing a re-run
+    stage_timings = Column(JSON)  # Seconds spent in each analysis stage; empty for cached results
+    
+    # Finding counts, so listings can summarize without loading findings
+    finding_count = Column(Integer, default=0)
+    high_count = Column(Integer, default=0)
+    medium_count = Column(Integer, default=0)
+    low_count = Column(Integer, default=0)
+    
+    # Relationship to document
+    document = relationship("Document", back_populates="analysis")
+    
+    # Findings in the order the engine reported them
+    finding_rows = relationship("Finding", order_by="Finding.position", cascade="all, delete-orphan",
+                                passive_deletes=True)
+    
+    @property
+    def findings(self) -> List[Dict[str, Any]]:
+        """Findings in the form the compliance engine reports them"""
+        return [row.as_dict() for row in self.finding_rows]
+    
+    # Status and score filters of the document listing
+    __table_args__ = (Index("ix_compliance_analyses_status_score", "compliance_status", "overall_score"),)
+
+
+class AnalysisJob(Base):
+    __tablename__ = "analysis_jobs"
+
+    id = Column(Integer, primary_key=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), index=True)
+    status = Column(String, index=True)  # "queued", "running", "done", "failed", "cancelled"
+    error = Column(Text)
+    created_at = Column(DateTime)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
     
     # Relationship to document
-    document = relationship("Document", back_populates="analysis") 
\ No newline at end of file
+    document = relationship("Document", back_populates="jobs")
+
+
+class FindingRule(Base):
+    """
+    Interned rule type, severity, description and suggestion of findings.
+
+    The id is derived from a hash of those fields (see findings.rule_id), so
+    writers can reference a rule without looking it up first.
+    """
+    __tablename__ = "finding_rules"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=False)
+    rule_type = Column(String, index=True)
+    severity = Column(String)
+    description = Column(Text)
+    suggestion = Column(Text)
+
+
+class Finding(Base):
+    __tablename__ = "findings"
+
+    analysis_id = Column(Integer, ForeignKey("compliance_analyses.id", ondelete="CASCADE"), primary_key=True)
+    position = Column(Integer, primary_key=True)  # Order within the analysis
+    rule_id = Column(BigInteger, ForeignKey("finding_rules.id"), index=True)
+    page = Column(Integer)
+    location = Column(Text)  # Context snippet around the first match
+    matches = Column(JSON(none_as_null=True))  # Match offsets; null for findings not tied to a pattern
+    
+    # Rules are few and shared, so load them with the findings
+    rule = relationship("FindingRule", lazy="joined")
+    
+    def as_dict(self) -> Dict[str, Any]:
+        finding = {'rule_type': self.rule.rule_type, 'severity': self.rule.severity,
+                   'description': self.rule.description}
+        if self.location is not None:
+            finding['location'] = self.location
+        if self.page is not None:
+            finding['page'] = self.page
+        if self.matches is not None:
+            finding['matches'] = self.matches
+        finding['suggestion'] = self.rule.suggestion
+        return finding
+
+
+class AnalysisRollup(Base):
+    """Analysis counts and score sums per upload week, document type, status and score bucket"""
+    __tablename__ = "analysis_rollups"
+
+    week = Column(Date, primary_key=True)  # Monday of the document's upload week
+    document_type = Column(String, primary_key=True)
+    compliance_status = Column(String, primary_key=True)
+    score_bucket = Column(Integer, primary_key=True)  # 0, 10, ... 90, and 100 for perfect scores
+    analysis_count = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0.0)
+
+
+class FindingRollup(Base):
+    """Finding counts per upload week, document type, rule type and severity"""
+    __tablename__ = "finding_rollups"
+
+    week = Column(Date, primary_key=True)
+    document_type = Column(String, primary_key=True)
+    rule_type = Column(String, primary_key=True)
+    severity = Column(String, primary_key=True)
+    finding_count = Column(Integer, nullable=False, default=0)
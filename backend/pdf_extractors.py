@@ -0,0 +1,209 @@
+import io
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Type
+
+from PyPDF2 import PdfReader
+
+logger = logging.getLogger(__name__)
+
+# PDF text extraction backends in order of preference; a page one backend fails on
+# is extracted by the next. Backends whose package is not installed are skipped.
+PDF_EXTRACTORS = [name.strip() for name in os.getenv("PDF_EXTRACTORS", "pypdfium2,pypdf2").split(",") if name.strip()]
+
+# PDFium is not thread-safe, even across documents
+_pdfium_lock = threading.Lock()
+
+
+class PdfExtractor:
+    """Extracts the text of pages of one open PDF with a single library"""
+
+    name = ''
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+
+    @property
+    def page_count(self) -> int:
+        raise NotImplementedError
+
+    def extract_page(self, index: int) -> str:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class PyPDF2Extractor(PdfExtractor):
+    """Pure Python extraction with PyPDF2"""
+
+    name = 'pypdf2'
+
+    def __init__(self, file_path: str):
+        super().__init__(file_path)
+        self._file = open(file_path, 'rb')
+        try:
+            self._pages = PdfReader(self._file).pages
+        except Exception:
+            self._file.close()
+            raise
+
+    @property
+    def page_count(self) -> int:
+        return len(self._pages)
+
+    def extract_page(self, index: int) -> str:
+        return self._pages[index].extract_text()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class PdfiumExtractor(PdfExtractor):
+    """Extraction with PDFium, the C++ engine behind Chrome's PDF viewer, through pypdfium2"""
+
+    name = 'pypdfium2'
+
+    def __init__(self, file_path: str):
+        super().__init__(file_path)
+        import pypdfium2
+        with _pdfium_lock:
+            self._document = pypdfium2.PdfDocument(file_path)
+
+    @property
+    def page_count(self) -> int:
+        return len(self._document)
+
+    def extract_page(self, index: int) -> str:
+        with _pdfium_lock:
+            page = self._document[index]
+            try:
+                text_page = page.get_textpage()
+                try:
+                    text = text_page.get_text_range()
+                finally:
+                    text_page.close()
+            finally:
+                page.close()
+        # PDFium ends lines with CRLF; the other backends and the cleaner expect LF
+        return text.replace('\r\n', '\n')
+
+    def close(self) -> None:
+        with _pdfium_lock:
+            self._document.close()
+
+
+class PdfminerExtractor(PdfExtractor):
+    """Layout-analysing extraction with pdfminer.six: slow, but keeps reading order on designed pages"""
+
+    name = 'pdfminer'
+
+    def __init__(self, file_path: str):
+        super().__init__(file_path)
+        from pdfminer.pdfdocument import PDFDocument
+        from pdfminer.pdfinterp import PDFResourceManager
+        from pdfminer.pdfpage import PDFPage
+        from pdfminer.pdfparser import PDFParser
+        self._file = open(file_path, 'rb')
+        try:
+            self._pages = list(PDFPage.create_pages(PDFDocument(PDFParser(self._file))))
+        except Exception:
+            self._file.close()
+            raise
+        self._resources = PDFResourceManager(caching=True)
+
+    @property
+    def page_count(self) -> int:
+        return len(self._pages)
+
+    def extract_page(self, index: int) -> str:
+        from pdfminer.converter import TextConverter
+        from pdfminer.layout import LAParams
+        from pdfminer.pdfinterp import PDFPageInterpreter
+        output = io.StringIO()
+        device = TextConverter(self._resources, output, laparams=LAParams())
+        try:
+            PDFPageInterpreter(self._resources, device).process_page(self._pages[index])
+        finally:
+            device.close()
+        return output.getvalue()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+EXTRACTORS: Dict[str, Type[PdfExtractor]] = {
+    extractor.name: extractor for extractor in (PdfiumExtractor, PyPDF2Extractor, PdfminerExtractor)
+}
+
+_unavailable: set = set()
+
+
+class PdfTextExtractor:
+    """
+    Extracts PDF pages with the configured backends, falling back page by page.
+
+    Each page is extracted by the first backend that succeeds on it. Backends
+    further down the list are only opened once a page needs them, and a
+    backend that cannot open the document is skipped for all of its pages.
+    """
+
+    def __init__(self, file_path: str, backends: Optional[Sequence[str]] = None):
+        self.file_path = file_path
+        self.backends = [name for name in (backends or PDF_EXTRACTORS) if name not in _unavailable]
+        self._opened: Dict[str, Optional[PdfExtractor]] = {}
+        self.page_count = None
+        errors = []
+        for name in self.backends:
+            extractor = self._open(name, errors)
+            if extractor is not None:
+                self.page_count = extractor.page_count
+                break
+        if self.page_count is None:
+            raise Exception('; '.join(errors) or "No PDF extraction backend is available")
+
+    def extract_page(self, index: int) -> str:
+        errors = []
+        for name in self.backends:
+            extractor = self._open(name, errors)
+            if extractor is None:
+                continue
+            try:
+                return extractor.extract_page(index)
+            except Exception as e:
+                errors.append(f"{name}: {str(e)}")
+                logger.warning(f"{name} failed on page {index + 1} of {self.file_path}: {str(e)}")
+        raise Exception(f"Page {index + 1}: {'; '.join(errors)}")
+
+    def close(self) -> None:
+        for extractor in self._opened.values():
+            if extractor is not None:
+                extractor.close()
+        self._opened = {}
+
+    def __enter__(self) -> 'PdfTextExtractor':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _open(self, name: str, errors: List[str]) -> Optional[PdfExtractor]:
+        """The open backend of that name, or None if it cannot read this document"""
+        if name in self._opened:
+            return self._opened[name]
+        extractor = None
+        try:
+            extractor = EXTRACTORS[name](self.file_path)
+        except KeyError:
+            errors.append(f"unknown PDF extractor '{name}'")
+        except ImportError as e:
+            # Not installed: stop trying it for every document
+            _unavailable.add(name)
+            logger.warning(f"PDF extractor {name} is not available: {str(e)}")
+            errors.append(f"{name}: not installed")
+        except Exception as e:
+            errors.append(f"{name}: {str(e)}")
+            logger.warning(f"{name} could not open {self.file_path}: {str(e)}")
+        self._opened[name] = extractor
+        return extractor
@@ -0,0 +1,314 @@
+"""
+Database access of the API and the background queues
+
+Every function takes an AsyncSession and runs its queries without blocking
+the event loop. Relationships that responses serialize are loaded up front,
+since async sessions cannot lazy-load them on attribute access.
+"""
+
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, func, insert, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
+
+from . import models, rollups
+from .findings import finding_rows, rule_catalog
+
+# A job with its document and the document's analysis, as JobResponse shows it
+_JOB_WITH_DOCUMENT = (
+    joinedload(models.AnalysisJob.document)
+    .joinedload(models.Document.analysis)
+    .selectinload(models.ComplianceAnalysis.finding_rows)
+)
+
+
+async def get_job(db: AsyncSession, job_id: int) -> Optional[models.AnalysisJob]:
+    result = await db.execute(
+        select(models.AnalysisJob).where(models.AnalysisJob.id == job_id).options(_JOB_WITH_DOCUMENT)
+    )
+    return result.scalar_one_or_none()
+
+
+async def load_jobs(db: AsyncSession, job_ids: Sequence[int]) -> List[models.AnalysisJob]:
+    """Jobs in the order of `job_ids`, refreshed with their documents and analyses"""
+    result = await db.execute(
+        select(models.AnalysisJob)
+        .where(models.AnalysisJob.id.in_(job_ids))
+        .options(_JOB_WITH_DOCUMENT)
+        .execution_options(populate_existing=True)
+    )
+    jobs = {job.id: job for job in result.scalars()}
+    return [jobs[job_id] for job_id in job_ids]
+
+
+async def unfinished_jobs(db: AsyncSession) -> List[models.AnalysisJob]:
+    """Jobs left queued or running, with their documents"""
+    result = await db.execute(
+        select(models.AnalysisJob)
+        .where(models.AnalysisJob.status.in_(["queued", "running"]))
+        .options(selectinload(models.AnalysisJob.document))
+    )
+    return list(result.scalars())
+
+
+async def update_job(db: AsyncSession, job_id: int, **values) -> None:
+    await db.execute(update(models.AnalysisJob).where(models.AnalysisJob.id == job_id).values(**values))
+
+
+async def get_document(db: AsyncSession, document_id: int) -> Optional[models.Document]:
+    result = await db.execute(
+        select(models.Document)
+        .where(models.Document.id == document_id)
+        .options(joinedload(models.Document.analysis).selectinload(models.ComplianceAnalysis.finding_rows))
+    )
+    return result.scalar_one_or_none()
+
+
+async def list_documents(
+    db: AsyncSession,
+    limit: int,
+    before: Optional[Tuple[datetime, int]] = None,
+    compliance_status: Optional[str] = None,
+    document_type: Optional[str] = None,
+    min_score: Optional[float] = None,
+    max_score: Optional[float] = None,
+    uploaded_after: Optional[datetime] = None,
+    uploaded_before: Optional[datetime] = None,
+    include_findings: bool = False
+) -> List[models.Document]:
+    """
+    Documents newest first, with their analyses
+
+    Args:
+        limit: Maximum number of documents returned
+        before: (uploaded_at, id) keyset cursor; only older documents are returned
+        include_findings: Load the findings and recommendations too
+
+    Returns:
+        Matching documents
+    """
+    query = (
+        select(models.Document)
+        .outerjoin(models.Document.analysis)
+        .order_by(models.Document.uploaded_at.desc(), models.Document.id.desc())
+    )
+
+    # Load the analysis in the same query; findings and recommendations only when asked for
+    analysis = contains_eager(models.Document.analysis)
+    if include_findings:
+        query = query.options(analysis.selectinload(models.ComplianceAnalysis.finding_rows))
+    else:
+        query = query.options(analysis.defer(models.ComplianceAnalysis.recommendations))
+
+    if before:
+        query = query.where(tuple_(models.Document.uploaded_at, models.Document.id) < before)
+    if compliance_status:
+        query = query.where(models.ComplianceAnalysis.compliance_status == compliance_status)
+    if document_type:
+        query = query.where(models.Document.document_type == document_type)
+    if min_score is not None:
+        query = query.where(models.ComplianceAnalysis.overall_score >= min_score)
+    if max_score is not None:
+        query = query.where(models.ComplianceAnalysis.overall_score <= max_score)
+    if uploaded_after:
+        query = query.where(models.Document.uploaded_at >= uploaded_after)
+    if uploaded_before:
+        query = query.where(models.Document.uploaded_at < uploaded_before)
+
+    result = await db.execute(query.limit(limit))
+    return list(result.scalars())
+
+
+async def count_findings(
+    db: AsyncSession,
+    analyzed_after: Optional[datetime] = None,
+    analyzed_before: Optional[datetime] = None,
+    document_type: Optional[str] = None,
+    by_day: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Number of findings by rule type and severity, counted in SQL
+
+    Args:
+        analyzed_after: Only count analyses made at or after this time
+        analyzed_before: Only count analyses made before this time
+        document_type: Only count documents of this type
+        by_day: Also group by the day of the analysis
+
+    Returns:
+        Dicts with rule_type, severity, count and, when by_day is set, day
+    """
+    group = [models.FindingRule.rule_type, models.FindingRule.severity]
+    if by_day:
+        group.insert(0, func.date(models.ComplianceAnalysis.analyzed_at).label('day'))
+    query = (
+        select(*group, func.count().label('count'))
+        .select_from(models.Finding)
+        .join(models.FindingRule, models.Finding.rule_id == models.FindingRule.id)
+        .join(models.ComplianceAnalysis, models.Finding.analysis_id == models.ComplianceAnalysis.id)
+        .group_by(*group)
+        .order_by(*group)
+    )
+    if analyzed_after:
+        query = query.where(models.ComplianceAnalysis.analyzed_at >= analyzed_after)
+    if analyzed_before:
+        query = query.where(models.ComplianceAnalysis.analyzed_at < analyzed_before)
+    if document_type:
+        query = query.join(models.ComplianceAnalysis.document).where(models.Document.document_type == document_type)
+
+    result = await db.execute(query)
+    return [dict(row._mapping) for row in result]
+
+
+async def analytics(
+    db: AsyncSession,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    document_type: Optional[str] = None,
+    top: int = 10
+) -> Dict[str, Any]:
+    """
+    Score distribution, top rules and weekly trends, read from the rollup tables only
+
+    Args:
+        since: Only count documents uploaded in or after the week of this day
+        until: Only count documents uploaded before the week of this day
+        document_type: Only count documents of this type
+        top: Number of most violated rules returned, with their weekly trends
+
+    Returns:
+        Dict matching schemas.AnalyticsResponse
+    """
+    def scoped(query, table):
+        if since:
+            query = query.where(table.week >= rollups.week_of(since))
+        if until:
+            query = query.where(table.week < rollups.week_of(until))
+        if document_type is not None:
+            query = query.where(table.document_type == document_type)
+        return query
+
+    analyses = models.AnalysisRollup
+    analysis_count = func.sum(analyses.analysis_count)
+    score_sum = func.sum(analyses.score_sum)
+
+    async def analysis_totals(*group):
+        query = scoped(select(*group, analysis_count, score_sum), analyses)
+        if group:
+            query = query.group_by(*group).having(analysis_count > 0).order_by(*group)
+        return (await db.execute(query)).all()
+
+    findings = models.FindingRollup
+    finding_count = func.sum(findings.finding_count)
+
+    async def finding_totals(*group, limit=None):
+        query = scoped(select(*group, finding_count), findings).group_by(*group).having(finding_count > 0)
+        if limit:
+            query = query.order_by(finding_count.desc(), *group).limit(limit)
+        return (await db.execute(query)).all()
+
+    def summary(count, total):
+        return {'analyses': count or 0, 'average_score': round(total / count, 2) if count else None}
+
+    (count, total), = await analysis_totals()
+    findings_by_type = dict(await finding_totals(findings.document_type))
+    findings_by_week = dict(await finding_totals(findings.week))
+
+    top_rules = await finding_totals(findings.rule_type, findings.severity, limit=top)
+    rule_trends = []
+    if top_rules:
+        result = await db.execute(
+            scoped(select(findings.week, findings.rule_type, findings.severity, finding_count), findings)
+            .where(tuple_(findings.rule_type, findings.severity).in_(
+                [(rule_type, severity) for rule_type, severity, _ in top_rules]))
+            .group_by(findings.week, findings.rule_type, findings.severity)
+            .having(finding_count > 0)
+            .order_by(findings.week, findings.rule_type, findings.severity)
+        )
+        rule_trends = [{'week': week, 'rule_type': rule_type, 'severity': severity, 'count': rule_count}
+                       for week, rule_type, severity, rule_count in result]
+
+    return {
+        'totals': {**summary(count, total), 'findings': sum(findings_by_type.values())},
+        'score_distribution': [{'bucket': bucket, 'count': bucket_count}
+                               for bucket, bucket_count, _ in await analysis_totals(analyses.score_bucket)],
+        'status_counts': [{'compliance_status': status, 'count': status_count}
+                          for status, status_count, _ in await analysis_totals(analyses.compliance_status)],
+        'by_document_type': [
+            {'document_type': type_, **summary(type_count, type_total), 'findings': findings_by_type.get(type_, 0)}
+            for type_, type_count, type_total in await analysis_totals(analyses.document_type)
+        ],
+        'top_rules': [{'rule_type': rule_type, 'severity': severity, 'count': rule_count}
+                      for rule_type, severity, rule_count in top_rules],
+        'weekly': [
+            {'week': week, **summary(week_count, week_total), 'findings': findings_by_week.get(week, 0)}
+            for week, week_count, week_total in await analysis_totals(analyses.week)
+        ],
+        'rule_trends': rule_trends
+    }
+
+
+def _stale(query, rules_version: str):
+    return query.join(models.ComplianceAnalysis.document).where(
+        or_(models.ComplianceAnalysis.rules_version.is_(None),
+            models.ComplianceAnalysis.rules_version != rules_version)
+    )
+
+
+async def count_stale_analyses(db: AsyncSession, rules_version: str) -> int:
+    """Number of analyses made under other rules than `rules_version`"""
+    result = await db.execute(_stale(select(func.count(models.ComplianceAnalysis.id)), rules_version))
+    return result.scalar_one()
+
+
+async def stale_analyses(db: AsyncSession, rules_version: str, after_id: int,
+                         limit: int) -> List[Tuple[int, Optional[str], str, str]]:
+    """
+    Next batch of analyses made under other rules, in id order
+
+    Returns:
+        (analysis id, content hash, file path, document type) of each analysis
+    """
+    result = await db.execute(
+        _stale(select(models.ComplianceAnalysis.id, models.Document.content_hash,
+                      models.Document.file_path, models.Document.document_type), rules_version)
+        .where(models.ComplianceAnalysis.id > after_id)
+        .order_by(models.ComplianceAnalysis.id)
+        .limit(limit)
+    )
+    return [tuple(row) for row in result]
+
+
+async def update_analyses(db: AsyncSession, updates: List[Dict[str, Any]],
+                          findings: Dict[int, List[Dict[str, Any]]]) -> None:
+    """
+    Replace analyses by primary key
+
+    Args:
+        updates: Dicts holding an analysis 'id' and its new column values
+        findings: New findings of each updated analysis, by analysis id
+    """
+    await db.run_sync(_replace_analyses, updates, findings)
+
+
+def _replace_analyses(session: Session, updates: List[Dict[str, Any]],
+                      findings: Dict[int, List[Dict[str, Any]]]) -> None:
+    # Take the old results out of the rollups before they are overwritten, then add the new ones
+    delta = rollups.RollupDelta()
+    documents = delta.retract_stored(session, [values['id'] for values in updates])
+
+    session.execute(update(models.ComplianceAnalysis), updates)
+    rule_catalog.ensure(session, (finding for analysis_findings in findings.values() for finding in analysis_findings))
+    session.execute(delete(models.Finding).where(models.Finding.analysis_id.in_(list(findings))))
+    rows = [row for analysis_id, analysis_findings in findings.items()
+            for row in finding_rows(analysis_id, analysis_findings)]
+    if rows:
+        session.execute(insert(models.Finding), rows)
+
+    for values in updates:
+        delta.add(documents[values['id']], values['compliance_status'], values['overall_score'],
+                  ((finding['rule_type'], finding['severity']) for finding in findings[values['id']]))
+    delta.apply(session)
@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from . import repository
+from .analysis_cache import analysis_cache
+from .compliance_engine import compliance_engine
+from .database import AsyncSessionLocal
+from .document_store import document_store
+from .jobs import AnalysisQueue, analysis_queue, analysis_record, run_analysis
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Stale analyses loaded from the database per batch
+RESCORE_BATCH_SIZE = int(os.getenv("RESCORE_BATCH_SIZE", "1000"))
+
+# Documents sent to a worker process per task
+RESCORE_CHUNK_SIZE = int(os.getenv("RESCORE_CHUNK_SIZE", "50"))
+
+# Seconds between checks for a changed rule pack once every analysis is current
+RESCORE_POLL_INTERVAL = float(os.getenv("RESCORE_POLL_INTERVAL", "5"))
+
+# (key, content hash, file path, document type) of one document to re-score
+RescoreItem = Tuple[int, Optional[str], str, str]
+
+
+def rescore_documents(items: List[RescoreItem]) -> Dict[int, Dict[str, Any]]:
+    """
+    Re-analyze documents under the current rule pack inside a worker process
+
+    Documents with a stored scan only run the patterns it lacks over their
+    stored text. Documents without one, such as those analyzed before the
+    document store existed, fall back to a full analysis of the file.
+
+    Returns:
+        Analysis results by item key; items that failed are left out
+    """
+    results = {}
+    for key, content_hash, file_path, document_type in items:
+        try:
+            stored = document_store.load_scan(content_hash) if content_hash else None
+            if stored is None:
+                analysis_result = run_analysis(file_path, document_type, content_hash)
+            else:
+                analysis_result, scan = compliance_engine.rescore(stored, document_store.iter_pages(content_hash))
+                document_store.save_scan(content_hash, scan)
+                if compliance_engine.is_cacheable(analysis_result):
+                    analysis_cache.store_result(content_hash, analysis_result['rules_version'], analysis_result)
+        except Exception as e:
+            logger.error(f"Re-scoring {file_path} failed: {str(e)}")
+            continue
+        if analysis_result['compliance_status'] != 'error':
+            results[key] = analysis_result
+    return results
+
+
+class Rescorer:
+    """
+    Brings stored analyses up to date with the active rule pack in the background.
+
+    Analyses whose rules_version differs from the active pack are walked in id
+    order, grouped by content hash so identical documents are re-scored once,
+    and spread over the analysis worker pool in chunks. Each batch is written
+    back in one transaction. Progress is the rules_version column itself, so a
+    restart simply continues with the analyses that are still stale.
+    """
+
+    def __init__(self, queue: AnalysisQueue = analysis_queue, batch_size: int = RESCORE_BATCH_SIZE,
+                 chunk_size: int = RESCORE_CHUNK_SIZE, poll_interval: float = RESCORE_POLL_INTERVAL):
+        self.queue = queue
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.poll_interval = poll_interval
+        self.rules_version: Optional[str] = None
+        self.rescored = 0
+        self.failed = 0
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self._failed_ids: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start re-scoring in the background; call from the running event loop after the queue started"""
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def shutdown(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def status(self) -> Dict[str, Any]:
+        async with AsyncSessionLocal() as db:
+            remaining = await repository.count_stale_analyses(db, compliance_engine.rules_version)
+        return {
+            'rules_version': compliance_engine.rules_version,
+            'remaining': remaining,
+            'rescored': self.rescored,
+            'failed': self.failed,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.rescore_all()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Re-scoring pass failed: {str(e)}")
+            if compliance_engine.rules_version == self.rules_version:
+                await asyncio.sleep(self.poll_interval)
+
+    async def rescore_all(self) -> None:
+        """Re-score every stale analysis, stopping early if the rule pack changes meanwhile"""
+        rules_version = compliance_engine.rules_version
+        if rules_version != self.rules_version:
+            self.rules_version = rules_version
+            self.rescored = self.failed = 0
+            self.started_at = self.finished_at = None
+            self._failed_ids = set()
+
+        last_id = 0
+        worked = False
+        while True:
+            async with AsyncSessionLocal() as db:
+                rows = await repository.stale_analyses(db, rules_version, last_id, self.batch_size)
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            # Analyses that already failed under these rules wait for the next rule change
+            rows = [row for row in rows if row[0] not in self._failed_ids]
+            if rows:
+                if not worked:
+                    worked = True
+                    self.started_at = datetime.utcnow()
+                    logger.info(f"Re-scoring analyses under rules {rules_version}")
+                await self._rescore_batch(rows)
+
+            if compliance_engine.rules_version != rules_version:
+                return
+
+        if worked:
+            self.finished_at = datetime.utcnow()
+            logger.info(f"Re-scored {self.rescored} analyses under rules {rules_version} ({self.failed} failed)")
+
+    async def _rescore_batch(self, rows: List[Tuple[int, Optional[str], str, str]]) -> None:
+        # Re-score each distinct document once and fan the result out to its analyses
+        groups: "OrderedDict[Any, List[int]]" = OrderedDict()
+        items = []
+        for analysis_id, content_hash, file_path, document_type in rows:
+            group_key = content_hash or ('analysis', analysis_id)
+            if group_key not in groups:
+                groups[group_key] = []
+                items.append((analysis_id, content_hash, file_path, document_type))
+            groups[group_key].append(analysis_id)
+
+        chunks = [items[start:start + self.chunk_size] for start in range(0, len(items), self.chunk_size)]
+        results = {}
+        for chunk_results in await asyncio.gather(
+            *(self.queue.run_in_worker(rescore_documents, chunk) for chunk in chunks),
+            return_exceptions=True
+        ):
+            if isinstance(chunk_results, BaseException):
+                logger.error(f"Re-scoring chunk failed: {str(chunk_results)}")
+                continue
+            results.update(chunk_results)
+
+        updates = []
+        findings = {}
+        for (analysis_id, content_hash, _, _), analysis_ids in zip(items, groups.values()):
+            analysis_result = results.get(analysis_id)
+            if analysis_result is None:
+                self.failed += len(analysis_ids)
+                self._failed_ids.update(analysis_ids)
+                continue
+            metrics.observe_analysis(analysis_result.get('stage_timings'), kind="rescore",
+                                    prefilter=analysis_result.get('prefilter'))
+            record = rescored_values(analysis_result)
+            updates.extend({'id': target_id, **record} for target_id in analysis_ids)
+            findings.update((target_id, analysis_result['findings']) for target_id in analysis_ids)
+            if content_hash:
+                analysis_cache.record(content_hash)
+
+        if updates:
+            async with AsyncSessionLocal() as db:
+                with metrics.db_write_seconds.time(operation="rescore"):
+                    await repository.update_analyses(db, updates, findings)
+                    await db.commit()
+            self.rescored += len(updates)
+
+
+def rescored_values(analysis_result: Dict[str, Any]) -> Dict[str, Any]:
+    """Column values replacing an analysis with its re-scored result"""
+    record = analysis_record(None, analysis_result)
+    return {column: getattr(record, column) for column in (
+        'overall_score', 'compliance_status', 'recommendations', 'finding_count',
+        'high_count', 'medium_count', 'low_count', 'rule_pack_version', 'rules_version', 'stage_timings',
+        'analyzed_at'
+    )}
+
+
+# Global instance
+rescorer = Rescorer()
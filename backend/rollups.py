@@ -0,0 +1,129 @@
+"""
+Incrementally maintained analytics rollups
+
+Every write of an analysis adds its contribution to two small tables in the
+same transaction: analysis counts and score sums per upload week, document
+type, status and score bucket, and finding counts per upload week, document
+type, rule type and severity. Re-scoring first takes the old contribution
+back out. The analytics endpoint reads only these tables, so its cost
+depends on the number of weeks and rules, not on the number of analyses.
+"""
+
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import dialect_insert
+
+
+def week_of(moment: Optional[date]) -> date:
+    """Monday of the week of a day or time; the current week when None"""
+    day = moment or datetime.utcnow()
+    if isinstance(day, datetime):
+        day = day.date()
+    return day - timedelta(days=day.weekday())
+
+
+def score_bucket(score: float) -> int:
+    """Lower bound of a score's 10-point bucket; a perfect score has its own"""
+    return min(int(score // 10) * 10, 100)
+
+
+class RollupDelta:
+    """Changes to the rollup tables, accumulated in memory and written with one upsert per table"""
+
+    def __init__(self):
+        # (week, document type, status, score bucket) -> [analysis count, score sum]
+        self.analyses: Dict[Tuple[date, str, str, int], List[float]] = defaultdict(lambda: [0, 0.0])
+        # (week, document type, rule type, severity) -> finding count
+        self.findings: Counter = Counter()
+
+    def add(self, document: models.Document, compliance_status: str, overall_score: float,
+            rules: Iterable[Tuple[str, str]], sign: int = 1) -> None:
+        """
+        Count one analysis
+
+        Args:
+            document: The analyzed document, for its upload week and type
+            rules: (rule type, severity) of each finding
+            sign: -1 to take a previously counted analysis back out
+        """
+        week = week_of(document.uploaded_at)
+        document_type = document.document_type or ''
+        totals = self.analyses[(week, document_type, compliance_status, score_bucket(overall_score))]
+        totals[0] += sign
+        totals[1] += sign * overall_score
+        for rule_type, severity in rules:
+            self.findings[(week, document_type, rule_type, severity)] += sign
+
+    def add_result(self, document: models.Document, analysis_result: Dict[str, Any], sign: int = 1) -> None:
+        """Count an analysis result as returned by the compliance engine"""
+        self.add(document, analysis_result['compliance_status'], analysis_result['overall_score'],
+                 ((finding['rule_type'], finding['severity']) for finding in analysis_result['findings']), sign)
+
+    def apply(self, session: Session) -> None:
+        """Add the accumulated changes to the rollup tables"""
+        analysis_rows = [
+            {'week': week, 'document_type': document_type, 'compliance_status': status, 'score_bucket': bucket,
+             'analysis_count': count, 'score_sum': score_sum}
+            for (week, document_type, status, bucket), (count, score_sum) in self.analyses.items()
+            if count or score_sum
+        ]
+        if analysis_rows:
+            statement = dialect_insert(session, models.AnalysisRollup)
+            session.execute(statement.on_conflict_do_update(
+                index_elements=['week', 'document_type', 'compliance_status', 'score_bucket'],
+                set_={'analysis_count': models.AnalysisRollup.analysis_count + statement.excluded.analysis_count,
+                      'score_sum': models.AnalysisRollup.score_sum + statement.excluded.score_sum}
+            ), analysis_rows)
+
+        finding_rows = [
+            {'week': week, 'document_type': document_type, 'rule_type': rule_type, 'severity': severity,
+             'finding_count': count}
+            for (week, document_type, rule_type, severity), count in self.findings.items()
+            if count
+        ]
+        if finding_rows:
+            statement = dialect_insert(session, models.FindingRollup)
+            session.execute(statement.on_conflict_do_update(
+                index_elements=['week', 'document_type', 'rule_type', 'severity'],
+                set_={'finding_count': models.FindingRollup.finding_count + statement.excluded.finding_count}
+            ), finding_rows)
+
+    def retract_stored(self, session: Session, analysis_ids: List[int]) -> Dict[int, models.Document]:
+        """
+        Take the stored state of analyses back out, before they are overwritten
+
+        Returns:
+            The document of each analysis, by analysis id
+        """
+        analyses = session.execute(
+            select(models.ComplianceAnalysis.id, models.ComplianceAnalysis.compliance_status,
+                   models.ComplianceAnalysis.overall_score, models.Document)
+            .join(models.ComplianceAnalysis.document)
+            .where(models.ComplianceAnalysis.id.in_(analysis_ids))
+        ).all()
+        rules = defaultdict(list)
+        for analysis_id, rule_type, severity, count in session.execute(
+            select(models.Finding.analysis_id, models.FindingRule.rule_type, models.FindingRule.severity, func.count())
+            .join(models.FindingRule, models.Finding.rule_id == models.FindingRule.id)
+            .where(models.Finding.analysis_id.in_(analysis_ids))
+            .group_by(models.Finding.analysis_id, models.FindingRule.rule_type, models.FindingRule.severity)
+        ):
+            rules[analysis_id].extend([(rule_type, severity)] * count)
+        for analysis_id, compliance_status, overall_score, document in analyses:
+            if compliance_status is not None and overall_score is not None:
+                self.add(document, compliance_status, overall_score, rules[analysis_id], sign=-1)
+        return {analysis_id: document for analysis_id, _, _, document in analyses}
+
+
+def record(session: Session, analyses: Iterable[Tuple[models.Document, Dict[str, Any]]]) -> None:
+    """Count new analyses, given as (document, analysis result) pairs, in the session's transaction"""
+    delta = RollupDelta()
+    for document, analysis_result in analyses:
+        delta.add_result(document, analysis_result)
+    delta.apply(session)
@@ -0,0 +1,537 @@
+import os
+import re
+import time
+from typing import Dict, Iterable, List, Any, NamedTuple, Optional, Sequence, Tuple
+
+import regex
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+Span = Tuple[int, int]
+Location = Tuple[int, int, int, int]  # (start page, start offset, end page, end offset)
+Timeout = Tuple[int, str]  # (page being scanned, budget that ran out: 'rule' or 'document')
+
+# Rule entries holding whole words looked up in a document's token index
+KEYWORD_KEYS = {'content_indicators', 'rating_indicators'}
+
+# Rule entries that hold plain labels or keywords rather than regex patterns
+NON_PATTERN_KEYS = {'required_periods'} | KEYWORD_KEYS
+
+# Runs of word characters: the words of a token, as anchors and keywords name them
+WORD = re.compile(r'\w+')
+
+# Width assumed for patterns with unbounded repeats when sizing overlap windows
+MAX_UNBOUNDED_SPAN = 1000
+
+# Marks the end of a sentence or paragraph in scanned text. Cleaned text has no
+# other line breaks, and `.` does not match one, so a proximity pattern such as
+# `past.{0,30}performance` only ever matches within one segment.
+SEGMENT_BREAK = '\n'
+
+# Terminal punctuation, with any closing quotes or brackets, ending a page's last sentence
+SENTENCE_END = re.compile(r'[.!?]["\')]*$')
+
+# Bumped whenever the same text and patterns can give different matches, or
+# scans record something new, so stored scans are redone in full rather than
+# merged with new patterns
+SCAN_FORMAT = 5
+
+# Outcomes of the prefilter for one pattern over one scanned window
+PREFILTER_OUTCOMES = ('skipped', 'matched', 'unmatched')
+
+# Seconds one pattern may spend matching over a whole document before it is stopped (0: no limit)
+RULE_TIME_BUDGET_SECONDS = float(os.getenv("RULE_TIME_BUDGET_SECONDS", "2"))
+
+# Seconds all patterns together may spend matching over one document (0: no limit)
+DOCUMENT_SCAN_BUDGET_SECONDS = float(os.getenv("DOCUMENT_SCAN_BUDGET_SECONDS", "30"))
+
+
+class ScanResult:
+    """
+    Matches for every pattern of a rule set over one document
+
+    Spans are offsets into the cleaned text that was scanned. Streamed scans
+    also carry each match's location in the original page text and a snippet
+    of original text around the first match of each pattern, and the patterns
+    stopped for running out of time budget, whose matches may be incomplete.
+    """
+
+    def __init__(self, spans: Dict[str, List[Span]], text: Optional[str] = None,
+                 locations: Optional[Dict[str, List[Location]]] = None,
+                 contexts: Optional[Dict[str, str]] = None,
+                 tokens: Optional['TokenIndex'] = None,
+                 timeouts: Optional[Dict[str, Timeout]] = None):
+        self.text = text
+        self.tokens = tokens  # the whole document's tokens, once the scan is complete
+        self.timeouts = timeouts or {}
+        self._spans = spans
+        self._locations = locations or {}
+        self._contexts = contexts or {}
+
+    def found(self, pattern: str) -> bool:
+        return bool(self._spans.get(pattern))
+
+    def patterns(self) -> List[str]:
+        """Patterns with at least one match"""
+        return [pattern for pattern, spans in self._spans.items() if spans]
+
+    def has_any_word(self, words: Iterable[str]) -> bool:
+        """Whether the document contains any of the words as a whole word"""
+        if self.tokens is None:
+            raise ValueError("Scan has no token index")
+        return any(self.tokens.has_word(word.lower()) for word in words)
+
+    def spans(self, pattern: str) -> List[Span]:
+        return self._spans.get(pattern, [])
+
+    def first(self, pattern: str) -> Optional[Span]:
+        spans = self._spans.get(pattern)
+        return spans[0] if spans else None
+
+    def locations(self, pattern: str) -> List[Location]:
+        """(start page, start offset, end page, end offset) of every match in the original page text"""
+        return self._locations.get(pattern, [])
+
+    def page(self, pattern: str) -> Optional[int]:
+        """Page number of the first match of a pattern, if known"""
+        locations = self._locations.get(pattern)
+        return locations[0][0] if locations else None
+
+    def context(self, pattern: str, context_chars: int = 100) -> Optional[str]:
+        """Text surrounding the first match of a pattern"""
+        if pattern in self._contexts:
+            return self._contexts[pattern]
+        span = self.first(pattern)
+        if span is None or self.text is None:
+            return None
+        start = max(0, span[0] - context_chars)
+        end = min(len(self.text), span[1] + context_chars)
+        return self.text[start:end]
+
+    def restrict(self, patterns: Iterable[str]) -> 'ScanResult':
+        """Matches of the given patterns only"""
+        keep = set(patterns)
+        return ScanResult(_select(self._spans, keep), text=self.text,
+                          locations=_select(self._locations, keep),
+                          contexts=_select(self._contexts, keep), tokens=self.tokens,
+                          timeouts=_select(self.timeouts, keep))
+
+    def merge(self, other: 'ScanResult') -> 'ScanResult':
+        """Combine with the matches of a scan of other patterns over the same text"""
+        return ScanResult({**self._spans, **other._spans}, text=self.text or other.text,
+                          locations={**self._locations, **other._locations},
+                          contexts={**self._contexts, **other._contexts},
+                          tokens=self.tokens or other.tokens,
+                          timeouts={**self.timeouts, **other.timeouts})
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable form of a streamed scan"""
+        return {
+            'spans': {pattern: [list(span) for span in spans] for pattern, spans in self._spans.items()},
+            'locations': {pattern: [list(location) for location in locations]
+                          for pattern, locations in self._locations.items()},
+            'contexts': self._contexts,
+            'tokens': sorted(self.tokens.tokens) if self.tokens is not None else None,
+            'timeouts': {pattern: list(timeout) for pattern, timeout in self.timeouts.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ScanResult':
+        tokens = data.get('tokens')
+        return cls({pattern: [tuple(span) for span in spans] for pattern, spans in data['spans'].items()},
+                   locations={pattern: [tuple(location) for location in locations]
+                              for pattern, locations in data['locations'].items()},
+                   contexts=data['contexts'],
+                   tokens=TokenIndex(tokens=tokens) if tokens is not None else None,
+                   timeouts={pattern: tuple(timeout) for pattern, timeout in data['timeouts'].items()})
+
+
+def _select(values: Dict[str, Any], keep: set) -> Dict[str, Any]:
+    return {pattern: value for pattern, value in values.items() if pattern in keep}
+
+
+class TokenIndex:
+    """
+    The distinct tokens of a page or a whole document of scanned text.
+
+    Tells whether a literal occurs anywhere in the text with a single substring
+    search over the joined distinct tokens, which are a fraction of the text's
+    length. Literals hold no whitespace, so any occurrence lies within a token.
+    Whole-word lookups, for anchors and keywords, use the runs of word
+    characters within the tokens, so "return" is found in "return," but not
+    in "returned".
+    """
+
+    __slots__ = ('tokens', '_joined', '_words')
+
+    def __init__(self, text: Optional[str] = None, tokens: Optional[Iterable[str]] = None):
+        self.tokens = frozenset(text.split() if tokens is None else tokens)
+        self._joined = ' '.join(self.tokens)
+        self._words: Optional[frozenset] = None
+
+    def __contains__(self, literal: str) -> bool:
+        return literal in self._joined
+
+    @property
+    def words(self) -> frozenset:
+        if self._words is None:
+            self._words = frozenset(WORD.findall(self._joined))
+        return self._words
+
+    def has_word(self, word: str) -> bool:
+        return word in self.words
+
+
+class CompiledRuleSet:
+    """
+    Compiles every pattern of a compliance rule set once and scans text with
+    all of them in a single call, so checks never run a regex themselves.
+
+    The engine lower-cases text before scanning, so patterns without upper-case
+    literals are compiled case-sensitively. This keeps the regex engine's
+    literal-prefix search, which IGNORECASE disables and which is what makes a
+    per-pattern scan cheaper than one combined alternation.
+
+    Patterns are parsed with the standard library's parser, which rule pack
+    validation also uses, and compiled with the regex package, whose searches
+    take a timeout so a pattern that backtracks badly on some text can be
+    stopped instead of holding a worker.
+    """
+
+    def __init__(self, rules: Dict[str, Any], anchors: Optional[Dict[str, List[str]]] = None):
+        self.patterns = self._collect_patterns(rules)
+        self._compiled = [(pattern, self._compile(pattern)) for pattern in self.patterns]
+        self.literals = {pattern: self._required_literals(pattern) for pattern in self.patterns}
+        self.anchors = {pattern: self._anchor_groups(groups) for pattern, groups in (anchors or {}).items()
+                        if pattern in self.literals}
+        self.max_span = max((self._max_width(pattern) for pattern in self.patterns), default=0)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CompiledRuleSet':
+        """Rebuild a rule set from to_dict output without re-analyzing its patterns"""
+        rule_set = cls.__new__(cls)
+        rule_set.patterns = list(data['patterns'])
+        rule_set._compiled = [(pattern, regex.compile(pattern, flags))
+                              for pattern, flags in zip(data['patterns'], data['flags'])]
+        rule_set.literals = {pattern: tuple(literals) for pattern, literals in zip(data['patterns'], data['literals'])}
+        rule_set.anchors = {pattern: tuple(tuple(group) for group in groups)
+                            for pattern, groups in data['anchors'].items()}
+        rule_set.max_span = data['max_span']
+        return rule_set
+
+    def subset(self, patterns: Iterable[str]) -> 'CompiledRuleSet':
+        """A rule set scanning only the given patterns, reusing their compiled form"""
+        keep = set(patterns)
+        rule_set = CompiledRuleSet.__new__(CompiledRuleSet)
+        rule_set._compiled = [(pattern, compiled) for pattern, compiled in self._compiled if pattern in keep]
+        rule_set.patterns = [pattern for pattern, _ in rule_set._compiled]
+        rule_set.literals = {pattern: self.literals[pattern] for pattern in rule_set.patterns}
+        rule_set.anchors = {pattern: groups for pattern, groups in self.anchors.items() if pattern in keep}
+        rule_set.max_span = max((self._max_width(pattern) for pattern in rule_set.patterns), default=0)
+        return rule_set
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable form of the compiled patterns, their flags, prefilter terms and the overlap width"""
+        return {
+            'patterns': self.patterns,
+            'flags': [compiled.flags for _, compiled in self._compiled],
+            'literals': [list(self.literals[pattern]) for pattern in self.patterns],
+            'anchors': {pattern: [list(group) for group in groups] for pattern, groups in self.anchors.items()},
+            'max_span': self.max_span
+        }
+
+    def may_match(self, pattern: str, indexes: Sequence[Optional[TokenIndex]],
+                  present: Optional[Dict[Any, bool]] = None) -> bool:
+        """
+        Whether a pattern could match text whose tokens the indexes hold
+
+        False when one of the pattern's required literals occurs in none of
+        the indexes, or none of the words of one of its anchor groups does.
+        A None index stands for text without one, which anything may match.
+
+        Args:
+            present: Memo of term lookups shared across the patterns of one pass
+        """
+        if present is None:
+            present = {}
+        for literal in self.literals[pattern]:
+            found = present.get(literal)
+            if found is None:
+                found = present[literal] = any(index is None or literal in index for index in indexes)
+            if not found:
+                return False
+        for group in self.anchors.get(pattern, ()):
+            found = present.get(group)
+            if found is None:
+                found = present[group] = any(index is None or any(index.has_word(word) for word in group)
+                                             for index in indexes)
+            if not found:
+                return False
+        return True
+
+    @staticmethod
+    def _collect_patterns(rules: Dict[str, Any]) -> List[str]:
+        """Return the unique regex patterns of a rule set in declaration order"""
+        patterns = []
+        seen = set()
+        for category in rules.values():
+            for key, values in category.items():
+                if key in NON_PATTERN_KEYS:
+                    continue
+                for pattern in values:
+                    if pattern not in seen:
+                        seen.add(pattern)
+                        patterns.append(pattern)
+        return patterns
+
+    @staticmethod
+    def _compile(pattern: str) -> regex.Pattern:
+        literals = re.sub(r'\\.', '', pattern)
+        if literals == literals.lower():
+            return regex.compile(pattern)
+        return regex.compile(pattern, regex.IGNORECASE)
+
+    @staticmethod
+    def _required_literals(pattern: str) -> Tuple[str, ...]:
+        """
+        Lower-cased literal text every match of a pattern contains
+
+        Only runs of plain characters at the top level of the pattern count;
+        anything optional, repeated or alternated ends a run. Text is
+        lower-cased before scanning, and patterns with upper-case literals are
+        compiled to ignore case, so the lower-cased literals must occur.
+        """
+        literals = []
+        run = []
+        for op, value in list(sre_parse.parse(pattern)) + [(None, None)]:
+            if op is sre_parse.LITERAL:
+                run.append(chr(value))
+                continue
+            if run:
+                literals.extend(''.join(run).lower().split())
+                run = []
+        return tuple(dict.fromkeys(literals))
+
+    @staticmethod
+    def _anchor_groups(groups: List[str]) -> Tuple[Tuple[str, ...], ...]:
+        """Anchor groups of a pattern as tuples of lower-cased alternative words"""
+        return tuple(tuple(word.lower() for word in group.split('|')) for group in groups)
+
+    @staticmethod
+    def _max_width(pattern: str) -> int:
+        """Longest text a pattern can match, capped for unbounded repeats"""
+        return min(sre_parse.parse(pattern).getwidth()[1], MAX_UNBOUNDED_SPAN)
+
+    def scan(self, text: str) -> ScanResult:
+        """
+        Find every match of every pattern in lower-cased text
+
+        Args:
+            text: Lower-cased, cleaned document text
+
+        Returns:
+            ScanResult with the match offsets of each pattern
+        """
+        spans = {}
+        for pattern, compiled in self._compiled:
+            found = [match.span() for match in compiled.finditer(text)]
+            if found:
+                spans[pattern] = found
+        return ScanResult(spans, text=text, tokens=TokenIndex(text))
+
+    def stream(self, context_chars: int = 100, rule_budget: float = RULE_TIME_BUDGET_SECONDS,
+               document_budget: float = DOCUMENT_SCAN_BUDGET_SECONDS) -> 'StreamingScan':
+        """Start an incremental scan that is fed one page at a time"""
+        return StreamingScan(self, context_chars, rule_budget, document_budget)
+
+
+class StreamingScan:
+    """
+    Scans a document one page at a time with constant memory.
+
+    Only a window of trailing text from earlier pages is kept, long enough for
+    any pattern to match across a page boundary. Cleaned-text offsets are
+    relative to the cleaned pages joined by single characters: a segment break
+    when the earlier page ends a sentence, otherwise a space. Every match is
+    mapped to its location in the original page text, and the first match of
+    each pattern gets a snippet of original text, while its pages are still
+    buffered, so nothing has to be searched again afterwards.
+
+    Pages fed with a TokenIndex let the scan skip every pattern whose required
+    literals, or all words of one of its anchor groups, occur in none of the
+    buffered pages without running it. How often each window's patterns were
+    skipped, ran and matched, or ran for nothing is counted in `prefilter`.
+    The tokens of every page are gathered into a document index, which the
+    finished scan carries for whole-word keyword checks.
+
+    Matching time is budgeted per pattern and for the whole document, in
+    seconds of searching summed over every window scanned. A search running
+    past what is left of either budget is stopped by the regex engine's
+    timeout; the pattern keeps the matches it found and is not run again for
+    the rest of the document, and it is listed in the scan's `timeouts` with
+    the page being scanned. Once the document budget is spent, every pattern
+    still to run times out the same way. A budget of 0 is no limit.
+    """
+
+    def __init__(self, rule_set: CompiledRuleSet, context_chars: int = 100,
+                 rule_budget: float = RULE_TIME_BUDGET_SECONDS,
+                 document_budget: float = DOCUMENT_SCAN_BUDGET_SECONDS):
+        self._rule_set = rule_set
+        self._context_chars = context_chars
+        self._rule_budget = rule_budget
+        self._document_budget = document_budget
+        self._seconds: Dict[str, float] = {}  # matching time spent by each pattern
+        self._total_seconds = 0.0
+        self._timeouts: Dict[str, Timeout] = {}
+        self._buffer = ''
+        self._base = 0  # document offset of self._buffer[0]
+        self._pages: List[BufferedPage] = []  # pages with text in the buffer
+        self._spans: Dict[str, List[Span]] = {}
+        self._locations: Dict[str, List[Location]] = {}
+        self._contexts: Dict[str, str] = {}
+        self._tokens: set = set()  # distinct tokens of every page fed
+        self.prefilter: Dict[str, int] = dict.fromkeys(PREFILTER_OUTCOMES, 0)
+
+    def feed(self, page_number: int, text: str, original: str, offsets: Sequence[int],
+             tokens: Optional[TokenIndex] = None) -> None:
+        """
+        Scan the next page
+
+        Args:
+            page_number: Number of the page in the document
+            text: Cleaned page text, with segment breaks marked
+            original: Page text as extracted
+            offsets: Offset in `original` of each character of `text`
+            tokens: Index of the tokens of `text`, to skip patterns it cannot match
+        """
+        if not text:
+            return
+        if self._buffer:
+            ends_sentence = SENTENCE_END.search(self._buffer, max(0, len(self._buffer) - 8))
+            self._buffer += SEGMENT_BREAK if ends_sentence else ' '
+        self._pages.append(BufferedPage(self._base + len(self._buffer), page_number, original, offsets, tokens))
+        self._buffer += text
+        self._tokens.update(tokens.tokens if tokens is not None else text.split())
+
+        # Matches that could still grow into the next page are left for the
+        # next call, which rescans them from the overlap window
+        self._scan_buffer(len(self._buffer) - self._rule_set.max_span)
+
+        # Keep only the trailing window
+        cut = max(0, len(self._buffer) - self._rule_set.max_span)
+        if cut:
+            self._base += cut
+            self._buffer = self._buffer[cut:]
+            while len(self._pages) > 1 and self._pages[1].start <= self._base:
+                self._pages.pop(0)
+
+    def finish(self) -> ScanResult:
+        """Complete the scan and return the matches for the whole document"""
+        self._scan_buffer(len(self._buffer))
+        result = self.result()
+        result.tokens = TokenIndex(tokens=self._tokens)
+        return result
+
+    def result(self) -> ScanResult:
+        """Matches seen so far"""
+        return ScanResult(dict(self._spans), locations=dict(self._locations), contexts=dict(self._contexts),
+                          timeouts=dict(self._timeouts))
+
+    def _scan_buffer(self, limit: int) -> None:
+        """Record new matches that start at or before `limit` in the buffer"""
+        if not self._buffer:
+            return
+        indexes = [page.tokens for page in self._pages]
+        present = {}
+        for pattern, compiled in self._rule_set._compiled:
+            if pattern in self._timeouts:
+                continue
+            if not self._rule_set.may_match(pattern, indexes, present):
+                self.prefilter['skipped'] += 1
+                continue
+            timeout, budget = self._time_left(pattern)
+            if timeout is not None and timeout <= 0:
+                self._timeouts[pattern] = (self._pages[-1].number, budget)
+                continue
+            spans = self._spans.get(pattern)
+            found = len(spans) if spans else 0
+            last_end = spans[-1][1] if spans else -1
+            started = time.perf_counter()
+            try:
+                # Resume after the last recorded match: a match overlapping it would not be
+                # found by a whole-document scan, and skipping one would hide the next
+                for match in compiled.finditer(self._buffer, pos=max(0, last_end - self._base), timeout=timeout):
+                    if match.start() > limit:
+                        break
+                    start = self._base + match.start()
+                    span = (start, self._base + match.end())
+                    if spans and spans[-1] == span:
+                        continue  # an empty match the last window already recorded
+                    location = self._locate(span)
+                    if spans is None:
+                        spans = self._spans[pattern] = []
+                        self._locations[pattern] = []
+                        self._contexts[pattern] = self._snippet(location)
+                    spans.append(span)
+                    self._locations[pattern].append(location)
+            except TimeoutError:
+                self._timeouts[pattern] = (self._pages[-1].number, budget)
+            elapsed = time.perf_counter() - started
+            self._seconds[pattern] = self._seconds.get(pattern, 0.0) + elapsed
+            self._total_seconds += elapsed
+            self.prefilter['matched' if spans and len(spans) > found else 'unmatched'] += 1
+
+    def _time_left(self, pattern: str) -> Tuple[Optional[float], str]:
+        """Seconds a pattern may still search for, None without a limit, and the budget that sets it"""
+        left = {}
+        if self._rule_budget:
+            left['rule'] = self._rule_budget - self._seconds.get(pattern, 0.0)
+        if self._document_budget:
+            left['document'] = self._document_budget - self._total_seconds
+        if not left:
+            return None, ''
+        budget = min(left, key=left.get)
+        return left[budget], budget
+
+    def _page_at(self, offset: int) -> Tuple['BufferedPage', int]:
+        """The buffered page holding a document offset, and the offset within its cleaned text"""
+        for page in reversed(self._pages):
+            if page.start <= offset:
+                return page, offset - page.start
+        return self._pages[0], 0
+
+    def _locate(self, span: Span) -> Location:
+        """Map a cleaned-text span to (start page, start, end page, end) in the original pages"""
+        page, index = self._page_at(span[0])
+        # The space joining two pages maps to the end of the earlier one
+        start = page.offsets[index] if index < len(page.offsets) else len(page.original)
+        if span[1] == span[0]:
+            return page.number, start, page.number, start
+
+        end_page, index = self._page_at(span[1] - 1)
+        end = page_end = len(end_page.original)
+        if index < len(end_page.offsets):
+            end = min(end_page.offsets[index] + 1, page_end)
+        return page.number, start, end_page.number, end
+
+    def _snippet(self, location: Location) -> str:
+        """Original text around a match, with whitespace collapsed"""
+        start_page, start, end_page, end = location
+        pages = {page.number: page.original for page in self._pages}
+        if start_page == end_page:
+            text = pages[start_page][max(0, start - self._context_chars):end + self._context_chars]
+        else:
+            text = (pages[start_page][max(0, start - self._context_chars):] + ' '
+                    + pages[end_page][:end + self._context_chars])
+        return ' '.join(text.split())
+
+
+class BufferedPage(NamedTuple):
+    start: int  # document offset of the page's cleaned text
+    number: int
+    original: str
+    offsets: Sequence[int]
+    tokens: Optional[TokenIndex]
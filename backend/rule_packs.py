@@ -0,0 +1,293 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import regex
+
+from .rule_matcher import KEYWORD_KEYS, NON_PATTERN_KEYS, WORD, CompiledRuleSet
+
+logger = logging.getLogger(__name__)
+
+# Rule pack file (JSON, or YAML when PyYAML is installed)
+RULE_PACK_PATH = os.getenv(
+    "RULE_PACK_PATH", os.path.join(os.path.dirname(__file__), "rules", "sec_marketing_rule.json")
+)
+
+# Directory holding validated, compiled rule packs keyed by file content
+RULE_PACK_CACHE_DIR = os.getenv("RULE_PACK_CACHE_DIR", "compiled_rules")
+
+# Seconds between checks of the rule pack file for changes
+RULE_PACK_RELOAD_INTERVAL = float(os.getenv("RULE_PACK_RELOAD_INTERVAL", "2"))
+
+# Bumped whenever the layout of compiled rule pack files changes
+COMPILED_FORMAT = 4
+
+# Bumped whenever the engine's output for the same rules changes, so cached
+# results and stored analyses are treated as out of date and redone
+RESULT_FORMAT = 6
+
+# Rule categories and entries the compliance checks read
+REQUIRED_RULES = {
+    'performance_advertising': ('content_indicators', 'prohibited_patterns', 'required_disclosures'),
+    'hypothetical_performance': ('required_warnings', 'prohibited_without_disclosure'),
+    'testimonials_endorsements': ('required_disclosures', 'client_indicators'),
+    'substantiation': ('unsubstantiated_claims', 'requires_evidence'),
+    'anti_fraud': ('misleading_patterns', 'omission_indicators'),
+    'third_party_ratings': ('rating_indicators', 'required_disclosures')
+}
+
+
+class RulePackError(Exception):
+    """Raised when a rule pack cannot be read or fails validation"""
+
+
+class RulePack:
+    """
+    A validated rule pack with its patterns compiled.
+
+    Packs are never modified after loading, so an analysis holding a
+    reference keeps a consistent view while a newer pack is swapped in.
+    """
+
+    def __init__(self, name: str, version: str, rules: Dict[str, Any], anchors: Dict[str, List[str]],
+                 rule_set: CompiledRuleSet, digest: str, path: str, loaded_at: datetime):
+        self.name = name
+        self.version = version
+        self.rules = rules
+        self.anchors = anchors
+        self.rule_set = rule_set
+        self.digest = digest
+        self.path = path
+        self.loaded_at = loaded_at
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'version': self.version,
+            'rules_version': self.digest,
+            'pattern_count': len(self.rule_set.patterns),
+            'anchored_pattern_count': len(self.rule_set.anchors),
+            'path': self.path,
+            'loaded_at': self.loaded_at.isoformat()
+        }
+
+
+def rules_digest(rules: Dict[str, Any], anchors: Optional[Dict[str, List[str]]] = None) -> str:
+    """Short hash identifying a rule set, its anchors and the result format, used to key cached results"""
+    versioned = {'result_format': RESULT_FORMAT, 'rules': rules}
+    if anchors:
+        versioned['anchors'] = anchors
+    return hashlib.sha256(json.dumps(versioned, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def parse_rule_pack(content: bytes, path: str) -> Any:
+    """Decode a rule pack file according to its extension"""
+    try:
+        if path.lower().endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise RulePackError("PyYAML is required to load YAML rule packs")
+            return yaml.safe_load(content)
+        return json.loads(content)
+    except RulePackError:
+        raise
+    except Exception as e:
+        raise RulePackError(f"Could not parse rule pack {path}: {str(e)}")
+
+
+def validate_rule_pack(data: Any) -> Tuple[str, str, Dict[str, Any], Dict[str, List[str]]]:
+    """
+    Check a decoded rule pack
+
+    Returns:
+        Tuple of (name, version, rules, anchors)
+
+    Raises:
+        RulePackError: Describing the first problem found
+    """
+    if not isinstance(data, dict):
+        raise RulePackError("Rule pack must be a mapping")
+    for field in ('name', 'version'):
+        if not isinstance(data.get(field), str) or not data[field].strip():
+            raise RulePackError(f"Rule pack needs a non-empty '{field}'")
+
+    rules = data.get('rules')
+    if not isinstance(rules, dict):
+        raise RulePackError("Rule pack needs a 'rules' mapping")
+
+    for category, entries in rules.items():
+        if not isinstance(entries, dict):
+            raise RulePackError(f"Rule category '{category}' must be a mapping")
+        for key, values in entries.items():
+            if not isinstance(values, list) or not all(isinstance(value, str) and value for value in values):
+                raise RulePackError(f"'{category}.{key}' must be a list of non-empty strings")
+            if key in KEYWORD_KEYS:
+                for keyword in values:
+                    if not WORD.fullmatch(keyword):
+                        raise RulePackError(f"Keyword in '{category}.{key}' must be a single word: {keyword!r}")
+            if key in NON_PATTERN_KEYS:
+                continue
+            # Patterns are analyzed with re and matched with regex, so both must accept them
+            for pattern in values:
+                try:
+                    re.compile(pattern)
+                    CompiledRuleSet._compile(pattern)
+                except (re.error, regex.error) as e:
+                    raise RulePackError(f"Invalid pattern in '{category}.{key}': {pattern!r} ({str(e)})")
+
+    for category, keys in REQUIRED_RULES.items():
+        for key in keys:
+            if key not in rules.get(category, {}):
+                raise RulePackError(f"Rule pack is missing '{category}.{key}'")
+
+    anchors = data.get('anchors', {})
+    if not isinstance(anchors, dict):
+        raise RulePackError("Rule pack 'anchors' must be a mapping")
+    patterns = {pattern for entries in rules.values() for key, values in entries.items()
+                if key not in NON_PATTERN_KEYS for pattern in values}
+    for pattern, groups in anchors.items():
+        if pattern not in patterns:
+            raise RulePackError(f"Anchors given for unknown pattern {pattern!r}")
+        if not isinstance(groups, list) or not groups:
+            raise RulePackError(f"Anchors of {pattern!r} must be a non-empty list")
+        for group in groups:
+            if not isinstance(group, str) or not all(WORD.fullmatch(word) for word in group.split('|')):
+                raise RulePackError(f"Anchor of {pattern!r} must be words separated by '|': {group!r}")
+
+    return data['name'], data['version'], rules, anchors
+
+
+class RulePackLoader:
+    """
+    Loads the rule pack file and keeps it current.
+
+    A pack is validated and compiled once per distinct file content; the
+    result is written to RULE_PACK_CACHE_DIR so later starts, and every worker
+    process, skip parsing and validation. current() re-checks the file at most
+    every reload_interval seconds and swaps in a changed pack with a single
+    assignment. A pack that fails validation is logged and the previous one
+    stays in use.
+    """
+
+    def __init__(self, path: str = RULE_PACK_PATH, cache_dir: str = RULE_PACK_CACHE_DIR,
+                 reload_interval: float = RULE_PACK_RELOAD_INTERVAL):
+        self.path = path
+        self.cache_dir = cache_dir
+        self.reload_interval = reload_interval
+        self._pack: Optional[RulePack] = None
+        self._file_stamp: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> RulePack:
+        """Return the active rule pack, reloading it first if the file changed"""
+        if self._pack is None or time.monotonic() - self._checked_at >= self.reload_interval:
+            return self.reload()
+        return self._pack
+
+    def reload(self, force: bool = False) -> RulePack:
+        """
+        Load the rule pack file if it changed since the last load
+
+        Only the first load waits for a reload running in another thread;
+        afterwards callers keep using the active pack until the swap.
+        """
+        if not self._lock.acquire(blocking=self._pack is None):
+            return self._pack
+        try:
+            if self._pack is not None and not force and time.monotonic() - self._checked_at < self.reload_interval:
+                return self._pack
+            self._checked_at = time.monotonic()
+
+            try:
+                stat = os.stat(self.path)
+            except OSError as e:
+                if self._pack is None:
+                    raise RulePackError(f"Could not read rule pack {self.path}: {str(e)}")
+                return self._pack
+            file_stamp = (stat.st_mtime_ns, stat.st_size)
+            if file_stamp == self._file_stamp and not force:
+                return self._pack
+
+            try:
+                pack = self.load()
+            except RulePackError as e:
+                if self._pack is None:
+                    raise
+                logger.error(f"Keeping rule pack {self._pack.name} {self._pack.version}: {str(e)}")
+                self._file_stamp = file_stamp
+                return self._pack
+
+            if self._pack is not None and pack.digest != self._pack.digest:
+                logger.info(f"Reloaded rule pack {pack.name} {pack.version} ({pack.digest})")
+            self._pack = pack
+            self._file_stamp = file_stamp
+            return pack
+        finally:
+            self._lock.release()
+
+    def load(self) -> RulePack:
+        """Read, validate and compile the rule pack file, using the compiled cache when possible"""
+        try:
+            with open(self.path, 'rb') as file:
+                content = file.read()
+        except OSError as e:
+            raise RulePackError(f"Could not read rule pack {self.path}: {str(e)}")
+
+        content_hash = hashlib.sha256(content).hexdigest()
+        pack = self._read_compiled(content_hash)
+        if pack is not None:
+            return pack
+
+        name, version, rules, anchors = validate_rule_pack(parse_rule_pack(content, self.path))
+        pack = RulePack(name, version, rules, anchors, CompiledRuleSet(rules, anchors), rules_digest(rules, anchors),
+                        self.path, datetime.utcnow())
+        self._write_compiled(content_hash, pack)
+        return pack
+
+    def _compiled_path(self, content_hash: str) -> str:
+        return os.path.join(self.cache_dir, f"{content_hash}.json")
+
+    def _read_compiled(self, content_hash: str) -> Optional[RulePack]:
+        try:
+            with open(self._compiled_path(content_hash), 'r', encoding='utf-8') as file:
+                compiled = json.load(file)
+            if compiled['format'] != COMPILED_FORMAT:
+                return None
+            return RulePack(compiled['name'], compiled['version'], compiled['rules'], compiled['anchors'],
+                            CompiledRuleSet.from_dict(compiled['rule_set']),
+                            rules_digest(compiled['rules'], compiled['anchors']), self.path, datetime.utcnow())
+        except (OSError, ValueError, KeyError, TypeError, re.error, regex.error):
+            return None
+
+    def _write_compiled(self, content_hash: str, pack: RulePack) -> None:
+        compiled_path = self._compiled_path(content_hash)
+        tmp_path = f"{compiled_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump({
+                    'format': COMPILED_FORMAT,
+                    'name': pack.name,
+                    'version': pack.version,
+                    'rules': pack.rules,
+                    'anchors': pack.anchors,
+                    'rule_set': pack.rule_set.to_dict()
+                }, file)
+            os.replace(tmp_path, compiled_path)
+        except OSError as e:
+            logger.warning(f"Could not cache compiled rule pack: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+# Global instance
+rule_packs = RulePackLoader()
@@ -1,34 +1,121 @@
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import date, datetime
 from typing import List, Optional, Dict, Any
 
-class AnalysisResponse(BaseModel):
+class AnalysisSummary(BaseModel):
     id: int
     overall_score: float
     compliance_status: str
-    findings: List[Dict[str, Any]]
-    recommendations: List[str]
     analyzed_at: datetime
+    finding_count: Optional[int] = None
+    high_count: Optional[int] = None
+    medium_count: Optional[int] = None
+    low_count: Optional[int] = None
+    rule_pack_version: Optional[str] = None
+    rules_version: Optional[str] = None
 
     class Config:
         from_attributes = True
 
-class DocumentResponse(BaseModel):
+class AnalysisResponse(AnalysisSummary):
+    findings: List[Dict[str, Any]]
+    recommendations: List[str]
+    stage_timings: Optional[Dict[str, float]] = None
+
+class DocumentSummary(BaseModel):
     id: int
     filename: str
     document_type: str
     uploaded_at: datetime
+    analysis: Optional[AnalysisSummary] = None
+
+    class Config:
+        from_attributes = True
+
+class DocumentResponse(DocumentSummary):
     analysis: Optional[AnalysisResponse] = None
 
+class DocumentPage(BaseModel):
+    items: List[DocumentSummary]
+    next_cursor: Optional[str] = None  # Pass as `cursor` to fetch the next page
+
+class DetailedDocumentPage(BaseModel):
+    items: List[DocumentResponse]
+    next_cursor: Optional[str] = None
+
+class JobResponse(BaseModel):
+    id: int
+    status: str  # "queued", "running", "done", "failed", "cancelled"
+    document_id: int
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    document: Optional[DocumentResponse] = None
+
     class Config:
         from_attributes = True
 
+class MatchLocation(BaseModel):
+    page: int
+    start: int  # Offset into the extracted text of the page
+    end: int  # Offset into the extracted text of end_page, or of page when absent
+    end_page: Optional[int] = None
+
+class PageText(BaseModel):
+    page: int
+    text: str
+
 class ComplianceFinding(BaseModel):
     rule_type: str
     severity: str  # "high", "medium", "low"
     description: str
     location: Optional[str]
+    page: Optional[int] = None
+    matches: List[MatchLocation] = []
     suggestion: str
 
+class FindingCount(BaseModel):
+    day: Optional[date] = None  # Set when counting by day
+    rule_type: str
+    severity: str
+    count: int
+
+class AnalyticsSummary(BaseModel):
+    analyses: int
+    average_score: Optional[float] = None
+    findings: int
+
+class DocumentTypeSummary(AnalyticsSummary):
+    document_type: str
+
+class WeekSummary(AnalyticsSummary):
+    week: date  # Monday of the upload week
+
+class ScoreBucketCount(BaseModel):
+    bucket: int  # Lower bound of a 10-point score range; 100 holds perfect scores
+    count: int
+
+class StatusCount(BaseModel):
+    compliance_status: str
+    count: int
+
+class RuleCount(BaseModel):
+    rule_type: str
+    severity: str
+    count: int
+
+class RuleWeekCount(RuleCount):
+    week: date
+
+class AnalyticsResponse(BaseModel):
+    totals: AnalyticsSummary
+    score_distribution: List[ScoreBucketCount]
+    status_counts: List[StatusCount]
+    by_document_type: List[DocumentTypeSummary]
+    top_rules: List[RuleCount]
+    weekly: List[WeekSummary]
+    rule_trends: List[RuleWeekCount]  # Weekly counts of the top rules
+
 class DocumentUploadRequest(BaseModel):
     document_type: str = "advertisement" 
\ No newline at end of file
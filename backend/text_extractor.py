@@ -0,0 +1,109 @@
+"""
+Chunked text extraction from plain text files
+
+Text files are memory-mapped and decoded a chunk at a time rather than read
+into one string, so memory is bounded by one page of text however large the
+file is: chunks already decoded are dropped from the mapping as the read
+moves on. Text is split into pages at the first line break after
+TXT_MAX_PAGE_CHARS characters, so no word is split between pages and the
+word counts of the pages add up to the file's.
+
+The encoding is taken from a byte order mark when there is one. Otherwise
+the file is decoded as UTF-8 until the first byte that is not valid UTF-8,
+and from there on as Windows-1252, which decodes any byte, without going
+back over the text already read.
+"""
+
+import codecs
+import mmap
+import os
+from typing import Iterator, Optional, Tuple
+
+# Characters of text after which a page is split at the next line break
+TXT_MAX_PAGE_CHARS = int(os.getenv("TXT_MAX_PAGE_CHARS", "20000"))
+
+# Bytes of the mapped file decoded at a time
+DECODE_CHUNK_BYTES = 256 * 1024
+
+# Pages whose first line break is this many times TXT_MAX_PAGE_CHARS away are split at a space instead
+LONG_LINE_FACTOR = 4
+
+# Byte order marks and their encodings, longest first so UTF-32 is not taken for UTF-16
+BYTE_ORDER_MARKS = (
+    (codecs.BOM_UTF32_LE, 'utf-32-le'),
+    (codecs.BOM_UTF32_BE, 'utf-32-be'),
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be'),
+)
+
+# Encoding of files without a byte order mark that are not valid UTF-8
+FALLBACK_ENCODING = 'cp1252'
+
+
+def detect_bom(head: bytes) -> Tuple[Optional[str], int]:
+    """Encoding named by a file's byte order mark and the mark's length; (None, 0) without one"""
+    for bom, encoding in BYTE_ORDER_MARKS:
+        if head.startswith(bom):
+            return encoding, len(bom)
+    return None, 0
+
+
+def iter_text_pages(file_path: str, max_page_chars: int = TXT_MAX_PAGE_CHARS) -> Iterator[str]:
+    """
+    Yield the text of a plain text file one page at a time
+
+    Pages holding nothing but whitespace are skipped.
+    """
+    page = ''
+    for text in _iter_decoded(file_path):
+        page += text
+        while len(page) >= max_page_chars:
+            cut = page.find('\n', max_page_chars - 1) + 1
+            if not cut:
+                if len(page) < max_page_chars * LONG_LINE_FACTOR:
+                    break
+                # One very long line: split it at a space rather than hold it whole
+                cut = page.rfind(' ', 0, max_page_chars) + 1 or max_page_chars
+            if not page[:cut].isspace():
+                yield page[:cut]
+            page = page[cut:]
+    if page and not page.isspace():
+        yield page
+
+
+def _iter_decoded(file_path: str) -> Iterator[str]:
+    """Decoded text of a file, DECODE_CHUNK_BYTES of the mapping at a time"""
+    with open(file_path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if not size:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                data.madvise(mmap.MADV_SEQUENTIAL)
+            encoding, position = detect_bom(data[:4])
+            strict = encoding is None
+            decoder = codecs.getincrementaldecoder(encoding or 'utf-8')('strict' if strict else 'replace')
+
+            while position < size:
+                end = min(position + DECODE_CHUNK_BYTES, size)
+                try:
+                    text = decoder.decode(data[position:end], end == size)
+                except UnicodeDecodeError as error:
+                    if not strict:
+                        raise
+                    # Keep the UTF-8 before the first invalid byte and decode from that byte on with the fallback
+                    position += error.start - len(decoder.getstate()[0])
+                    decoder = codecs.getincrementaldecoder(FALLBACK_ENCODING)('replace')
+                    strict = False
+                    text = error.object[:error.start].decode('utf-8')
+                    if text:
+                        yield text
+                    continue
+                if hasattr(mmap, 'MADV_DONTNEED'):
+                    # Release the decoded pages so resident memory does not grow with the file
+                    start = position - position % mmap.PAGESIZE
+                    data.madvise(mmap.MADV_DONTNEED, start, end - start)
+                position = end
+                if text:
+                    yield text
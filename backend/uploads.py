@@ -0,0 +1,222 @@
+import hashlib
+import os
+import uuid
+import zipfile
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple
+
+import aiofiles
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .document_parser import DocumentParser
+
+# Create upload directory
+UPLOAD_DIR = "uploads"
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+MAX_FILE_SIZE = 600 * 1024 * 1024  # 600MB in bytes
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # Bytes read from an upload at a time
+
+ZIP_CONTENT_TYPES = ['application/zip', 'application/x-zip-compressed']
+
+# (original filename, stored file path, size in bytes, content hash)
+StoredFile = Tuple[str, str, int, str]
+
+
+def _size_exceeded() -> HTTPException:
+    return HTTPException(status_code=413, detail="File size exceeds maximum limit of 600MB.")
+
+
+class UploadSizeLimit:
+    """
+    ASGI middleware limiting the request body size of upload routes
+
+    A declared Content-Length over a route's limit is refused before the body
+    is read. Otherwise, including for chunked uploads, the body is counted as
+    it arrives and reading stops with a 413 as soon as the limit is passed,
+    before the multipart parser has spooled the rest to disk.
+
+    Args:
+        app: The application to wrap
+        limits: (maximum body bytes, error detail) by route path
+    """
+
+    def __init__(self, app: ASGIApp, limits: Dict[str, Tuple[int, str]]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] not in self.limits:
+            await self.app(scope, receive, send)
+            return
+
+        limit, detail = self.limits[scope["path"]]
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > limit:
+            await JSONResponse(status_code=413, content={"detail": detail})(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # FastAPI re-raises HTTPExceptions from body parsing as they are
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def _publish(tmp_path: str, filename: str, content_hash: str, created: Optional[List[str]]) -> str:
+    """Move a fully written upload to its content-addressed path, adding it to `created` if it is new"""
+    file_extension = os.path.splitext(filename or "")[1].lower()
+    file_path = os.path.join(UPLOAD_DIR, f"{content_hash}{file_extension}")
+    if os.path.exists(file_path):
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, file_path)
+        if created is not None:
+            created.append(file_path)
+    return file_path
+
+
+def _discard(tmp_path: str) -> None:
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+
+def discard_files(paths: Iterable[str]) -> None:
+    """Remove stored files a failed request created"""
+    for path in paths:
+        _discard(path)
+
+
+async def save_upload(file: UploadFile, created: Optional[List[str]] = None) -> Tuple[str, int, str]:
+    """
+    Write an upload to UPLOAD_DIR in fixed-size chunks
+
+    The request body has already been spooled by the multipart parser, whose
+    size UploadSizeLimit bounds as it arrives; the per-file limit is checked
+    again and the SHA-256 computed as the bytes are copied, so memory per
+    upload is bounded by the chunk size. The stored file is named by its
+    content, so identical uploads share one copy.
+
+    Args:
+        file: The uploaded file
+        created: Receives the stored path when no identical file was stored before,
+            so a request that fails afterwards can remove what it added
+
+    Returns:
+        Tuple of (file path, size in bytes, content hash)
+    """
+    tmp_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4().hex}.tmp")
+    content_hash = hashlib.sha256()
+    file_size = 0
+
+    try:
+        async with aiofiles.open(tmp_path, "wb") as buffer:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                file_size += len(chunk)
+                if file_size > MAX_FILE_SIZE:
+                    raise _size_exceeded()
+                content_hash.update(chunk)
+                await buffer.write(chunk)
+
+        file_path = _publish(tmp_path, file.filename, content_hash.hexdigest(), created)
+    except BaseException:
+        _discard(tmp_path)
+        raise
+
+    return file_path, file_size, content_hash.hexdigest()
+
+
+def store_file(source: BinaryIO, filename: str, created: Optional[List[str]] = None) -> StoredFile:
+    """Blocking counterpart of save_upload for file objects such as zip members"""
+    tmp_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4().hex}.tmp")
+    content_hash = hashlib.sha256()
+    file_size = 0
+
+    try:
+        with open(tmp_path, "wb") as buffer:
+            while chunk := source.read(UPLOAD_CHUNK_SIZE):
+                file_size += len(chunk)
+                if file_size > MAX_FILE_SIZE:
+                    raise _size_exceeded()
+                content_hash.update(chunk)
+                buffer.write(chunk)
+
+        file_path = _publish(tmp_path, filename, content_hash.hexdigest(), created)
+    except BaseException:
+        _discard(tmp_path)
+        raise
+
+    return filename, file_path, file_size, content_hash.hexdigest()
+
+
+def is_zip_upload(file: UploadFile) -> bool:
+    return file.content_type in ZIP_CONTENT_TYPES or (file.filename or "").lower().endswith(".zip")
+
+
+def is_supported(filename: str) -> bool:
+    try:
+        DocumentParser.document_format(filename)
+        return True
+    except ValueError:
+        return False
+
+
+def _open_zip(source: BinaryIO) -> zipfile.ZipFile:
+    try:
+        return zipfile.ZipFile(source)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="Invalid zip archive.")
+
+
+def _supported_members(archive: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+    """Members holding supported documents; directories, other formats and macOS resource forks are skipped"""
+    return [
+        member for member in archive.infolist()
+        if not member.is_dir() and not member.filename.startswith("__MACOSX/")
+        and is_supported(os.path.basename(member.filename))
+    ]
+
+
+def zip_contents(source: BinaryIO) -> Tuple[int, int]:
+    """
+    Number and total uncompressed size of the supported documents in a zip archive
+
+    Read from the archive's directory without decompressing anything. Members
+    are never decompressed past their recorded size, so the total bounds what
+    extract_zip writes.
+    """
+    with _open_zip(source) as archive:
+        members = _supported_members(archive)
+    return len(members), sum(member.file_size for member in members)
+
+
+def extract_zip(source: BinaryIO, created: Optional[List[str]] = None) -> List[StoredFile]:
+    """
+    Store every supported document inside a zip archive
+
+    Members are decompressed in chunks under the same size limit as uploads.
+
+    Args:
+        source: The archive
+        created: Receives the stored paths that are new, as for save_upload
+    """
+    stored = []
+    with _open_zip(source) as archive:
+        for member in _supported_members(archive):
+            try:
+                with archive.open(member) as member_file:
+                    stored.append(store_file(member_file, os.path.basename(member.filename), created))
+            except zipfile.BadZipFile:
+                # Among others, a member holding more data than its recorded size
+                raise HTTPException(status_code=400, detail=f"Invalid zip archive member: {member.filename}")
+    return stored
@@ -19,6 +19,8 @@ const DocumentDetailPage = () => {
   const [document, setDocument] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [pageTexts, setPageTexts] = useState({});
+  const [openFinding, setOpenFinding] = useState(null);
 
   useEffect(() => {
     fetchDocument();
@@ -39,6 +41,45 @@ const DocumentDetailPage = () => {
     }
   };
 
+  const showFindingInPage = async (index, page) => {
+    if (openFinding === index) {
+      setOpenFinding(null);
+      return;
+    }
+    if (pageTexts[page] === undefined) {
+      try {
+        const response = await axios.get(`/documents/${id}/pages/${page}`);
+        setPageTexts((current) => ({ ...current, [page]: response.data.text }));
+      } catch (err) {
+        setPageTexts((current) => ({ ...current, [page]: null }));
+      }
+    }
+    setOpenFinding(index);
+  };
+
+  // Split page text into plain and highlighted parts for the matches on that page
+  const highlightMatches = (text, matches, page) => {
+    const ranges = matches
+      .filter((match) => match.page === page || match.end_page === page)
+      .map((match) => [
+        match.page === page ? match.start : 0,
+        (match.end_page || match.page) === page ? match.end : text.length
+      ])
+      .sort((a, b) => a[0] - b[0]);
+
+    const parts = [];
+    let position = 0;
+    ranges.forEach(([start, end], index) => {
+      if (end <= position) return;
+      start = Math.max(start, position);
+      parts.push(<span key={`t${index}`}>{text.slice(position, start)}</span>);
+      parts.push(<mark key={`m${index}`} className="bg-yellow-200">{text.slice(start, end)}</mark>);
+      position = end;
+    });
+    parts.push(<span key="rest">{text.slice(position)}</span>);
+    return parts;
+  };
+
   const getComplianceStatusIcon = (status) => {
     switch (status) {
       case 'compliant':
@@ -268,7 +309,28 @@ const DocumentDetailPage = () => {
                         
                         {finding.location && (
                           <div className="mb-3 p-2 bg-white bg-opacity-50 rounded text-xs font-mono text-gray-700">
-                            <strong>Location:</strong> {finding.location}
+                            <strong>Location{finding.page ? ` (page ${finding.page})` : ''}:</strong> {finding.location}
+                          </div>
+                        )}
+                        
+                        {finding.matches?.length > 0 && (
+                          <div className="mb-3 text-xs">
+                            <span className="text-gray-700">
+                              {finding.matches.length} {finding.matches.length === 1 ? 'occurrence' : 'occurrences'}
+                            </span>
+                            <button
+                              onClick={() => showFindingInPage(index, finding.matches[0].page)}
+                              className="ml-3 text-primary-700 hover:text-primary-800 underline"
+                            >
+                              {openFinding === index ? 'Hide page' : `Show on page ${finding.matches[0].page}`}
+                            </button>
+                            {openFinding === index && (
+                              <div className="mt-2 p-3 max-h-64 overflow-y-auto bg-white rounded whitespace-pre-wrap font-mono text-gray-700">
+                                {pageTexts[finding.matches[0].page] === null
+                                  ? 'Page text is not available.'
+                                  : highlightMatches(pageTexts[finding.matches[0].page] || '', finding.matches, finding.matches[0].page)}
+                              </div>
+                            )}
                           </div>
                         )}
                         
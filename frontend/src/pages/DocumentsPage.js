@@ -11,19 +11,37 @@ import {
   FolderIcon
 } from '@heroicons/react/24/outline';
 
+const DOCUMENTS_PAGE_SIZE = 50;
+
 const DocumentsPage = () => {
   const [documents, setDocuments] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [statusFilter, setStatusFilter] = useState('');
+  const [typeFilter, setTypeFilter] = useState('');
 
   useEffect(() => {
     fetchDocuments();
-  }, []);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [statusFilter, typeFilter]);
+
+  const fetchPage = (cursor) => {
+    const params = { limit: DOCUMENTS_PAGE_SIZE };
+    if (cursor) params.cursor = cursor;
+    if (statusFilter) params.compliance_status = statusFilter;
+    if (typeFilter) params.document_type = typeFilter;
+    return axios.get('/documents/', { params });
+  };
 
   const fetchDocuments = async () => {
+    setLoading(true);
+    setError(null);
     try {
-      const response = await axios.get('/documents/');
-      setDocuments(response.data);
+      const response = await fetchPage(null);
+      setDocuments(response.data.items);
+      setNextCursor(response.data.next_cursor);
     } catch (err) {
       setError('Failed to load documents. Please try again.');
     } finally {
@@ -31,6 +49,19 @@ const DocumentsPage = () => {
     }
   };
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await fetchPage(nextCursor);
+      setDocuments((current) => [...current, ...response.data.items]);
+      setNextCursor(response.data.next_cursor);
+    } catch (err) {
+      setError('Failed to load documents. Please try again.');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const getComplianceStatusIcon = (status) => {
     switch (status) {
       case 'compliant':
@@ -113,16 +144,44 @@ const DocumentsPage = () => {
         </Link>
       </div>
 
-      {/* Documents Count */}
+      {/* Documents Count & Filters */}
       <div className="mb-6">
-        <div className="bg-white rounded-lg shadow p-4">
+        <div className="bg-white rounded-lg shadow p-4 flex items-center justify-between">
           <div className="flex items-center">
             <FolderIcon className="h-8 w-8 text-primary-600 mr-3" />
             <div>
-              <p className="text-2xl font-semibold text-gray-900">{documents.length}</p>
-              <p className="text-sm text-gray-600">Total Documents</p>
+              <p className="text-2xl font-semibold text-gray-900">
+                {documents.length}{nextCursor ? '+' : ''}
+              </p>
+              <p className="text-sm text-gray-600">Documents</p>
             </div>
           </div>
+          <div className="flex space-x-3">
+            <select
+              value={statusFilter}
+              onChange={(e) => setStatusFilter(e.target.value)}
+              className="border border-gray-300 rounded-md px-3 py-2 text-sm text-gray-700 focus:outline-none focus:ring-2 focus:ring-primary-500"
+            >
+              <option value="">All statuses</option>
+              <option value="compliant">Compliant</option>
+              <option value="needs_review">Needs review</option>
+              <option value="non_compliant">Non compliant</option>
+              <option value="error">Error</option>
+            </select>
+            <select
+              value={typeFilter}
+              onChange={(e) => setTypeFilter(e.target.value)}
+              className="border border-gray-300 rounded-md px-3 py-2 text-sm text-gray-700 focus:outline-none focus:ring-2 focus:ring-primary-500"
+            >
+              <option value="">All types</option>
+              <option value="advertisement">Advertisement</option>
+              <option value="rfp">RFP</option>
+              <option value="rfi">RFI</option>
+              <option value="marketing_material">Marketing Material</option>
+              <option value="presentation">Presentation</option>
+              <option value="other">Other</option>
+            </select>
+          </div>
         </div>
       </div>
 
@@ -204,26 +263,26 @@ const DocumentsPage = () => {
                   </div>
 
                   {/* Quick Preview of Findings */}
-                  {document.analysis?.findings?.length > 0 && (
+                  {document.analysis?.finding_count > 0 && (
                     <div className="mt-4 pt-4 border-t border-gray-200">
                       <div className="flex items-center justify-between">
                         <span className="text-sm font-medium text-gray-700">
-                          {document.analysis.findings.length} compliance findings
+                          {document.analysis.finding_count} compliance findings
                         </span>
                         <div className="flex space-x-2">
-                          {document.analysis.findings.filter(f => f.severity === 'high').length > 0 && (
+                          {document.analysis.high_count > 0 && (
                             <span className="inline-flex items-center px-2 py-1 rounded-full text-xs font-medium bg-danger-100 text-danger-800">
-                              {document.analysis.findings.filter(f => f.severity === 'high').length} High
+                              {document.analysis.high_count} High
                             </span>
                           )}
-                          {document.analysis.findings.filter(f => f.severity === 'medium').length > 0 && (
+                          {document.analysis.medium_count > 0 && (
                             <span className="inline-flex items-center px-2 py-1 rounded-full text-xs font-medium bg-warning-100 text-warning-800">
-                              {document.analysis.findings.filter(f => f.severity === 'medium').length} Medium
+                              {document.analysis.medium_count} Medium
                             </span>
                           )}
-                          {document.analysis.findings.filter(f => f.severity === 'low').length > 0 && (
+                          {document.analysis.low_count > 0 && (
                             <span className="inline-flex items-center px-2 py-1 rounded-full text-xs font-medium bg-blue-100 text-blue-800">
-                              {document.analysis.findings.filter(f => f.severity === 'low').length} Low
+                              {document.analysis.low_count} Low
                             </span>
                           )}
                         </div>
@@ -233,6 +292,18 @@ const DocumentsPage = () => {
                 </div>
               ))}
             </div>
+
+            {nextCursor && (
+              <div className="mt-6 text-center">
+                <button
+                  onClick={loadMore}
+                  disabled={loadingMore}
+                  className="px-4 py-2 border border-gray-300 shadow-sm text-sm font-medium rounded-md text-gray-700 bg-white hover:bg-gray-50 disabled:opacity-50"
+                >
+                  {loadingMore ? 'Loading...' : 'Load more'}
+                </button>
+              </div>
+            )}
           </div>
         </div>
       )}
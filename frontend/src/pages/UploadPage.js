@@ -1,4 +1,4 @@
-import React, { useState, useCallback } from 'react';
+import React, { useState, useCallback, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import axios from 'axios';
 import { 
@@ -10,6 +10,30 @@ import {
   InformationCircleIcon 
 } from '@heroicons/react/24/outline';
 
+// Follow an analysis job's event stream until it finishes, resolving with the finished job
+const followJob = (jobId, eventSourceRef, { onStatus, onProgress, onFinding }) =>
+  new Promise((resolve, reject) => {
+    const events = new EventSource(`/jobs/${jobId}/events`);
+    eventSourceRef.current = events;
+    const finish = (e) => {
+      events.close();
+      eventSourceRef.current = null;
+      resolve(JSON.parse(e.data));
+    };
+
+    events.addEventListener('status', (e) => onStatus(JSON.parse(e.data).status));
+    events.addEventListener('progress', (e) => onProgress(JSON.parse(e.data)));
+    events.addEventListener('finding', (e) => onFinding(JSON.parse(e.data).finding));
+    ['done', 'failed', 'cancelled'].forEach((name) => events.addEventListener(name, finish));
+    events.onerror = () => {
+      // The browser reconnects by itself while the stream is still open
+      if (events.readyState === EventSource.CLOSED) {
+        eventSourceRef.current = null;
+        reject(new Error('Lost connection to the analysis. Please try again.'));
+      }
+    };
+  });
+
 const UploadPage = () => {
   const navigate = useNavigate();
   const [dragActive, setDragActive] = useState(false);
@@ -18,6 +42,14 @@ const UploadPage = () => {
   const [documentType, setDocumentType] = useState('advertisement');
   const [analysisResult, setAnalysisResult] = useState(null);
   const [error, setError] = useState(null);
+  const [job, setJob] = useState(null);
+  const [progress, setProgress] = useState(null);
+  const [partialFindings, setPartialFindings] = useState([]);
+  const [cancelling, setCancelling] = useState(false);
+  const eventSourceRef = useRef(null);
+
+  // Stop listening when leaving the page mid-analysis
+  useEffect(() => () => eventSourceRef.current?.close(), []);
 
   const handleDrag = useCallback((e) => {
     e.preventDefault();
@@ -74,6 +106,10 @@ const UploadPage = () => {
     
     setUploading(true);
     setError(null);
+    setAnalysisResult(null);
+    setProgress(null);
+    setPartialFindings([]);
+    setCancelling(false);
     
     const formData = new FormData();
     formData.append('file', selectedFile);
@@ -86,11 +122,43 @@ const UploadPage = () => {
         },
       });
       
-      setAnalysisResult(response.data);
+      // Analysis runs in the background; show its progress and findings as they stream in
+      let finished = response.data;
+      setJob(finished);
+      if (finished.status === 'queued' || finished.status === 'running') {
+        finished = await followJob(finished.id, eventSourceRef, {
+          onStatus: (status) => setJob((current) => ({ ...current, status })),
+          onProgress: setProgress,
+          onFinding: (finding) => setPartialFindings((current) => [...current, finding]),
+        });
+      }
+      
+      if (finished.status === 'failed') {
+        setError(finished.error || 'Analysis failed. Please try again.');
+        return;
+      }
+      if (finished.status === 'cancelled') {
+        setError('Analysis cancelled.');
+        return;
+      }
+      
+      setAnalysisResult(finished.document);
     } catch (err) {
-      setError(err.response?.data?.detail || 'Upload failed. Please try again.');
+      setError(err.response?.data?.detail || err.message || 'Upload failed. Please try again.');
     } finally {
       setUploading(false);
+      setJob(null);
+    }
+  };
+
+  const handleCancel = async () => {
+    if (!job) return;
+    setCancelling(true);
+    try {
+      await axios.post(`/jobs/${job.id}/cancel`);
+    } catch (err) {
+      // The job finished before it could be cancelled; its final event still arrives
+      setCancelling(false);
     }
   };
 
@@ -236,7 +304,54 @@ const UploadPage = () => {
           >
             {uploading ? 'Analyzing Document...' : 'Analyze Compliance'}
           </button>
+          {uploading && job && (
+            <button
+              onClick={handleCancel}
+              disabled={cancelling}
+              className="ml-4 px-8 py-3 rounded-lg font-medium border border-gray-300 text-gray-700 hover:bg-gray-100 disabled:opacity-50"
+            >
+              {cancelling ? 'Cancelling...' : 'Cancel'}
+            </button>
+          )}
         </div>
+
+        {/* Progress and findings so far */}
+        {uploading && job && (
+          <div className="mt-6">
+            <div className="flex justify-between text-sm text-gray-600 mb-1">
+              <span className="capitalize">{job.status}</span>
+              {progress && (
+                <span>
+                  {progress.page_count
+                    ? `${progress.pages_done} of ${progress.page_count} pages`
+                    : `${progress.pages_done} pages`}
+                </span>
+              )}
+            </div>
+            {progress?.page_count > 0 && (
+              <div className="w-full h-2 bg-gray-200 rounded-full overflow-hidden">
+                <div
+                  className="h-2 bg-primary-600 transition-all duration-200"
+                  style={{ width: `${(100 * progress.pages_done) / progress.page_count}%` }}
+                ></div>
+              </div>
+            )}
+            {partialFindings.length > 0 && (
+              <div className="mt-4 space-y-2">
+                <p className="text-sm font-medium text-gray-700">Findings so far</p>
+                {partialFindings.map((finding, index) => (
+                  <div
+                    key={index}
+                    className={`p-2 rounded-lg border text-sm ${getSeverityColor(finding.severity)}`}
+                  >
+                    <span className="font-medium capitalize">{finding.rule_type?.replace('_', ' ')}: </span>
+                    {finding.description}
+                  </div>
+                ))}
+              </div>
+            )}
+          </div>
+        )}
       </div>
 
       {/* Analysis Results */}
@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# The backend writes uploads, caches and its default database relative to the
+# working directory, so tests run from a scratch directory
+os.chdir(tempfile.mkdtemp(prefix="backend-tests-"))
@@ -0,0 +1,48 @@
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from backend import database, models
+from backend.compliance_engine import compliance_engine
+from backend.findings import finding_records, rule_catalog, rule_id
+from backend.rule_matcher import CompiledRuleSet
+
+PAGES = ["Plain words about the fund. " * 50,
+         "We guarantee returns with no risk. Our fund is the best in the industry. " * 50]
+
+
+def stored_findings(tmp_path, findings):
+    engine = database.make_engine(f"sqlite:///{tmp_path / 'findings.db'}")
+    database.upgrade_schema(engine)
+    with Session(engine) as session:
+        document = models.Document(filename="a.txt", original_filename="a.txt", file_path="uploads/a.txt",
+                                   document_type="advertisement", file_size=1, uploaded_at=datetime.utcnow())
+        session.add(document)
+        session.flush()
+        rule_catalog.ensure(session, findings)
+        session.add(models.ComplianceAnalysis(document_id=document.id, finding_rows=finding_records(findings)))
+        session.commit()
+    with Session(engine) as session:
+        return session.query(models.ComplianceAnalysis).one().findings
+
+
+def test_findings_round_trip(tmp_path):
+    result = compliance_engine.analyze("a.txt", pages=PAGES)
+    assert any('matches' in finding for finding in result['findings'])
+    assert stored_findings(tmp_path, result['findings']) == result['findings']
+
+
+def test_timed_out_rule_findings_round_trip(tmp_path, monkeypatch):
+    stream = CompiledRuleSet.stream
+    monkeypatch.setattr(CompiledRuleSet, 'stream', lambda rule_set: stream(rule_set, rule_budget=1e-9))
+    result = compliance_engine.analyze("a.txt", pages=PAGES)
+    timeouts = [finding for finding in result['findings'] if finding['rule_type'] == compliance_engine.RULE_TIMEOUT]
+    assert timeouts and all(finding['page'] is not None for finding in timeouts)
+    assert stored_findings(tmp_path, result['findings']) == result['findings']
+
+
+def test_error_findings_share_one_rule(tmp_path):
+    results = [compliance_engine.analyze(str(tmp_path / f"missing-{n}.pdf")) for n in range(2)]
+    findings = [result['findings'][0] for result in results]
+    assert findings[0]['location'] != findings[1]['location']
+    assert rule_id(findings[0]) == rule_id(findings[1])
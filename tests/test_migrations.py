@@ -0,0 +1,63 @@
+import json
+import sqlite3
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from backend import database, models
+
+# The schema the first release created with Base.metadata.create_all, before migrations existed
+BASELINE_SCHEMA = """
+CREATE TABLE documents (
+    id INTEGER NOT NULL, filename VARCHAR, original_filename VARCHAR, file_path VARCHAR,
+    document_type VARCHAR, file_size INTEGER, uploaded_at DATETIME, PRIMARY KEY (id)
+);
+CREATE INDEX ix_documents_filename ON documents (filename);
+CREATE INDEX ix_documents_id ON documents (id);
+CREATE TABLE compliance_analyses (
+    id INTEGER NOT NULL, document_id INTEGER, overall_score FLOAT, compliance_status VARCHAR,
+    findings JSON, recommendations JSON, analyzed_at DATETIME, PRIMARY KEY (id),
+    FOREIGN KEY(document_id) REFERENCES documents (id)
+);
+CREATE INDEX ix_compliance_analyses_id ON compliance_analyses (id);
+"""
+
+FINDINGS = [
+    {'rule_type': 'anti_fraud', 'severity': 'high', 'description': 'Potentially misleading statement: no.{0,30}risk',
+     'location': '...no risk...', 'suggestion': 'Remove misleading language'},
+    {'rule_type': 'third_party_ratings', 'severity': 'medium', 'description': 'Third-party rating missing disclosures',
+     'location': 'Rating/award mentions', 'suggestion': 'Add rating disclosures'},
+]
+
+
+def schema(engine):
+    inspector = sa.inspect(engine)
+    return {
+        table: (sorted(column['name'] for column in inspector.get_columns(table)),
+                sorted(index['name'] for index in inspector.get_indexes(table)))
+        for table in inspector.get_table_names()
+    }
+
+
+def test_upgrade_from_baseline_schema(tmp_path):
+    path = tmp_path / "baseline.db"
+    connection = sqlite3.connect(path)
+    connection.executescript(BASELINE_SCHEMA)
+    connection.execute("INSERT INTO documents VALUES (1, 'a.pdf', 'a.pdf', 'uploads/a.pdf', 'advertisement', 100, "
+                       "'2026-01-01 00:00:00')")
+    connection.execute("INSERT INTO compliance_analyses VALUES (1, 1, 65, 'non_compliant', ?, '[]', "
+                       "'2026-01-01 00:00:00')", (json.dumps(FINDINGS),))
+    connection.commit()
+    connection.close()
+
+    upgraded = database.make_engine(f"sqlite:///{path}")
+    database.upgrade_schema(upgraded)
+    fresh = database.make_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    database.upgrade_schema(fresh)
+    assert schema(upgraded) == schema(fresh)
+
+    with Session(upgraded) as session:
+        analysis = session.get(models.ComplianceAnalysis, 1)
+        assert (analysis.finding_count, analysis.high_count, analysis.medium_count, analysis.low_count) == (2, 1, 1, 0)
+        assert session.get(models.Document, 1).content_hash is None
+        assert session.execute(sa.select(sa.func.count()).select_from(models.Finding)).scalar() == 2
@@ -0,0 +1,141 @@
+import asyncio
+from collections import Counter, defaultdict
+from datetime import datetime
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from backend import batch_analyze, database, jobs, models, repository, rollups
+from backend.compliance_engine import compliance_engine
+from backend.rescoring import rescored_values
+
+FILLER = "Plain words about the fund. " * 20
+
+TEXTS = [
+    "We guarantee returns with no risk. Our fund is the best in the industry.",
+    "Our award-winning fund had top performing returns. Results may vary.",
+    "Client testimonial: they are the best advisor I ever had.",
+    "A plain description of the fund's strategy and fees.",
+]
+
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'rollups.db'}"
+    engine = database.make_engine(url)
+    database.upgrade_schema(engine)
+    async_engine = database.make_async_engine(url)
+    monkeypatch.setattr(batch_analyze, 'SessionLocal', sessionmaker(bind=engine))
+    monkeypatch.setattr(jobs, 'AsyncSessionLocal', async_sessionmaker(async_engine, expire_on_commit=False))
+    yield sessionmaker(bind=engine), jobs.AsyncSessionLocal
+    asyncio.run(async_engine.dispose())
+    engine.dispose()
+
+
+def analyze(text):
+    return compliance_engine.analyze("a.txt", pages=[FILLER + text])
+
+
+def submit(async_session, uploaded_at, document_type, analysis_result):
+    """Record a document and job as an upload does, then store its analysis as a worker's result is"""
+    async def run():
+        async with async_session() as db:
+            document = models.Document(filename="a.txt", original_filename="a.txt", file_path="uploads/a.txt",
+                                       document_type=document_type, file_size=1, uploaded_at=uploaded_at)
+            db.add(document)
+            await db.flush()
+            job = models.AnalysisJob(document_id=document.id, status="running", created_at=uploaded_at)
+            db.add(job)
+            await db.commit()
+            job_id = job.id
+        await jobs.analysis_queue._save_analysis(job_id, analysis_result)
+    asyncio.run(run())
+
+
+def rescore(async_session, results):
+    async def run():
+        async with async_session() as db:
+            await repository.update_analyses(
+                db, [{'id': analysis_id, **rescored_values(result)} for analysis_id, result in results.items()],
+                {analysis_id: result['findings'] for analysis_id, result in results.items()})
+            await db.commit()
+    asyncio.run(run())
+
+
+def stored_rollups(session):
+    analyses = {(week, document_type, status, bucket): (count, round(score_sum, 6))
+                for week, document_type, status, bucket, count, score_sum
+                in session.execute(sa.select(models.AnalysisRollup.__table__)) if count}
+    findings = {(week, document_type, rule_type, severity): count
+                for week, document_type, rule_type, severity, count
+                in session.execute(sa.select(models.FindingRollup.__table__)) if count}
+    return analyses, findings
+
+
+def aggregated_rollups(session):
+    """The rollups computed afresh with GROUP BY over the analyses and findings"""
+    analyses = defaultdict(lambda: [0, 0.0])
+    for uploaded_at, document_type, status, score, count, score_sum in session.execute(
+        sa.select(models.Document.uploaded_at, models.Document.document_type,
+                  models.ComplianceAnalysis.compliance_status, models.ComplianceAnalysis.overall_score,
+                  sa.func.count(), sa.func.sum(models.ComplianceAnalysis.overall_score))
+        .join(models.ComplianceAnalysis.document)
+        .group_by(models.Document.uploaded_at, models.Document.document_type,
+                  models.ComplianceAnalysis.compliance_status, models.ComplianceAnalysis.overall_score)
+    ):
+        totals = analyses[(rollups.week_of(uploaded_at), document_type, status, rollups.score_bucket(score))]
+        totals[0] += count
+        totals[1] += score_sum
+
+    findings = Counter()
+    for uploaded_at, document_type, rule_type, severity, count in session.execute(
+        sa.select(models.Document.uploaded_at, models.Document.document_type,
+                  models.FindingRule.rule_type, models.FindingRule.severity, sa.func.count())
+        .select_from(models.Finding)
+        .join(models.FindingRule, models.Finding.rule_id == models.FindingRule.id)
+        .join(models.ComplianceAnalysis, models.Finding.analysis_id == models.ComplianceAnalysis.id)
+        .join(models.ComplianceAnalysis.document)
+        .group_by(models.Document.uploaded_at, models.Document.document_type,
+                  models.FindingRule.rule_type, models.FindingRule.severity)
+    ):
+        findings[(rollups.week_of(uploaded_at), document_type, rule_type, severity)] += count
+
+    return ({key: (count, round(score_sum, 6)) for key, (count, score_sum) in analyses.items()}, dict(findings))
+
+
+def test_rollups_match_analyses_after_every_write_path(sessions):
+    session, async_session = sessions
+    results = [analyze(text) for text in TEXTS]
+
+    batch_analyze.save_batch([{'file': f"/corpus/{n}.txt", 'file_size': 1, 'content_hash': None, 'analysis': result}
+                              for n, result in enumerate(results[:3])], "advertisement")
+    submit(async_session, datetime(2026, 3, 4), "rfp", results[0])
+    submit(async_session, datetime(2026, 3, 11), "advertisement", results[3])
+    submit(async_session, datetime(2026, 3, 11), "rfp", results[1])
+    with session() as db:
+        assert stored_rollups(db) == aggregated_rollups(db)
+
+    # Re-score some analyses, then replace one of them again
+    rescore(async_session, {1: results[3], 4: results[2], 6: results[0]})
+    rescore(async_session, {4: results[1]})
+    with session() as db:
+        assert stored_rollups(db) == aggregated_rollups(db)
+
+    written = {1: results[3], 2: results[1], 3: results[2], 4: results[1], 5: results[3], 6: results[0]}
+    with session() as db:
+        for analysis_id, result in written.items():
+            assert db.get(models.ComplianceAnalysis, analysis_id).findings == result['findings']
+
+    async def read():
+        async with async_session() as db:
+            return await repository.count_findings(db), await repository.analytics(db)
+    counts, analytics = asyncio.run(read())
+    expected = Counter((finding['rule_type'], finding['severity'])
+                       for result in written.values() for finding in result['findings'])
+    assert {(row['rule_type'], row['severity']): row['count'] for row in counts} == expected
+    assert analytics['totals']['analyses'] == len(written)
+    assert analytics['totals']['findings'] == sum(expected.values())
+    assert {row['compliance_status']: row['count'] for row in analytics['status_counts']} == \
+        Counter(result['compliance_status'] for result in written.values())
@@ -0,0 +1,42 @@
+import random
+
+from backend.rule_matcher import SEGMENT_BREAK, SENTENCE_END, CompiledRuleSet, TokenIndex
+
+# Overlapping, optional, repeated and empty-matching patterns over a small alphabet. All are
+# bounded, so the overlap window stays short and the scan drops text between pages
+PATTERNS = ['ab?a', 'a.{0,3}b', 'b{1,3}', 'aa|ab', 'a b', 'b.?a.?b', 'ba{0,4}', 'x{0,2}', 'a{2,5}']
+ALPHABET = 'aab  .x'
+
+
+def whole_document(pages):
+    """The pages joined the way StreamingScan joins them, for a single scan"""
+    text = ''
+    for page in pages:
+        if text and page:
+            text += SEGMENT_BREAK if SENTENCE_END.search(text) else ' '
+        text += page
+    return text
+
+
+def streamed(rule_set, pages, with_tokens):
+    scan = rule_set.stream()
+    for number, page in enumerate(pages, 1):
+        scan.feed(number, page, page, list(range(len(page))), TokenIndex(page) if with_tokens else None)
+    return scan.finish()
+
+
+def test_single_page_overlapping_matches():
+    rule_set = CompiledRuleSet({'category': {'patterns': ['ab?a']}})
+    assert streamed(rule_set, [' aaaa'], False).spans('ab?a') == [(1, 3), (3, 5)]
+
+
+def test_streamed_spans_match_whole_document_scan():
+    rng = random.Random(0)
+    rule_sets = [(pattern, CompiledRuleSet({'category': {'patterns': [pattern]}})) for pattern in PATTERNS]
+    for case in range(5000):
+        pages = [''.join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 12)))
+                 for _ in range(rng.randint(1, 4))]
+        text = whole_document(pages)
+        for pattern, rule_set in rule_sets:
+            expected = rule_set.scan(text).spans(pattern)
+            assert streamed(rule_set, pages, case % 2 == 0).spans(pattern) == expected, (pages, pattern)